@@ -0,0 +1,188 @@
+"""Allergen flags from ingredient names.
+
+Food.com recipes are almost never tagged 'nuts' or 'seafood', so the quiz's
+allergy options can't rely on tags.  Instead every ingredient is scanned
+for the words of a curated lexicon per allergen, all patterns at once with
+an Aho-Corasick automaton, and the recipe gets an `allergens` list that the
+recommender excludes on.
+
+A match only counts on word boundaries ('nutmeg' is not a nut, 'eggplant'
+not an egg), and each allergen has exception phrases that cancel the
+matches they cover ('peanut butter' is not dairy, 'water chestnut' not a
+nut).  Ingredient names repeat a lot across recipes, so each distinct name
+is classified once and remembered.
+"""
+from collections import deque
+from .ingredients import INGREDIENT_KEYS_FIELD, canonical_ingredients
+
+ALLERGEN_FIELD = 'allergens'
+
+# Same names as the quiz's allergy options (ALLERGY_TAGS)
+LEXICONS = {
+    'eggs_dairy': (
+        'egg', 'egg white', 'egg yolk', 'eggnog', 'mayonnaise', 'mayo', 'meringue',
+        'custard', 'milk', 'buttermilk', 'butter', 'ghee', 'cream', 'creme fraiche',
+        'half-and-half', 'half and half', 'cheese', 'cheddar', 'mozzarella', 'parmesan',
+        'parmigiano', 'pecorino', 'romano', 'ricotta', 'feta', 'brie', 'camembert',
+        'gouda', 'gruyere', 'provolone', 'asiago', 'colby', 'havarti', 'monterey jack',
+        'mascarpone', 'neufchatel', 'paneer', 'velveeta', 'yogurt', 'yoghurt', 'kefir',
+        'whey', 'casein', 'creamer', 'cool whip',
+    ),
+    'seafood': (
+        'fish', 'fish sauce', 'anchovy', 'salmon', 'lox', 'tuna', 'cod',
+        'haddock', 'halibut', 'tilapia', 'trout', 'sardine', 'mackerel', 'snapper',
+        'sole', 'flounder', 'catfish', 'sea bass', 'striped bass', 'swordfish',
+        'mahi mahi', 'mahi-mahi', 'pollock', 'herring', 'perch', 'walleye', 'grouper', 'bonito',
+        'shrimp', 'prawn', 'crab', 'crabmeat', 'lobster', 'langostino', 'crawfish',
+        'crayfish', 'scallop', 'clam', 'mussel', 'oyster', 'squid', 'calamari',
+        'octopus', 'caviar', 'roe', 'surimi', 'worcestershire',
+    ),
+    'nuts': (
+        'nut', 'peanut', 'almond', 'walnut', 'pecan', 'cashew', 'pistachio',
+        'hazelnut', 'filbert', 'macadamia', 'brazil nut', 'pine nut', 'pignoli',
+        'chestnut', 'praline', 'marzipan', 'nutella', 'gianduja', 'frangelico',
+        'pesto',
+    ),
+}
+
+# Phrases that cancel the allergen's matches inside them
+EXCEPTIONS = {
+    'eggs_dairy': (
+        'cream of tartar', 'coconut milk', 'coconut cream', 'almond milk', 'soy milk',
+        'soymilk', 'rice milk', 'oat milk', 'cashew milk', 'peanut butter',
+        'almond butter', 'cashew butter', 'nut butter', 'apple butter', 'cocoa butter',
+        'butter bean', 'butter lettuce', 'vegan butter', 'vegan cheese', 'soy cheese',
+        'soy yogurt', 'coconut yogurt', 'coconut creamer', 'dairy-free', 'non-dairy', 'nondairy',
+    ),
+    'seafood': (
+        'oyster mushroom', 'oyster cracker', 'crab apple', 'goldfish cracker',
+        'swedish fish',
+    ),
+    'nuts': (
+        'water chestnut', 'nut-free',
+    ),
+}
+
+ALLERGENS = tuple(LEXICONS)
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: one scan of a text finds every pattern in it.
+
+    The patterns form a trie; each node also has a failure link to the
+    longest proper suffix of its path that is a trie path too, so the scan
+    never backs up, whatever the number of patterns.
+    """
+
+    def __init__(self, patterns):
+        """patterns: iterable of (text, value)"""
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [()]
+        for text, value in patterns:
+            node = 0
+            for char in text:
+                nxt = self.goto[node].get(char)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][char] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(())
+                node = nxt
+            self.out[node] += ((len(text), value),)
+
+        # Breadth first, so a node's failure target is final before its children's
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                target = self.fail[node]
+                while target and char not in self.goto[target]:
+                    target = self.fail[target]
+                self.fail[child] = self.goto[target].get(char, 0)
+                self.out[child] += self.out[self.fail[child]]
+
+    def matches(self, text):
+        """(start, end, value) of every occurrence of every pattern"""
+        goto, fail, out = self.goto, self.fail, self.out
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for length, value in out[node]:
+                yield i + 1 - length, i + 1, value
+
+
+def _is_word_char(char):
+    return char.isalnum()
+
+
+def _on_word_boundary(text, start, end):
+    """True if text[start:end] is whole words; a plural 's'/'es' may follow"""
+    if start > 0 and _is_word_char(text[start - 1]):
+        return False
+    for suffix in ('', 's', 'es'):
+        stop = end + len(suffix)
+        if text.startswith(suffix, end) and (stop == len(text) or not _is_word_char(text[stop])):
+            return True
+    return False
+
+
+class AllergenClassifier:
+    """Allergens of ingredient names, each distinct name scanned once"""
+
+    def __init__(self, lexicons=LEXICONS, exceptions=EXCEPTIONS):
+        self.allergens = tuple(lexicons)
+        bits = {name: 1 << i for i, name in enumerate(self.allergens)}
+        patterns = [(p, (bits[name], False)) for name, words in lexicons.items() for p in words]
+        patterns += [(p, (bits[name], True)) for name, words in exceptions.items() for p in words]
+        self.matcher = AhoCorasick(patterns)
+        self._known = {}
+
+    def mask(self, ingredient):
+        """Bit i set if the ingredient contains allergen i"""
+        known = self._known.get(ingredient)
+        if known is not None:
+            return known
+        text = ingredient.lower()
+        found, excepted = [], []
+        for start, end, (bit, is_exception) in self.matcher.matches(text):
+            if _on_word_boundary(text, start, end):
+                (excepted if is_exception else found).append((start, end, bit))
+        mask = 0
+        for start, end, bit in found:
+            if not any(b == bit and s <= start and end <= e for s, e, b in excepted):
+                mask |= bit
+        self._known[ingredient] = mask
+        return mask
+
+    def names(self, mask):
+        return [name for i, name in enumerate(self.allergens) if mask >> i & 1]
+
+    def classify(self, ingredients):
+        """Allergen names present in any of the ingredients, in ALLERGENS order"""
+        mask = 0
+        for ingredient in ingredients or ():
+            mask |= self.mask(ingredient)
+        return self.names(mask)
+
+
+_shared_classifier = None
+
+
+def get_classifier():
+    global _shared_classifier
+    if _shared_classifier is None:
+        _shared_classifier = AllergenClassifier()
+    return _shared_classifier
+
+
+def recipe_allergens(recipe):
+    """Allergen names for a recipe document, from its canonical ingredient names"""
+    keys = recipe.get(INGREDIENT_KEYS_FIELD)
+    if keys is None:
+        keys = canonical_ingredients(recipe.get('ingredients'))
+    return get_classifier().classify(keys)
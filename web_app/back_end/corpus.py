@@ -0,0 +1,444 @@
+from collections import OrderedDict
+import numpy as np
+from .recipe_record import RecipeRecord, NUTRIENTS, LAZY_FIELDS
+from .ingredients import INGREDIENT_KEYS_FIELD
+from .allergens import ALLERGEN_FIELD
+from .name_index import TrigramIndex
+from .text_search import BM25Index
+from .ranker import top_k
+
+# Array fields that get an inverted index (value -> rows)
+LIST_FIELDS = ('tags', INGREDIENT_KEYS_FIELD, ALLERGEN_FIELD)
+
+# Packed per-value bitsets kept for $in/$nin (each is size/8 bytes)
+MAX_BITSETS = 512
+
+# Numeric fields that are stored as column arrays
+NUMERIC_FIELDS = ('minutes', 'n_steps') + tuple(f'nutrition.{n}' for n in NUTRIENTS)
+
+
+class RecipeCorpus:
+    """In-memory snapshot of the recipes collection.
+
+    The snapshot is loaded once (in the master process when running under the
+    pre-fork server) and answers the small subset of MongoDB queries that the
+    recommender builds, so recommendations need no database round trip.
+    Filters are evaluated as boolean masks over column arrays and inverted
+    indexes instead of document by document.  Records are never modified;
+    new recipes are appended with add().
+    """
+
+    def __init__(self, recipes):
+        # Compact slotted records; description/steps stay in MongoDB
+        self.recipes = [
+            r if isinstance(r, RecipeRecord) else RecipeRecord.from_document(r)
+            for r in recipes
+        ]
+        self.size = len(self.recipes)
+        self.ids = [r._id for r in self.recipes]
+        self.row_of = {rid: row for row, rid in enumerate(self.ids)}
+        self._name_index = None
+        self.text_index = None
+        self.list_index = {field: {} for field in LIST_FIELDS}
+        self._bitsets = OrderedDict()
+        # Number of canonical ingredients of each row (pantry coverage)
+        self.ingredient_counts = np.zeros(0, dtype=np.int32)
+        self.columns = {field: np.zeros(0, dtype=np.float64) for field in NUMERIC_FIELDS}
+        self._index_rows(0)
+
+    @classmethod
+    def load(cls, collection, query=None, batch_size=10000):
+        """Snapshot every recipe in a MongoDB collection"""
+        projection = {field: 0 for field in LAZY_FIELDS}
+        cursor = collection.find(query or {}, projection).batch_size(batch_size)
+        corpus = cls(cursor)
+        print(f"Loaded {corpus.size} recipes into memory.")
+        return corpus
+
+    def add(self, recipes):
+        """Append new recipes to the snapshot, updating every index"""
+        start = self.size
+        for recipe in recipes:
+            record = recipe if isinstance(recipe, RecipeRecord) else RecipeRecord.from_document(recipe)
+            self.row_of[record._id] = self.size
+            self.ids.append(record._id)
+            self.recipes.append(record)
+            self.size += 1
+        self._index_rows(start)
+        self._bitsets.clear()
+        if self._name_index is not None:
+            self._name_index.add(r.name for r in self.recipes[start:])
+        # BM25 statistics cover the whole corpus; searches wait for a rebuild
+        self.text_index = None
+
+    def build_text_index(self, collection):
+        """Build the full-text index, streaming description/steps from MongoDB"""
+        self.text_index = BM25Index.from_collection(collection, self.row_of, self.size)
+        print(f"Indexed text of {self.size} recipes ({len(self.text_index.term_ids)} terms).")
+        return self.text_index
+
+    def search_text(self, text, k=10, query=None):
+        """BM25 search, optionally restricted to recipes matching a filter query.
+
+        Returns recipe dicts with a 'score', or None until build_text_index
+        has run (again, after add()).
+        """
+        if self.text_index is None:
+            return None
+        mask = self.mask(query) if query else None
+        results = []
+        for row, score in self.text_index.search(text, k, mask):
+            recipe = self.recipes[row].to_dict()
+            recipe['score'] = round(score, 4)
+            results.append(recipe)
+        return results
+
+    def pantry_match(self, pantry, k=10, query=None):
+        """Recipes that use the most of what is in the pantry, best first.
+
+        pantry is a list of canonical ingredient names.  A recipe's coverage
+        is the fraction of its ingredients found in the pantry; ties go to
+        the recipe using more of them.  The pantry's postings lists are
+        counted into one array (a sparse recipe x ingredient product), so
+        only recipes sharing an ingredient with the pantry are ever scored.
+        Returns recipe dicts with 'coverage', 'matched' and 'missing'.
+        """
+        index = self.list_index[INGREDIENT_KEYS_FIELD]
+        postings = [index[key] for key in dict.fromkeys(pantry) if key in index]
+        if not postings or k <= 0:
+            return []
+        matched = np.bincount(np.concatenate(postings), minlength=self.size)
+        rows = np.flatnonzero(matched)
+        if query:
+            rows = rows[self.mask(query)[rows]]
+        coverage = matched[rows] / self.ingredient_counts[rows]
+        # Coverages differ by at least 1/(n*m) for n, m ingredients, far more
+        # than this tie-break can add
+        best = rows[top_k(coverage + matched[rows] * 1e-6, k)]
+
+        have = set(pantry)
+        results = []
+        for row in best:
+            record = self.recipes[row]
+            recipe = record.to_dict()
+            recipe['coverage'] = round(float(matched[row] / self.ingredient_counts[row]), 4)
+            recipe['matched'] = int(matched[row])
+            recipe['missing'] = [key for key in record.ingredient_keys if key not in have]
+            results.append(recipe)
+        return results
+
+    # ── indexes ──────────────────────────────────────────────────────
+    def _index_rows(self, start):
+        """Extend the inverted indexes and columns with rows start..size"""
+        for field in LIST_FIELDS:
+            postings = {}
+            for row in range(start, self.size):
+                for value in self.recipes[row].get(field) or ():
+                    postings.setdefault(value, []).append(row)
+            index = self.list_index[field]
+            for value, rows in postings.items():
+                rows = np.array(rows, dtype=np.int32)
+                index[value] = rows if value not in index else np.concatenate((index[value], rows))
+
+        self.ingredient_counts = np.concatenate((
+            self.ingredient_counts,
+            np.fromiter((len(r.ingredient_keys) for r in self.recipes[start:]),
+                        dtype=np.int32, count=self.size - start),
+        ))
+        for field in NUMERIC_FIELDS:
+            self.columns[field] = np.concatenate((
+                self.columns[field],
+                self._numeric_column(lambda r, f=field: _get_path(r, f), start),
+            ))
+
+    def _numeric_column(self, getter, start=0):
+        column = np.full(self.size - start, np.nan, dtype=np.float64)
+        for i, recipe in enumerate(self.recipes[start:]):
+            value = getter(recipe)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                column[i] = value
+        return column
+
+    def build_name_index(self):
+        """Build the trigram index over recipe names"""
+        self._name_index = TrigramIndex(r.name for r in self.recipes)
+        return self._name_index
+
+    @property
+    def name_index(self):
+        """Trigram index over recipe names, built on first use"""
+        if self._name_index is None:
+            self.build_name_index()
+        return self._name_index
+
+    def autocomplete(self, query, k=10):
+        """Best matching recipe names for a (possibly misspelt) prefix"""
+        return [
+            {'_id': self.ids[row], 'name': self.recipes[row].name}
+            for row, _ in self.name_index.search(query, k)
+        ]
+
+    def _rows_mask(self, rows):
+        mask = np.zeros(self.size, dtype=bool)
+        mask[rows] = True
+        return mask
+
+    def intersect(self, field, values):
+        """Rows holding every value, intersecting the rarest postings first"""
+        index = self.list_index[field]
+        postings = sorted((index.get(v, ()) for v in values), key=len)
+        if not postings:
+            return np.arange(self.size)
+        rows = np.asarray(postings[0], dtype=np.int32)
+        for other in postings[1:]:
+            if not len(rows):
+                break
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
+
+    def _value_mask(self, field, value):
+        rows = self.list_index[field].get(value)
+        if rows is None:
+            return np.zeros(self.size, dtype=bool)
+        return self._rows_mask(rows)
+
+    def bitset(self, field, value):
+        """Rows holding value as a packed bitset (one bit per row), kept for reuse"""
+        key = (field, value)
+        bits = self._bitsets.get(key)
+        if bits is not None:
+            try:
+                self._bitsets.move_to_end(key)
+            except KeyError:
+                pass                    # evicted by another thread meanwhile
+            return bits
+        bits = np.packbits(self._value_mask(field, value))
+        self._bitsets[key] = bits
+        if len(self._bitsets) > MAX_BITSETS:
+            self._bitsets.popitem(last=False)
+        return bits
+
+    def _any_mask(self, field, values):
+        """Rows holding any of the values: an OR over their bitsets.
+
+        An eighth of the memory traffic of OR-ing one boolean mask per
+        value, so long $in/$nin lists (ingredient exclusions) stay cheap.
+        """
+        union = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        for value in values:
+            union |= self.bitset(field, value)
+        return np.unpackbits(union, count=self.size).view(bool)
+
+    # ── query evaluation ─────────────────────────────────────────────
+    def mask(self, query):
+        """Evaluate a MongoDB-style filter to a boolean mask over all rows"""
+        result = np.ones(self.size, dtype=bool)
+        for key, cond in (query or {}).items():
+            if key == '$and':
+                for part in cond:
+                    result &= self.mask(part)
+            elif key == '$or':
+                any_mask = np.zeros(self.size, dtype=bool)
+                for part in cond:
+                    any_mask |= self.mask(part)
+                result &= any_mask
+            elif key in self.list_index:
+                result &= self._list_field_mask(key, cond)
+            elif key in self.columns:
+                result &= self._numeric_mask(self.columns[key], cond)
+            elif key == '_id':
+                result &= self._id_mask(cond)
+            else:
+                result &= self._scan_mask(key, cond)
+        return result
+
+    def _list_field_mask(self, field, cond):
+        if isinstance(cond, dict):
+            result = np.ones(self.size, dtype=bool)
+            for op, values in cond.items():
+                if op == '$all':
+                    result &= self._rows_mask(self.intersect(field, values))
+                elif op == '$in':
+                    result &= self._any_mask(field, values)
+                elif op == '$nin':
+                    result &= ~self._any_mask(field, values)
+                elif op == '$ne':
+                    result &= ~self._value_mask(field, values)
+                else:
+                    raise ValueError(f"Unsupported operator {op} on {field}")
+            return result
+        if isinstance(cond, list):
+            # MongoDB matches a list literal against the whole array
+            return self._scan_mask(field, cond)
+        return self._value_mask(field, cond)
+
+    def _numeric_mask(self, column, cond):
+        if not isinstance(cond, dict):
+            return column == cond
+        result = np.ones(self.size, dtype=bool)
+        for op, value in cond.items():
+            if op == '$gte':
+                result &= column >= value
+            elif op == '$lte':
+                result &= column <= value
+            elif op == '$gt':
+                result &= column > value
+            elif op == '$lt':
+                result &= column < value
+            elif op == '$eq':
+                result &= column == value
+            elif op == '$ne':
+                result &= column != value
+            else:
+                raise ValueError(f"Unsupported operator {op} on numeric field")
+        return result
+
+    def _id_mask(self, cond):
+        if isinstance(cond, dict):
+            result = np.ones(self.size, dtype=bool)
+            for op, values in cond.items():
+                rows = [self.row_of[v] for v in values if v in self.row_of]
+                if op == '$in':
+                    result &= self._rows_mask(rows)
+                elif op == '$nin':
+                    result[rows] = False
+                else:
+                    raise ValueError(f"Unsupported operator {op} on _id")
+            return result
+        row = self.row_of.get(cond)
+        return self._rows_mask([] if row is None else [row])
+
+    def _scan_mask(self, key, cond):
+        """Slow path for fields without an index: test documents one by one"""
+        return np.fromiter(
+            (_field_matches(_get_path(r, key), cond) for r in self.recipes),
+            dtype=bool, count=self.size
+        )
+
+    # ── collection-like API used by recommend_recipes ────────────────
+    def find(self, query=None, projection=None):
+        # Rows always carry every field but the lazy ones; projection is
+        # accepted so callers can treat the corpus like a collection
+        return CorpusCursor(self, np.flatnonzero(self.mask(query)))
+
+    def find_one(self, query=None):
+        for recipe in self.find(query).limit(1):
+            return recipe
+        return None
+
+    def count_documents(self, query=None):
+        return int(np.count_nonzero(self.mask(query)))
+
+    def get(self, recipe_id, collection=None):
+        """Return a copy of the recipe with this _id, or None.
+
+        Pass the recipes collection to also load description and steps.
+        """
+        row = self.row_of.get(recipe_id)
+        if row is None:
+            return None
+        recipe = self.recipes[row].to_dict()
+        if collection is not None:
+            self.hydrate([recipe], collection)
+        return recipe
+
+    def hydrate(self, recipes, collection):
+        """Fill in the lazily loaded fields of recipe dicts with one query"""
+        missing = [r for r in recipes if any(f not in r for f in LAZY_FIELDS)]
+        if not missing or collection is None:
+            return recipes
+        projection = {field: 1 for field in LAZY_FIELDS}
+        try:
+            details = {
+                d['_id']: d for d in
+                collection.find({'_id': {'$in': [r['_id'] for r in missing]}}, projection)
+            }
+        except Exception as e:
+            print(f"Error loading recipe details: {e}")
+            return recipes
+        for recipe in missing:
+            for field in LAZY_FIELDS:
+                recipe.setdefault(field, details.get(recipe['_id'], {}).get(field))
+        return recipes
+
+
+class CorpusCursor:
+    """Minimal stand-in for a pymongo cursor over corpus rows"""
+
+    def __init__(self, corpus, rows):
+        self.corpus = corpus
+        self.rows = rows
+
+    def limit(self, n):
+        if n:
+            self.rows = self.rows[:n]
+        return self
+
+    def skip(self, n):
+        self.rows = self.rows[n:]
+        return self
+
+    def __iter__(self):
+        # Callers may mutate results (e.g. add a missing meal tag), so hand
+        # out fresh dicts and keep the shared snapshot untouched
+        for row in self.rows:
+            yield self.corpus.recipes[row].to_dict()
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def _get_path(doc, key):
+    for part in key.split('.'):
+        if doc is None or not hasattr(doc, 'get'):
+            return None
+        doc = doc.get(part)
+    if isinstance(doc, tuple):
+        return list(doc)
+    return doc
+
+
+def _field_matches(value, cond):
+    if isinstance(cond, dict) and cond and all(k.startswith('$') for k in cond):
+        values = value if isinstance(value, list) else [value]
+        for op, arg in cond.items():
+            if op == '$in' and not any(v in arg for v in values):
+                return False
+            if op == '$nin' and any(v in arg for v in values):
+                return False
+            if op == '$all' and not all(a in values for a in arg):
+                return False
+            if op == '$ne' and arg in values:
+                return False
+            if op == '$exists' and (value is not None) != bool(arg):
+                return False
+            if op in ('$gte', '$lte', '$gt', '$lt'):
+                if not isinstance(value, (int, float)):
+                    return False
+                if op == '$gte' and not value >= arg:
+                    return False
+                if op == '$lte' and not value <= arg:
+                    return False
+                if op == '$gt' and not value > arg:
+                    return False
+                if op == '$lt' and not value < arg:
+                    return False
+        return True
+    if isinstance(value, list) and not isinstance(cond, list):
+        return cond in value
+    return value == cond
+
+
+# ── process-wide snapshot shared by the pre-fork server ──────────────
+_shared_corpus = None
+
+
+def load_shared_corpus(collection):
+    """Load the snapshot once; workers forked afterwards share its pages"""
+    global _shared_corpus
+    _shared_corpus = RecipeCorpus.load(collection)
+    return _shared_corpus
+
+
+def get_shared_corpus():
+    return _shared_corpus
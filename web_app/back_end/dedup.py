@@ -0,0 +1,96 @@
+import zlib
+import numpy as np
+from .ingredients import canonical_ingredients
+from .text_search import tokenize
+
+CLUSTER_FIELD = 'cluster_id'
+
+# 64 hash functions in 8 bands of 8 rows: recipes whose shingle sets have a
+# Jaccard similarity around 0.77 or more share a band bucket about half the
+# time, and above 0.9 almost always; candidates are then checked against
+# SIMILARITY on the full signature
+NUM_PERM = 64
+BANDS = 8
+SIMILARITY = 0.8
+
+# Mersenne-31 prime: with a, b and x all below it, a*x + b stays under
+# 2^63 and the uint64 arithmetic never wraps before the reduction
+_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.RandomState(1)
+_A = _rng.randint(1, (1 << 31) - 1, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.randint(0, (1 << 31) - 1, size=NUM_PERM, dtype=np.uint64)
+
+
+def shingles(recipe):
+    """What makes two recipes the same dish: their ingredients and their steps.
+
+    Ingredients count as one shingle each; steps as word 3-grams, so
+    rewording one step only changes the few shingles around it.
+    """
+    keys = recipe.get('ingredient_keys') or canonical_ingredients(recipe.get('ingredients'))
+    result = {'i:' + key for key in keys}
+    words = tokenize(recipe.get('steps'))
+    result.update('s:' + ' '.join(words[i:i + 3]) for i in range(max(0, len(words) - 2)))
+    return result
+
+
+def minhash(shingle_set):
+    """NUM_PERM-value MinHash signature (uint32), or None for an empty set"""
+    if not shingle_set:
+        return None
+    hashes = np.fromiter(
+        (zlib.crc32(s.encode('utf-8')) for s in shingle_set),
+        dtype=np.uint64, count=len(shingle_set)
+    ) % _PRIME
+    # Universal hashing (a*x + b) mod p, one row per hash function
+    permuted = (np.outer(_A, hashes) + _B[:, None]) % _PRIME
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """Assigns near-duplicate recipes a shared cluster id, in one pass.
+
+    Each band of a recipe's signature is a bucket key.  The first recipe in
+    a bucket stays its representative; a later recipe landing in the same
+    bucket joins the representative's cluster if their signatures agree on
+    at least SIMILARITY of their values.  Every recipe is compared with at
+    most BANDS representatives, so the pass is linear in the number of
+    recipes.  A recipe with no near-duplicate is its own cluster and its
+    cluster id is its _id.
+    """
+
+    def __init__(self):
+        self.buckets = [{} for _ in range(BANDS)]
+        self.signatures = []
+        self.cluster_ids = []
+
+    def add(self, recipe_id, recipe):
+        """Cluster id for this recipe; later recipes can join its cluster"""
+        signature = minhash(shingles(recipe))
+        if signature is None:
+            return recipe_id
+        rows = NUM_PERM // BANDS
+        keys = [signature[b * rows:(b + 1) * rows].tobytes() for b in range(BANDS)]
+
+        best, best_similarity = None, SIMILARITY
+        for bucket, key in zip(self.buckets, keys):
+            candidate = bucket.get(key)
+            if candidate is None or candidate == best:
+                continue
+            similarity = np.count_nonzero(self.signatures[candidate] == signature) / NUM_PERM
+            if similarity >= best_similarity:
+                best, best_similarity = candidate, similarity
+        cluster_id = recipe_id if best is None else self.cluster_ids[best]
+
+        row = len(self.signatures)
+        self.signatures.append(signature)
+        self.cluster_ids.append(cluster_id)
+        for bucket, key in zip(self.buckets, keys):
+            bucket.setdefault(key, row)
+        return cluster_id
+
+
+def cluster_recipes(recipes):
+    """{_id: cluster_id} for an iterable of recipe documents"""
+    index = NearDuplicateIndex()
+    return {r['_id']: index.add(r['_id'], r) for r in recipes}
@@ -0,0 +1,268 @@
+"""One day's plan for a household.
+
+Everyone eats the same dishes, so the members' quiz answers are merged into
+one set of constraints and the plan is computed once:
+
+* allergies and excluded ingredients: the union of everyone's, never relaxed;
+* diets: the union (a vegan and a gluten-free member get vegan, gluten-free
+  recipes);
+* time: the intersection of the members' windows;
+* calories and nutrient limits: the intersection of the ranges;
+* cuisine: any of the cuisines someone picked; beginner: if anyone is one.
+
+A slot with no match gives up the soft constraints in RELAXATION_ORDER
+(least important first, as find_with_improved_relaxation does) and the
+result says whose preferences were given up.  Preferences that cannot all
+hold at once (disjoint time windows or calorie ranges) are given up from
+the start.
+"""
+import random
+import numpy as np
+from .recipe_record import NUTRIENTS
+from .recipe_recommender import (
+    ALLERGY_TAGS, CALORIE_RANGES, CUISINE_TAGS, DIET_TAGS, DISH_SELECTIONS,
+    MEAL_WEIGHT_RANGES, TIME_RANGES, allergy_filter, beginner, excluded_ingredients,
+    exclusion_filter, nutrient_filters, plan_key,
+)
+from .plan_optimizer import (
+    DEVIATION_WEIGHT, OPTIMIZER_CANDIDATES, choose_jointly, plan_slots,
+    slot_candidates, slot_targets, split_shared,
+)
+
+RELAXATION_ORDER = ('cuisine', 'beginner', 'calories', 'nutrients', 'time', 'diet')
+
+# A member's answers: the tags each multiple-choice question takes, and the
+# options of each single-choice one (7 and 6 are "no preference")
+MEMBER_TAGS = {
+    'question1': DIET_TAGS + ALLERGY_TAGS + ['no_restriction'],
+    'question4': CUISINE_TAGS + ['any'],
+    'question6': list(MEAL_WEIGHT_RANGES),
+    'question7': list(DISH_SELECTIONS),
+}
+MEMBER_OPTIONS = {
+    'question2': list(CALORIE_RANGES) + [7],
+    'question3': list(TIME_RANGES) + [6],
+    'question5': [1, 2],
+}
+
+
+def member_names(members):
+    return [m.get('name') or f"member {i + 1}" for i, m in enumerate(members)]
+
+
+def member_preferences(member):
+    """One member's quiz answers, checked and normalized; ValueError if they don't fit the quiz.
+
+    A single tag may stand for a list of one, and options may be numeric
+    strings as the quiz form posts them; they come back as lists and ints.
+    """
+    if not isinstance(member, dict):
+        raise ValueError("each member must be an object of quiz answers")
+    prefs = {}
+    for key, value in member.items():
+        if key == 'name':
+            if not isinstance(value, str):
+                raise ValueError("name must be a string")
+            prefs[key] = value
+        elif key in MEMBER_TAGS:
+            tags = [value] if isinstance(value, str) else value
+            if not isinstance(tags, list) or any(t not in MEMBER_TAGS[key] for t in tags):
+                raise ValueError(f"{key} must be a list of {', '.join(MEMBER_TAGS[key])}")
+            prefs[key] = tags
+        elif key in MEMBER_OPTIONS:
+            try:
+                option = int(value) if isinstance(value, (int, str)) and not isinstance(value, bool) else None
+            except ValueError:
+                option = None
+            if option not in MEMBER_OPTIONS[key]:
+                raise ValueError(f"{key} must be one of {MEMBER_OPTIONS[key]}")
+            prefs[key] = option
+        elif key == 'exclude_ingredients':
+            names = [n.strip() for n in value.split(',') if n.strip()] if isinstance(value, str) else value
+            if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+                raise ValueError("exclude_ingredients must be a list of ingredients")
+            prefs[key] = names
+        elif key == 'nutrients':
+            prefs[key] = _member_nutrients(value)
+        else:
+            raise ValueError(f"unknown answer {key!r}")
+    return prefs
+
+
+def _member_nutrients(limits):
+    if not isinstance(limits, dict):
+        raise ValueError("nutrients must map nutrients to {'min': ..., 'max': ...}")
+    checked = {}
+    for nutrient, bounds in limits.items():
+        if nutrient not in NUTRIENTS or not isinstance(bounds, dict) or set(bounds) - {'min', 'max'}:
+            raise ValueError(f"nutrients: {nutrient!r} must be one of {', '.join(NUTRIENTS)} "
+                             "with a 'min' and/or 'max'")
+        for key, bound in bounds.items():
+            if bound is not None and (isinstance(bound, bool) or not isinstance(bound, (int, float))):
+                raise ValueError(f"nutrients: {nutrient} {key} must be a number")
+        checked[nutrient] = {key: bound for key, bound in bounds.items() if bound is not None}
+    return checked
+
+
+def _option(prefs, question, ranges):
+    try:
+        return ranges.get(int(prefs.get(question)))
+    except (TypeError, ValueError):
+        return None
+
+
+def _intersect(windows):
+    """Intersection of (low, high) windows, or None if they are disjoint"""
+    low = max(w[0] for w in windows)
+    high = min(w[1] for w in windows)
+    return (low, high) if low <= high else None
+
+
+def _merge_nutrients(all_limits):
+    merged = {}
+    for limits in all_limits:
+        for nutrient, bounds in (limits or {}).items():
+            if not isinstance(bounds, dict):
+                continue
+            into = merged.setdefault(nutrient, {})
+            if bounds.get('min') is not None:
+                into['min'] = max(float(bounds['min']), into.get('min', float('-inf')))
+            if bounds.get('max') is not None:
+                into['max'] = min(float(bounds['max']), into.get('max', float('inf')))
+    conflicting = [n for n, b in merged.items() if b.get('min', 0) > b.get('max', float('inf'))]
+    return {n: b for n, b in merged.items() if n not in conflicting}, conflicting
+
+
+def merge_preferences(members):
+    """The household's constraints: (hard query parts, soft constraints, meal/dish prefs, relaxed).
+
+    Soft constraints map a RELAXATION_ORDER name to (query part, the members
+    who asked for it); relaxed maps the names of preferences that cannot
+    hold together to the members who lose them.
+    """
+    names = member_names(members)
+    answers = [m.get('question1') or [] for m in members]
+    allergies = sorted({a for sel in answers for a in sel if a in ALLERGY_TAGS})
+    excluded = sorted({e for m in members for e in excluded_ingredients(m)})
+    hard = []
+    if allergies:
+        hard.append(allergy_filter(allergies))
+    if excluded:
+        hard.append(exclusion_filter(excluded))
+
+    soft, relaxed = {}, {}
+
+    def asked(test):
+        return [name for name, m in zip(names, members) if test(m)]
+
+    diets = sorted({d for sel in answers for d in sel if d in DIET_TAGS})
+    if diets:
+        soft['diet'] = ({"tags": {"$all": diets}},
+                        asked(lambda m: any(d in DIET_TAGS for d in m.get('question1') or ())))
+
+    cuisines = sorted({c for m in members for c in m.get('question4') or ()
+                       if isinstance(c, str) and c != 'any'})
+    if cuisines:
+        soft['cuisine'] = ({"tags": {"$in": cuisines}},
+                           asked(lambda m: any(c != 'any' for c in m.get('question4') or ())))
+
+    beginners = asked(beginner)
+    if beginners:
+        soft['beginner'] = ({"tags": {"$in": ['easy', 'beginner-cook']}}, beginners)
+
+    for key, question, ranges in (('time', 'question3', TIME_RANGES), ('calories', 'question2', CALORIE_RANGES)):
+        windows = {name: _option(m, question, ranges) for name, m in zip(names, members)}
+        windows = {name: w for name, w in windows.items() if w}
+        if not windows:
+            continue
+        window = _intersect(windows.values())
+        if window is None:
+            relaxed[key] = list(windows)
+            continue
+        field = "minutes" if key == 'time' else "nutrition.calories"
+        # A dish fits under the day's calories; the day as a whole is held
+        # to the range when the slots are chosen
+        condition = {"$gte": window[0]} if key == 'time' else {"$gte": 0}
+        if window[1] != float('inf'):
+            condition["$lte"] = window[1]
+        soft[key] = ({field: condition}, list(windows), window)
+
+    nutrients, conflicting = _merge_nutrients(m.get('nutrients') for m in members)
+    if conflicting:
+        relaxed['nutrients'] = asked(lambda m: any(n in (m.get('nutrients') or {}) for n in conflicting))
+    parts = nutrient_filters(nutrients)
+    if parts:
+        soft['nutrients'] = ({"$and": parts}, asked(lambda m: bool(m.get('nutrients'))))
+
+    meals = list(dict.fromkeys(meal for m in members for meal in m.get('question6') or ()))
+    dishes = list(dict.fromkeys(dish for m in members for dish in m.get('question7') or ()))
+    return hard, soft, {'question6': meals, 'question7': dishes}, relaxed
+
+
+def household_plan(members, database, ranker=None):
+    """Plan a day for everyone in members (quiz answers, each optionally with a 'name').
+
+    Returns {'recommendations': {meal: [recipes]}, 'relaxed': {member: [preferences]}}.
+    """
+    hard, soft, meal_prefs, relaxed = merge_preferences(members)
+    meal_types, slots = plan_slots(meal_prefs)
+
+    pools, dropped = [], set()
+    for meal, dish in slots:
+        slot_part = {"tags": {"$in": [meal]}} if dish is None else {"tags": dish}
+        active = [name for name in RELAXATION_ORDER if name in soft]
+        pool = []
+        for level in range(len(active) + 1):
+            parts = hard + [slot_part] + [soft[name][0] for name in active[level:]]
+            pool = slot_candidates(database, {"$and": parts}, OPTIMIZER_CANDIDATES, ranker)
+            if pool:
+                dropped.update(active[:level])
+                break
+        pools.append(pool)
+
+    def valued(pool):
+        value = np.array([random.random() for _ in pool])
+        if ranker is not None:
+            value += 1 - np.arange(len(pool)) / max(len(pool), 1)
+        return value
+
+    chosen = None
+    if 'calories' in soft and 'calories' not in dropped and all(pools):
+        # The day's total in the range: one recipe per slot, chosen jointly
+        low, high = soft['calories'][2]
+        split = split_shared(pools)
+        if all(split):
+            calories = [np.array([float(r['nutrition']['calories']) for r in pool]) for pool in split]
+            targets = slot_targets(slots, (low + high) / 2)
+            values = [valued(pool) - DEVIATION_WEIGHT * np.abs(kcal - target) / max(target, 1)
+                      for pool, kcal, target in zip(split, calories, targets)]
+            picks = choose_jointly(calories, values, low, high)
+            if picks is not None:
+                chosen = [pool[j] for pool, j in zip(split, picks)]
+        if chosen is None:
+            dropped.add('calories')
+    if chosen is None:
+        # Slot by slot, each taking its best candidate not in the plan yet
+        chosen, used = [], set()
+        for pool in pools:
+            order = np.argsort(-valued(pool))
+            pick = next((pool[j] for j in order if plan_key(pool[j]) not in used), None)
+            if pick is not None:
+                used.add(plan_key(pick))
+            chosen.append(pick)
+
+    recommendations = {meal: [] for meal in meal_types}
+    for (meal, _), recipe in zip(slots, chosen):
+        if recipe is not None:
+            recommendations[meal].append(recipe)
+
+    given_up = {}
+    for name in RELAXATION_ORDER:
+        losers = list(relaxed.get(name, []))
+        if name in dropped:
+            losers += soft[name][1]
+        for member in dict.fromkeys(losers):
+            given_up.setdefault(member, []).append(name)
+    if given_up:
+        print(f"Household plan: relaxed {given_up}")
+    return {'recommendations': recommendations, 'relaxed': given_up}
@@ -0,0 +1,222 @@
+"""Bulk-load a Food.com-style recipes CSV (RAW_recipes.csv) into MongoDB.
+
+    python -m back_end.ingest RAW_recipes.csv --workers 4
+
+Run from the web_app directory.  The file is read as a stream and parsed in
+a process pool, a bounded number of batches at a time; each batch goes to
+MongoDB as one unordered insert_many.  After every batch the number of rows
+done is written to a checkpoint file, so re-running the same command after a
+crash carries on from there.  Recipes are keyed by their Food.com id (unique
+index), so rows written twice around a crash are skipped, not duplicated.
+"""
+import argparse
+import ast
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from pymongo.errors import BulkWriteError
+from .ingredients import INGREDIENT_KEYS_FIELD, canonical_ingredients
+from .recipe_record import NUTRIENTS
+from .allergens import ALLERGEN_FIELD, recipe_allergens
+
+SOURCE_ID_FIELD = 'id'
+INT_FIELDS = ('id', 'minutes', 'contributor_id', 'n_steps', 'n_ingredients')
+LIST_FIELDS = ('tags', 'steps', 'ingredients')
+DUPLICATE_KEY = 11000
+
+# Food.com rows carry long step lists in one field
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+
+def parse_list(value):
+    """"['a', 'b']" -> ['a', 'b']; anything unparsable -> []"""
+    if not value:
+        return []
+    try:
+        parsed = ast.literal_eval(value)
+    except SyntaxError:
+        # A raw line break inside one of the quoted items
+        try:
+            parsed = ast.literal_eval(value.replace('\r', '\\r').replace('\n', '\\n'))
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            return []
+    except (ValueError, MemoryError, RecursionError):
+        return []
+    return list(parsed) if isinstance(parsed, (list, tuple)) else []
+
+
+def parse_nutrition(value):
+    """Food.com's 7-number list -> the nutrition dict the recommender queries"""
+    numbers = parse_list(value)
+    return {
+        name: float(number) for name, number in zip(NUTRIENTS, numbers)
+        if isinstance(number, (int, float))
+    }
+
+
+def parse_row(row):
+    """One CSV row (a dict) as a recipe document, or None if it has no usable id"""
+    doc = {}
+    for field, value in row.items():
+        if field is None:
+            continue                    # extra cells on a malformed row
+        if field in INT_FIELDS:
+            try:
+                doc[field] = int(float(value))
+            except (TypeError, ValueError, OverflowError):
+                doc[field] = None
+        elif field in LIST_FIELDS:
+            doc[field] = [str(v) for v in parse_list(value)]
+        elif field == 'nutrition':
+            doc[field] = parse_nutrition(value)
+        else:
+            doc[field] = value or ''
+    if doc.get(SOURCE_ID_FIELD) is None:
+        return None
+    doc['name'] = (doc.get('name') or '').strip()
+    doc.setdefault('n_steps', len(doc.get('steps') or ()))
+    doc.setdefault('n_ingredients', len(doc.get('ingredients') or ()))
+    doc[INGREDIENT_KEYS_FIELD] = canonical_ingredients(doc.get('ingredients'))
+    doc[ALLERGEN_FIELD] = recipe_allergens(doc)
+    return doc
+
+
+def parse_batch(rows):
+    """Worker: parse a batch of rows; returns (documents, number of bad rows)"""
+    docs = [parse_row(row) for row in rows]
+    good = [d for d in docs if d is not None]
+    return good, len(docs) - len(good)
+
+
+def read_batches(path, batch_size, skip=0):
+    """Yield lists of CSV row dicts, after skipping rows already loaded"""
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        for _ in range(skip):
+            if next(reader, None) is None:
+                return
+        batch = []
+        for row in reader:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def load_checkpoint(path, source):
+    """Rows of source already loaded, per the checkpoint file (0 if none)"""
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        state = json.load(f)
+    if state.get('source') != os.path.abspath(source):
+        print(f"Checkpoint {path} is for {state.get('source')}; starting from the top.")
+        return 0
+    return state.get('rows', 0)
+
+
+def save_checkpoint(path, source, rows):
+    if not path:
+        return
+    # Write then rename, so a crash never leaves half a checkpoint
+    temp = path + '.tmp'
+    with open(temp, 'w') as f:
+        json.dump({'source': os.path.abspath(source), 'rows': rows}, f)
+    os.replace(temp, path)
+
+
+def write_batch(collection, docs):
+    """insert_many, unordered; returns (inserted, already present)"""
+    if not docs:
+        return 0, 0
+    try:
+        return len(collection.insert_many(docs, ordered=False).inserted_ids), 0
+    except BulkWriteError as e:
+        errors = e.details.get('writeErrors', [])
+        if any(err.get('code') != DUPLICATE_KEY for err in errors):
+            raise
+        return e.details.get('nInserted', len(docs) - len(errors)), len(errors)
+
+
+def _parsed_batches(batches, workers):
+    """parse_batch over batches in order, at most 2 * workers batches in flight"""
+    if workers <= 1:
+        yield from ((len(rows), parse_batch(rows)) for rows in batches)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        pending = deque()
+        for rows in batches:
+            pending.append((len(rows), pool.apply_async(parse_batch, (rows,))))
+            if len(pending) >= 2 * workers:
+                size, result = pending.popleft()
+                yield size, result.get()
+        while pending:
+            size, result = pending.popleft()
+            yield size, result.get()
+
+
+def ingest_csv(collection, path, batch_size=1000, workers=1, checkpoint=None, report_every=10):
+    """Load every row of path into collection; returns a summary dict"""
+    collection.create_index(
+        SOURCE_ID_FIELD, unique=True,
+        partialFilterExpression={SOURCE_ID_FIELD: {'$exists': True}}
+    )
+    done = load_checkpoint(checkpoint, path)
+    if done:
+        print(f"Resuming after {done} rows.")
+    summary = {'rows': done, 'inserted': 0, 'duplicates': 0, 'bad_rows': 0}
+    start = time.perf_counter()
+    for batch_number, (size, (docs, bad)) in enumerate(
+            _parsed_batches(read_batches(path, batch_size, done), workers), 1):
+        inserted, duplicates = write_batch(collection, docs)
+        summary['rows'] += size
+        summary['inserted'] += inserted
+        summary['duplicates'] += duplicates
+        summary['bad_rows'] += bad
+        save_checkpoint(checkpoint, path, summary['rows'])
+        if batch_number % report_every == 0:
+            elapsed = time.perf_counter() - start
+            print(f"{summary['rows']} rows, {summary['inserted']} inserted "
+                  f"({(summary['rows'] - done) / elapsed:.0f} rows/s)")
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+def main():
+    from .mongo_connection import RecipeDatabase
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('csv_path')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--checkpoint', default=None,
+                        help="resume file (default: <csv_path>.checkpoint)")
+    parser.add_argument('--dedup', action='store_true',
+                        help="cluster near-duplicates (cluster_id) once loaded")
+    args = parser.parse_args()
+    checkpoint = args.checkpoint or args.csv_path + '.checkpoint'
+
+    db = RecipeDatabase()
+    if not db.connect():
+        raise SystemExit(1)
+    summary = ingest_csv(db.collection, args.csv_path, args.batch_size, args.workers, checkpoint)
+    print(f"Done: {summary['rows']} rows, {summary['inserted']} inserted, "
+          f"{summary['duplicates']} already present, {summary['bad_rows']} unusable "
+          f"in {summary['seconds']:.0f}s.")
+    db.collection.create_index(INGREDIENT_KEYS_FIELD)
+    db.collection.create_index(ALLERGEN_FIELD)
+    # Rarest-first ordering of ingredient searches reads these
+    db.build_ingredient_counts()
+    if args.dedup:
+        db.build_cluster_index()
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
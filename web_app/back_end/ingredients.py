@@ -0,0 +1,56 @@
+import re
+import sys
+
+# Field holding the canonical ingredient names, with a multikey index on it
+INGREDIENT_KEYS_FIELD = 'ingredient_keys'
+# Recipes per canonical name ({_id: name, count}), recounted at ingest
+INGREDIENT_COUNTS_COLLECTION = 'ingredient_counts'
+
+# Preparation words that don't change what the ingredient is
+QUALIFIERS = {
+    'fresh', 'freshly', 'chopped', 'finely', 'coarsely', 'roughly', 'diced',
+    'minced', 'sliced', 'thinly', 'grated', 'shredded', 'crushed', 'cubed',
+    'peeled', 'softened', 'melted', 'large', 'small', 'medium',
+}
+
+# Assumed to be in every kitchen when matching recipes to a pantry
+PANTRY_STAPLES = ('salt', 'water', 'pepper', 'black pepper')
+
+# Plurals the suffix rules below would get wrong
+IRREGULAR = {
+    'cookies': 'cookie', 'brownies': 'brownie', 'smoothies': 'smoothie',
+    'veggies': 'veggie', 'molasses': 'molasses', 'asparagus': 'asparagus',
+    'leaves': 'leaf', 'loaves': 'loaf', 'halves': 'half',
+}
+
+_NON_WORD = re.compile(r"[^a-z0-9&'-]+")
+
+
+def singular(word):
+    """Cheap plural stemming: tomatoes -> tomato, berries -> berry, eggs -> egg"""
+    if word in IRREGULAR:
+        return IRREGULAR[word]
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('oes', 'ches', 'shes', 'sses', 'xes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def normalize_ingredient(text):
+    """Canonical form of an ingredient: 'Fresh Chopped Tomatoes' -> 'tomato'"""
+    words = _NON_WORD.split((text or '').lower())
+    words = [singular(w) for w in words if w and w not in QUALIFIERS]
+    return sys.intern(' '.join(words))
+
+
+def canonical_ingredients(ingredients):
+    """Normalized, de-duplicated ingredient names in their original order"""
+    keys = []
+    for ingredient in ingredients or ():
+        key = normalize_ingredient(ingredient)
+        if key and key not in keys:
+            keys.append(key)
+    return keys
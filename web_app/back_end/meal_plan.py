@@ -0,0 +1,123 @@
+"""Meal plans of several days.
+
+Calling recommend_recipes once a day repeats recipes between days and runs
+every slot's queries again for each of them.  build_plan draws the
+candidates of each (meal, dish) slot once, enough for every day of the
+plan, and then fills the days from those pools: a recipe (or a near
+duplicate of it) is used at most once in the whole plan, and every use of
+a cuisine makes its other recipes less likely for the rest of the week.
+The number of queries does not depend on the number of days.
+
+With 'optimize_calories' set and a calorie range chosen, each day's dishes
+are picked jointly so the day lands in the range, as in plan_optimizer;
+otherwise each slot takes its best-valued candidate.  A slot whose pool
+runs out stays empty for the remaining days.
+"""
+import random
+from collections import Counter
+import numpy as np
+from .recipe_recommender import CALORIE_RANGES, CUISINE_TAGS, plan_key
+from .plan_optimizer import (
+    DEVIATION_WEIGHT, OPTIMIZER_CANDIDATES, choose_jointly, hard_filters, plan_slots,
+    slot_candidates, slot_query, slot_targets, split_shared,
+)
+
+MAX_PLAN_DAYS = 14
+PLAN_OVERFETCH = 3       # candidates drawn per day of the plan, per slot
+CUISINE_PENALTY = 0.5    # value lost for each earlier dish of the same cuisine
+
+_CUISINES = set(CUISINE_TAGS)
+
+
+def recipe_cuisine(recipe):
+    """The recipe's first cuisine tag, or None"""
+    return next((t for t in recipe.get('tags') or () if t in _CUISINES), None)
+
+
+def plan_calorie_range(user_preferences):
+    """The daily range to hold each day to, or None"""
+    if not user_preferences.get('optimize_calories'):
+        return None
+    try:
+        return CALORIE_RANGES.get(int(user_preferences.get('question2', 7)))
+    except (TypeError, ValueError):
+        return None
+
+
+def build_plan(user_preferences, database, days=7, profile=None, ranker=None):
+    """A plan of `days` days (at most MAX_PLAN_DAYS) with no recipe twice.
+
+    Returns [{'day': 1, 'meals': {meal: [recipes]}}, ...], meals in the
+    quiz's order.
+    """
+    days = max(1, min(int(days), MAX_PLAN_DAYS))
+    meal_types, slots = plan_slots(user_preferences)
+    calorie_range = plan_calorie_range(user_preferences)
+    common, cuisine_tags = hard_filters(user_preferences, calorie_range[1] if calorie_range else None)
+
+    # One pool per slot for the whole plan; cuisine is given up for a
+    # slot that has nothing in it
+    size = max(OPTIMIZER_CANDIDATES, days * PLAN_OVERFETCH)
+    pools = []
+    for slot in slots:
+        pool = []
+        for cuisine in ([cuisine_tags, None] if cuisine_tags else [None]):
+            pool = slot_candidates(database, slot_query(common, slot, cuisine), size, ranker)
+            if pool:
+                break
+        if profile:
+            pool = profile.rank(pool)
+        pools.append(pool)
+
+    ranked = profile or ranker is not None
+    # Standing of every candidate in its pool, best first
+    standing = [{plan_key(r): 1 - i / len(pool) for i, r in enumerate(pool)} for pool in pools]
+    targets = slot_targets(slots, sum(calorie_range) / 2) if calorie_range else None
+
+    used = set()
+    cuisine_uses = Counter()
+    plan = []
+    for day in range(1, days + 1):
+        remaining = split_shared([[r for r in pool if plan_key(r) not in used] for pool in pools])
+        values = []
+        for i, pool in enumerate(remaining):
+            value = np.array([random.random() for _ in pool])
+            if ranked:
+                value += np.array([standing[i][plan_key(r)] for r in pool])
+            value -= CUISINE_PENALTY * np.array([cuisine_uses[recipe_cuisine(r)] for r in pool])
+            values.append(value)
+
+        picks = None
+        if calorie_range and all(remaining):
+            calories = [np.array([float(r['nutrition']['calories']) for r in pool]) for pool in remaining]
+            values = [v - DEVIATION_WEIGHT * np.abs(kcal - target) / max(target, 1)
+                      for v, kcal, target in zip(values, calories, targets)]
+            picks = choose_jointly(calories, values, *calorie_range)
+            if picks is None:
+                print(f"Meal plan: day {day} misses {calorie_range[0]}-{calorie_range[1]} kcal.")
+        if picks is None:
+            # Slot by slot, so the day's own dishes count towards the penalty
+            picks = []
+            day_uses = Counter()
+            for pool, value in zip(remaining, values):
+                if not pool:
+                    picks.append(None)
+                    continue
+                value = value - CUISINE_PENALTY * np.array([day_uses[recipe_cuisine(r)] for r in pool])
+                picks.append(int(np.argmax(value)))
+                cuisine = recipe_cuisine(pool[picks[-1]])
+                if cuisine is not None:
+                    day_uses[cuisine] += 1
+
+        meals = {meal: [] for meal in meal_types}
+        for (meal, _), pool, j in zip(slots, remaining, picks):
+            if j is None:
+                continue
+            recipe = pool[j]
+            meals[meal].append(recipe)
+            used.add(plan_key(recipe))
+            cuisine = recipe_cuisine(recipe)
+            if cuisine is not None:
+                cuisine_uses[cuisine] += 1
+        plan.append({'day': day, 'meals': meals})
+    return plan
@@ -1,4 +1,4 @@
-from mongoengine import Document, StringField, IntField, EmailField, MapField, BooleanField, ReferenceField, DateField, FloatField, ListField
+from mongoengine import Document, EmbeddedDocument, EmbeddedDocumentField, StringField, IntField, EmailField, MapField, BooleanField, ReferenceField, DateField, FloatField, ListField, ObjectIdField, DictField
 from datetime import datetime
 from mongoengine import connect
 
@@ -10,6 +10,8 @@ class UserInformation(Document):
     username = StringField(required=True, unique=True)
     password = StringField(required=True)
     email = EmailField(required=True, unique=True)
+    # Bloom filter of recently recommended recipes (see back_end/seen_filter.py)
+    seen_filter = DictField()
 
 # Cook mode table
 class CookMode(Document):
@@ -115,34 +117,36 @@ class Requirements(Document):
     # User reference
     user = ReferenceField(UserInformation, required=True)
 
-# Recipe table
+# Nutrition facts embedded in every recipe document
+class Nutrition(EmbeddedDocument):
+    calories = FloatField(min_value=0)
+    total_fat = FloatField(min_value=0)       # % daily value
+    sugar = FloatField(min_value=0)           # % daily value
+    sodium = FloatField(min_value=0)          # % daily value
+    protein = FloatField(min_value=0)         # % daily value
+    saturated_fat = FloatField(min_value=0)   # % daily value
+    carbohydrates = FloatField(min_value=0)   # % daily value
+
+# Recipe table, matches the documents in recipe_database.recipes
+# (meal type, dish type, cuisine and diet are all stored as tags)
 class Recipe(Document):
-    meta = {'collection': 'recipes'}
-    
-    type = StringField(required=True) # 'breakfast'; 'brunch'; 'lunch'; 'dinner'
+    meta = {'collection': 'recipes', 'strict': False, 'indexes': ['ingredient_keys', 'allergens', 'cluster_id']}
     
     name = StringField(required=True)
-    time = IntField(min_value=0)  # in minutes
+    minutes = IntField(min_value=0)
     description = StringField()
     tags = ListField(StringField())
-    nutrition = ListField(StringField()) # can be change to detail
+    nutrition = EmbeddedDocumentField(Nutrition)
     n_steps = IntField(min_value=0)
     steps = ListField(StringField())
     ingredients = ListField(StringField())
-    
-    
-    #requirement part
-    '''
-    requirement = ReferenceField(Requirement)
-    cook_mode = ReferenceField(CookMode)
-    meal_type = ReferenceField(MealType)
-    allergy_preferences = ReferenceField(AllergyPreferences)
-    cuisine = ReferenceField(Cuisine)
-    '''
-    
-    # Metadata
-    user = ReferenceField(UserInformation, required=True)
-    timestamp = DateField(default=datetime.now)
+    n_ingredients = IntField(min_value=0)
+    # Canonical ingredient names (see back_end/ingredients.py), multikey indexed
+    ingredient_keys = ListField(StringField())
+    # Quiz allergy options found in the ingredients (see back_end/allergens.py)
+    allergens = ListField(StringField())
+    # _id of the first of its near-duplicates (see back_end/dedup.py)
+    cluster_id = ObjectIdField()
 
 
 class RecipeHistory(Document):
@@ -1,7 +1,13 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
 import json
+import re
 from bson import ObjectId
 from pprint import pprint
+from .serialization import dumps
+from .ingredients import INGREDIENT_KEYS_FIELD, INGREDIENT_COUNTS_COLLECTION, canonical_ingredients
+from .dedup import CLUSTER_FIELD, NearDuplicateIndex
+from .allergens import ALLERGEN_FIELD, recipe_allergens
+from .pagination import encode_token, keyset_query, sort_spec
 
 class JSONEncoder(json.JSONEncoder):
     def default(self, o):
@@ -81,9 +87,7 @@ class RecipeDatabase:
     def search_recipes_by_name(self, name_query, limit=10):
         """Search recipes by name using a text search"""
         try:
-            # Case-insensitive search using regex
-            query = {"name": {"$regex": name_query, "$options": "i"}}
-            recipes = list(self.collection.find(query).limit(limit))
+            recipes = list(self.collection.find(self.name_query(name_query)).limit(limit))
             return recipes
         except Exception as e:
             print(f"Error searching recipes: {e}")
@@ -92,8 +96,7 @@ class RecipeDatabase:
     def find_recipes_by_tags(self, tags, limit=10):
         """Find recipes that contain all specified tags"""
         try:
-            query = {"tags": {"$all": tags}}
-            recipes = list(self.collection.find(query).limit(limit))
+            recipes = list(self.collection.find(self.tags_query(tags)).limit(limit))
             return recipes
         except Exception as e:
             print(f"Error finding recipes by tags: {e}")
@@ -102,15 +105,163 @@ class RecipeDatabase:
     def find_recipes_by_ingredients(self, ingredients, limit=10):
         """Find recipes that contain all specified ingredients"""
         try:
-            # Create a regex pattern for each ingredient to make it case-insensitive
-            ingredient_patterns = [{"ingredients": {"$regex": ingredient, "$options": "i"}} 
-                                  for ingredient in ingredients]
-            query = {"$and": ingredient_patterns}
+            query = self.ingredients_query(ingredients)
+            if query is None:
+                return []
             recipes = list(self.collection.find(query).limit(limit))
             return recipes
         except Exception as e:
             print(f"Error finding recipes by ingredients: {e}")
             return []
+
+    # ── query builders shared by the list, page and stream methods ────
+    def name_query(self, name_query):
+        # Case-insensitive substring search; the text is escaped, so it is
+        # never read as a (possibly malformed or catastrophic) pattern
+        return {"name": {"$regex": re.escape(name_query), "$options": "i"}}
+
+    def tags_query(self, tags):
+        return {"tags": {"$all": tags}}
+
+    def ingredients_query(self, ingredients):
+        """$all over canonical ingredient names, or None if there are none"""
+        keys = canonical_ingredients(ingredients)
+        if not keys:
+            return None
+        # Rarest ingredient first: MongoDB scans the multikey index for
+        # the first $all value and filters the rest
+        counts = self.ingredient_counts(keys)
+        keys.sort(key=lambda k: (counts.get(k, 0), k))
+        return {INGREDIENT_KEYS_FIELD: {"$all": keys}}
+
+    # ── pagination and streaming ──────────────────────────────────────
+    def find_recipes_page(self, query=None, limit=10, page_token=None, sort_field='_id'):
+        """One page of results and the token for the next page (None on the last page).
+
+        Keyset pagination: the token records where the page ended, so every
+        page costs one bounded index scan however deep the browsing goes.
+        Raises InvalidPageToken for a token issued for another query.
+        """
+        query = dict(query or {})
+        cursor = self.collection.find(keyset_query(query, sort_field, page_token))
+        # One extra document tells whether there is a next page
+        recipes = list(cursor.sort(sort_spec(sort_field)).limit(limit + 1))
+        if len(recipes) <= limit:
+            return recipes, None
+        recipes = recipes[:limit]
+        return recipes, encode_token(query, sort_field, recipes[-1])
+
+    def iter_recipes(self, query=None, projection=None, batch_size=500):
+        """Yield matching recipes one at a time, fetched batch_size at a time"""
+        query = dict(query or {})
+        try:
+            cursor = self.collection.find(query, projection).batch_size(batch_size)
+            for recipe in cursor:
+                yield recipe
+        except Exception as e:
+            print(f"Error streaming recipes: {e}")
+
+    def ingredient_counts(self, keys):
+        """Number of recipes with each of keys, from the stored counts (0 if never counted)"""
+        try:
+            counts = self.collection.database[INGREDIENT_COUNTS_COLLECTION]
+            return {d['_id']: d['count'] for d in counts.find({"_id": {"$in": list(keys)}})}
+        except Exception as e:
+            print(f"Error loading ingredient counts: {e}")
+            return {}
+
+    def build_ingredient_counts(self):
+        """Recount the recipes per canonical ingredient into INGREDIENT_COUNTS_COLLECTION.
+
+        A full scan, so it runs offline: at ingest and with the ingredient
+        index, never on a request.
+        """
+        try:
+            pipeline = [
+                {"$unwind": f"${INGREDIENT_KEYS_FIELD}"},
+                {"$group": {"_id": f"${INGREDIENT_KEYS_FIELD}", "count": {"$sum": 1}}},
+                {"$out": INGREDIENT_COUNTS_COLLECTION},
+            ]
+            list(self.collection.aggregate(pipeline))
+            return True
+        except Exception as e:
+            print(f"Error counting ingredients: {e}")
+            return False
+
+    def build_ingredient_index(self, batch_size=1000):
+        """Store canonical ingredient names on every recipe and index them.
+
+        Safe to re-run; new recipes get the field at ingest instead.
+        """
+        try:
+            updated = 0
+            batch = []
+            for doc in self.collection.find({}, {"ingredients": 1}):
+                keys = canonical_ingredients(doc.get('ingredients'))
+                batch.append(UpdateOne({"_id": doc['_id']}, {"$set": {INGREDIENT_KEYS_FIELD: keys}}))
+                if len(batch) >= batch_size:
+                    updated += self.collection.bulk_write(batch, ordered=False).modified_count
+                    batch = []
+            if batch:
+                updated += self.collection.bulk_write(batch, ordered=False).modified_count
+            self.collection.create_index(INGREDIENT_KEYS_FIELD)
+            self.build_ingredient_counts()
+            print(f"Indexed ingredients of {updated} recipes.")
+            return updated
+        except Exception as e:
+            print(f"Error building ingredient index: {e}")
+            return None
+
+    def build_allergen_index(self, batch_size=1000):
+        """Flag every recipe's allergens from its ingredients and index the flags.
+
+        Safe to re-run (e.g. after the lexicons change); new recipes get the
+        field at ingest instead.
+        """
+        try:
+            updated = 0
+            batch = []
+            for doc in self.collection.find({}, {"ingredients": 1, INGREDIENT_KEYS_FIELD: 1}):
+                batch.append(UpdateOne({"_id": doc['_id']}, {"$set": {ALLERGEN_FIELD: recipe_allergens(doc)}}))
+                if len(batch) >= batch_size:
+                    updated += self.collection.bulk_write(batch, ordered=False).modified_count
+                    batch = []
+            if batch:
+                updated += self.collection.bulk_write(batch, ordered=False).modified_count
+            self.collection.create_index(ALLERGEN_FIELD)
+            print(f"Flagged allergens of {updated} recipes.")
+            return updated
+        except Exception as e:
+            print(f"Error building allergen index: {e}")
+            return None
+
+    def build_cluster_index(self, batch_size=1000):
+        """Give near-duplicate recipes (same ingredients, near-identical steps) a shared cluster_id.
+
+        One pass in _id order, so the oldest recipe of a cluster lends it its
+        id; returns the NearDuplicateIndex so an ingest can keep assigning
+        new recipes to the same clusters.
+        """
+        try:
+            index = NearDuplicateIndex()
+            clustered = 0
+            batch = []
+            projection = {"ingredients": 1, "steps": 1, INGREDIENT_KEYS_FIELD: 1}
+            for doc in self.collection.find({}, projection).sort("_id", 1):
+                cluster_id = index.add(doc['_id'], doc)
+                clustered += cluster_id != doc['_id']
+                batch.append(UpdateOne({"_id": doc['_id']}, {"$set": {CLUSTER_FIELD: cluster_id}}))
+                if len(batch) >= batch_size:
+                    self.collection.bulk_write(batch, ordered=False)
+                    batch = []
+            if batch:
+                self.collection.bulk_write(batch, ordered=False)
+            self.collection.create_index(CLUSTER_FIELD)
+            print(f"Found {clustered} near-duplicate recipes.")
+            return index
+        except Exception as e:
+            print(f"Error building cluster index: {e}")
+            return None
             
     def pretty_print_recipe(self, recipe):
         """Print a recipe in a readable format"""
@@ -141,7 +292,7 @@ class RecipeDatabase:
         
     def to_json(self, data):
         """Convert MongoDB data to JSON string"""
-        return json.dumps(data, cls=JSONEncoder, indent=2)
+        return dumps(data, indent=True)
 
 # Example usage
 if __name__ == "__main__":
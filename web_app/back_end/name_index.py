@@ -0,0 +1,100 @@
+import re
+import numpy as np
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_name(name):
+    return ' '.join(_NON_WORD.split((name or '').lower())).strip()
+
+
+def trigrams(text, complete=True):
+    """Trigrams of a normalized name, with each word padded by a space.
+
+    A query is usually still being typed, so its last word is not padded at
+    the end (complete=False): 'chick' should match 'chicken'.
+    """
+    grams = set()
+    words = text.split()
+    for i, word in enumerate(words):
+        padded = ' ' + word
+        if complete or i < len(words) - 1:
+            padded += ' '
+        for j in range(len(padded) - 2):
+            grams.add(padded[j:j + 3])
+    return grams
+
+
+class TrigramIndex:
+    """Ranked, typo-tolerant name lookup over an inverted trigram index.
+
+    Every trigram maps to a sorted int32 array of rows.  A query counts, per
+    row, how many of its trigrams the name shares (one vectorized increment
+    per query trigram) and ranks by that overlap, so a misspelling only costs
+    the few trigrams it touches.
+    """
+
+    # Longer queries are cut; also keeps the per-row counts within a uint8
+    MAX_QUERY_LENGTH = 64
+
+    def __init__(self, names=()):
+        self.size = 0
+        self.postings = {}
+        self.name_lengths = np.zeros(0, dtype=np.int32)
+        self._pending = {}
+        self._pending_lengths = []
+        self.add(names)
+
+    def add(self, names):
+        """Index more names; their rows continue after the existing ones"""
+        for name in names:
+            grams = trigrams(normalize_name(name))
+            for gram in grams:
+                self._pending.setdefault(gram, []).append(self.size)
+            self._pending_lengths.append(len(grams))
+            self.size += 1
+
+    def _flush(self):
+        if not self._pending_lengths:
+            return
+        for gram, rows in self._pending.items():
+            rows = np.array(rows, dtype=np.int32)
+            old = self.postings.get(gram)
+            self.postings[gram] = rows if old is None else np.concatenate((old, rows))
+        self.name_lengths = np.concatenate(
+            (self.name_lengths, np.array(self._pending_lengths, dtype=np.int32))
+        )
+        self._pending = {}
+        self._pending_lengths = []
+
+    def search(self, query, k=10, min_similarity=0.3):
+        """Top-k (row, score) pairs, best first"""
+        self._flush()
+        grams = trigrams(normalize_name(query)[:self.MAX_QUERY_LENGTH], complete=False)
+        lists = [self.postings[g] for g in grams if g in self.postings]
+        if not grams or not lists:
+            return []
+        shared = np.zeros(self.size, dtype=np.uint8)
+        for rows in lists:
+            # Rows are unique within a posting list, so += counts each once
+            shared[rows] += 1
+
+        # Ranking is by overlap first, so only rows at or above the k-th best
+        # overlap can make the top k; find that cutoff from a histogram
+        at_least = np.cumsum(np.bincount(shared, minlength=256)[::-1])[::-1]
+        cutoff = max(1, int(np.ceil(min_similarity * len(grams))))
+        while cutoff < 255 and at_least[cutoff + 1] >= k:
+            cutoff += 1
+        candidates = np.flatnonzero(shared >= cutoff)
+        if not len(candidates):
+            return []
+        overlap = shared[candidates].astype(np.float64)
+        # Ties on overlap go to names with little extra text; the bonus stays
+        # below 1 so it never outweighs one more shared trigram
+        scores = (overlap + overlap / (self.name_lengths[candidates] + len(grams))) / len(grams)
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.lexsort((candidates[top], -scores[top]))]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
@@ -0,0 +1,78 @@
+import base64
+import hashlib
+from bson import json_util
+
+
+class InvalidPageToken(ValueError):
+    """A continuation token that is malformed or belongs to another query"""
+
+
+# Operators whose lists are sets: their order doesn't change the matches
+_SET_OPERATORS = ('$all', '$in', '$nin')
+
+
+def _canonical(value):
+    if isinstance(value, dict):
+        return {k: sorted(_canonical(v), key=repr) if k in _SET_OPERATORS and isinstance(v, list)
+                else _canonical(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def query_fingerprint(query, sort_field):
+    """Short hash tying a token to the query and sort it was issued for.
+
+    Set operands are sorted first, so workers that order them differently
+    (e.g. rarest ingredient first, by their own counts) accept each
+    other's tokens.
+    """
+    canonical = json_util.dumps([_canonical(query), sort_field], sort_keys=True)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:12]
+
+
+def encode_token(query, sort_field, last):
+    """Opaque continuation token after the document `last`"""
+    state = {'q': query_fingerprint(query, sort_field), 'id': last['_id']}
+    if sort_field != '_id':
+        state['k'] = last.get(sort_field)
+    raw = json_util.dumps(state).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_token(token, query, sort_field):
+    """The last sort key and _id of the previous page"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        state = json_util.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise InvalidPageToken("malformed page token")
+    if not isinstance(state, dict) or state.get('q') != query_fingerprint(query, sort_field):
+        raise InvalidPageToken("page token does not belong to this query")
+    return state.get('k'), state['id']
+
+
+def keyset_query(query, sort_field, token):
+    """query restricted to documents after the token, in (sort_field, _id) order.
+
+    Each page is an index range scan from where the last one ended, so page
+    1000 costs the same as page 1 (unlike skip, which walks every skipped
+    document).
+    """
+    if token is None:
+        return query
+    key, last_id = decode_token(token, query, sort_field)
+    if sort_field == '_id':
+        after = {'_id': {'$gt': last_id}}
+    else:
+        after = {'$or': [
+            {sort_field: {'$gt': key}},
+            {sort_field: key, '_id': {'$gt': last_id}},
+        ]}
+    return {'$and': [query, after]} if query else after
+
+
+def sort_spec(sort_field):
+    if sort_field == '_id':
+        return [('_id', 1)]
+    return [(sort_field, 1), ('_id', 1)]
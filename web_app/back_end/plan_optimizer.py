@@ -0,0 +1,216 @@
+"""Day plans whose calories add up.
+
+recommend_recipes fills every slot on its own, inside a calorie window cut
+from the daily range, and relaxes the window when a slot has no match; the
+day's total often ends up outside the range.  optimize_plan instead draws a
+pool of candidates per slot with the hard constraints only (diet,
+allergies, exclusions, time, ...) and picks one recipe per slot jointly: a
+dynamic program over the day's calories in CALORIE_BUCKET steps keeps, for
+every reachable total, the best-valued combination so far.  A candidate's
+value is a random draw (for variety), plus its standing with the ranker or
+the user's taste profile, minus how far it strays from the slot's usual
+share of the day.
+
+When there is nothing to optimize, a slot has no candidates, no
+combination lands in the range or the latency budget runs out, the plan
+comes from recommend_recipes as before.
+"""
+import random
+import time
+import numpy as np
+from .recipe_recommender import (
+    CALORIE_RANGES, DISH_WEIGHTS, MEAL_WEIGHT_RANGES, recommend_recipes, quiz_filters,
+    nutrient_filters, beginner, dish_tags, plan_key, find_candidates, remember_pool,
+)
+
+CALORIE_BUCKET = 10        # kcal
+OPTIMIZER_CANDIDATES = 40  # per slot
+DEVIATION_WEIGHT = 1.0     # value lost per 100% off the slot's share
+DEFAULT_BUDGET_MS = 200
+
+
+def slot_targets(slots, daily_calories):
+    """Usual calories of each (meal, dish) slot, by the recommender's weights"""
+    meals = list(dict.fromkeys(meal for meal, _ in slots))
+    meal_weight = {m: sum(MEAL_WEIGHT_RANGES.get(m, (1.0, 1.0))) / 2 for m in meals}
+    total_meal_weight = sum(meal_weight.values())
+    targets = []
+    for meal, dish in slots:
+        share = meal_weight[meal] / total_meal_weight
+        if dish is not None:
+            dishes = [d for m, d in slots if m == meal]
+            share *= DISH_WEIGHTS.get(dish, 1.0) / sum(DISH_WEIGHTS.get(d, 1.0) for d in dishes)
+        targets.append(daily_calories * share)
+    return targets
+
+
+def choose_jointly(calories, values, low, high):
+    """One candidate per slot, total calories within [low, high], maximum total value.
+
+    calories and values hold one array per slot.  Returns the chosen index
+    of every slot, or None if no combination fits.  States are calorie
+    buckets; each also carries the exact total of its best path, so the
+    answer is checked against the range without rounding error.
+    """
+    n_buckets = int(high // CALORIE_BUCKET) + 1
+    best = np.full(n_buckets, -np.inf)
+    best[0] = 0.0
+    total = np.zeros(n_buckets)
+    choices = []
+    for slot_calories, slot_values in zip(calories, values):
+        new_best = np.full(n_buckets, -np.inf)
+        new_total = np.zeros(n_buckets)
+        choice = np.full(n_buckets, -1, dtype=np.int64)
+        for j, (kcal, value) in enumerate(zip(slot_calories, slot_values)):
+            shift = int(round(kcal / CALORIE_BUCKET))
+            if shift >= n_buckets:
+                continue
+            reached = best[:n_buckets - shift] + value
+            better = reached > new_best[shift:]
+            new_best[shift:][better] = reached[better]
+            new_total[shift:][better] = total[:n_buckets - shift][better] + kcal
+            choice[shift:][better] = j
+        best, total = new_best, new_total
+        choices.append(choice)
+
+    feasible = np.isfinite(best) & (total >= low) & (total <= high)
+    if not feasible.any():
+        return None
+    bucket = int(np.argmax(np.where(feasible, best, -np.inf)))
+    picks = []
+    for slot_calories, choice in zip(reversed(calories), reversed(choices)):
+        j = int(choice[bucket])
+        picks.append(j)
+        bucket -= int(round(slot_calories[j] / CALORIE_BUCKET))
+    return picks[::-1]
+
+
+def plan_slots(user_preferences):
+    """The plan's meals and its (meal, dish) slots; breakfast/brunch have no dish"""
+    meal_types = user_preferences.get('question6') or ['breakfast', 'lunch', 'dinner']
+    dish_types = dish_tags(user_preferences.get('question7', [1])) or ['main-dish']
+    slots = [(meal, None) if meal in ('breakfast', 'brunch') else (meal, dish)
+             for meal in meal_types
+             for dish in ([None] if meal in ('breakfast', 'brunch') else dish_types)]
+    return meal_types, slots
+
+
+def hard_filters(user_preferences, max_calories=None):
+    """Query parts every slot keeps, and the cuisine tags (which a slot may give up)"""
+    common = []
+    base = quiz_filters(user_preferences)
+    if base:
+        common.append(base)
+    if beginner(user_preferences):
+        common.append({"tags": {"$in": ['easy', 'beginner-cook']}})
+    common.extend(nutrient_filters(user_preferences.get('nutrients')))
+    if max_calories is not None:
+        common.append({"nutrition.calories": {"$gte": 0, "$lte": max_calories}})
+    cuisine_tags = [c for c in user_preferences.get('question4') or () if isinstance(c, str) and c != 'any']
+    return common, cuisine_tags
+
+
+def slot_query(common, slot, cuisine_tags=None):
+    meal, dish = slot
+    parts = common + [{"tags": {"$in": [meal]}} if dish is None else {"tags": dish}]
+    if cuisine_tags:
+        parts.append({"tags": {"$in": cuisine_tags}})
+    return {"$and": parts}
+
+
+def slot_candidates(database, query, pool, ranker):
+    """Matches for a slot: the best by quality with a ranker, else a random sample"""
+    if ranker is not None:
+        return find_candidates(database, query, pool, ranker)
+    cursor = database.find(query)
+    rows = getattr(cursor, 'rows', None)
+    if rows is not None and len(rows) > pool:
+        # Corpus: sample all the matches, not just the first few
+        cursor.rows = np.sort(np.asarray(rows)[random.sample(range(len(rows)), pool)])
+        return list(cursor)
+    return list(cursor.limit(pool))
+
+
+def split_shared(pools):
+    """A recipe (or near-duplicate) may fill only one slot; each shared one goes to the
+    slot holding the fewest candidates so far (the first of them on a tie)"""
+    holders = {}
+    for i, pool in enumerate(pools):
+        for recipe in pool:
+            holders.setdefault(plan_key(recipe), {})[i] = None
+    sizes = [0] * len(pools)
+    for slots in holders.values():
+        if len(slots) == 1:
+            sizes[next(iter(slots))] += 1
+    owner = {}
+    for key, slots in holders.items():
+        owner[key] = min(slots, key=lambda i: sizes[i])
+        if len(slots) > 1:
+            sizes[owner[key]] += 1
+    return [[r for r in pool if owner[plan_key(r)] == i] for i, pool in enumerate(pools)]
+
+
+def optimize_plan(user_preferences, database, profile=None, ranker=None, seen=None, pools=None,
+                  budget_ms=DEFAULT_BUDGET_MS):
+    """Like recommend_recipes, but with the day's calories inside the chosen range"""
+    start = time.perf_counter()
+    deadline = start + budget_ms / 1000
+
+    def fall_back(reason):
+        print(f"Calorie optimizer: {reason}; filling slots one by one.")
+        return recommend_recipes(user_preferences, database, profile, ranker, seen, pools)
+
+    try:
+        calorie_option = int(user_preferences.get('question2', 7))
+    except (TypeError, ValueError):
+        calorie_option = 7
+    if calorie_option not in CALORIE_RANGES:
+        return recommend_recipes(user_preferences, database, profile, ranker, seen, pools)
+    low, high = CALORIE_RANGES[calorie_option]
+
+    meal_types, slots = plan_slots(user_preferences)
+    # Hard constraints shared by every slot; cuisine is given up for a
+    # slot that has nothing in it
+    common, cuisine_tags = hard_filters(user_preferences, high)
+
+    candidates = []
+    for slot in slots:
+        pool = []
+        for cuisine in ([cuisine_tags, None] if cuisine_tags else [None]):
+            pool = slot_candidates(database, slot_query(common, slot, cuisine), OPTIMIZER_CANDIDATES, ranker)
+            if pool:
+                break
+        if seen:
+            # Recently recommended recipes only if the slot has nothing else
+            pool = [r for r in pool if plan_key(r) not in seen] or pool
+        if profile:
+            pool = profile.rank(pool)
+        candidates.append(pool)
+        if time.perf_counter() > deadline:
+            return fall_back("over the latency budget")
+    candidates = split_shared(candidates)
+    if not all(candidates):
+        return fall_back("a slot has no candidates")
+
+    targets = slot_targets(slots, (low + high) / 2)
+    ranked = profile or ranker is not None
+    calories, values = [], []
+    for pool, target in zip(candidates, targets):
+        kcal = np.array([float(r['nutrition']['calories']) for r in pool])
+        value = np.array([random.random() for _ in pool])
+        if ranked:
+            value += 1 - np.arange(len(pool)) / len(pool)
+        value -= DEVIATION_WEIGHT * np.abs(kcal - target) / max(target, 1)
+        calories.append(kcal)
+        values.append(value)
+
+    picks = choose_jointly(calories, values, low, high)
+    if picks is None:
+        return fall_back(f"no combination lands in {low}-{high} kcal")
+    recommendations = {meal: [] for meal in meal_types}
+    for (meal, _), pool, j in zip(slots, candidates, picks):
+        recommendations[meal].append(pool[j])
+        remember_pool(pools, pool[j], pool)
+    print(f"Calorie optimizer: {sum(c[j] for c, j in zip(calories, picks)):.0f} kcal "
+          f"in {low}-{high}, {(time.perf_counter() - start) * 1000:.0f} ms")
+    return recommendations
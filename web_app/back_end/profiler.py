@@ -0,0 +1,176 @@
+"""Opt-in per-request profiler.
+
+Nothing is registered unless one of these is set when the app starts, so the
+disabled profiler costs nothing:
+
+    PROFILE_REQUESTS=1         profile every request
+    PROFILE_SAMPLE_RATE=0.01   profile a random fraction of requests
+    PROFILE_SECRET=<secret>    profile requests carrying
+                               X-Profile: hmac_sha256(secret, path).hexdigest()
+
+Each profiled request writes two files to PROFILE_DIR (default ./profiles):
+a collapsed-stack file (<name>.collapsed, readable by flamegraph.pl and
+speedscope) and a <name>.json summary with the route, the quiz preference
+signature, wall time and the MongoDB time per command.
+"""
+import hashlib
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from pymongo import monitoring
+from .serialization import dumps
+
+_active = threading.local()
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval from a helper thread"""
+
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            key = ';'.join(reversed(stack))
+            self.counts[key] = self.counts.get(key, 0) + 1
+            self.samples += 1
+
+    def collapsed(self):
+        """Stacks in Brendan Gregg's collapsed format, one 'a;b;c count' per line"""
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(self.counts.items()))
+
+
+class MongoTimer(monitoring.CommandListener):
+    """Adds the duration of every MongoDB command to the profile running in its thread"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._add(event)
+
+    def failed(self, event):
+        self._add(event)
+
+    def _add(self, event):
+        session = getattr(_active, 'session', None)
+        if session is None:
+            return
+        stats = session.mongo.setdefault(event.command_name, {'count': 0, 'ms': 0.0})
+        stats['count'] += 1
+        stats['ms'] += event.duration_micros / 1000
+
+
+class ProfileSession:
+    def __init__(self, interval):
+        self.sampler = StackSampler(threading.get_ident(), interval)
+        self.mongo = {}
+        self.started_at = time.perf_counter()
+
+    def start(self):
+        _active.session = self
+        self.sampler.start()
+
+    def stop(self):
+        self.sampler.stop()
+        _active.session = None
+        return (time.perf_counter() - self.started_at) * 1000
+
+
+def preference_signature(prefs):
+    """Short stable hash of a preference payload, used to tag profile files"""
+    return hashlib.sha1(dumps(prefs).encode('utf-8')).hexdigest()[:10] if prefs else 'none'
+
+
+def profile_token(secret, path):
+    """Value of the X-Profile header that enables profiling for a path"""
+    return hmac.new(secret.encode('utf-8'), path.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def init_profiler(app, preferences=None, environ=None):
+    """Register the profiling hooks on a Flask app if profiling is configured.
+
+    preferences is an optional callable returning the current request's quiz
+    preferences; it is only called for profiled requests.
+    """
+    from flask import g, request
+
+    environ = os.environ if environ is None else environ
+    always = environ.get('PROFILE_REQUESTS', '0') == '1'
+    sample_rate = float(environ.get('PROFILE_SAMPLE_RATE', '0') or 0)
+    secret = environ.get('PROFILE_SECRET', '')
+    if not (always or sample_rate > 0 or secret):
+        return False
+
+    out_dir = environ.get('PROFILE_DIR', 'profiles')
+    interval = float(environ.get('PROFILE_INTERVAL_MS', '1')) / 1000
+    os.makedirs(out_dir, exist_ok=True)
+    # Command listeners only apply to clients created afterwards, so call
+    # init_profiler before connecting to MongoDB
+    monitoring.register(MongoTimer())
+
+    def wanted():
+        if always or (sample_rate > 0 and random.random() < sample_rate):
+            return True
+        header = request.headers.get('X-Profile')
+        return bool(secret and header and hmac.compare_digest(header, profile_token(secret, request.path)))
+
+    @app.before_request
+    def start_profile():
+        if wanted():
+            g._profile = ProfileSession(interval)
+            g._profile.start()
+
+    @app.teardown_request
+    def write_profile(exc):
+        session = g.pop('_profile', None)
+        if session is None:
+            return
+        wall_ms = session.stop()
+        prefs = preferences() if preferences else None
+        signature = preference_signature(prefs)
+        route = request.endpoint or 'unknown'
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        name = os.path.join(out_dir, f"{stamp}_{route}_{signature}")
+        with open(name + '.collapsed', 'w') as f:
+            f.write(session.sampler.collapsed())
+        with open(name + '.json', 'w') as f:
+            f.write(dumps({
+                'route': route,
+                'method': request.method,
+                'path': request.path,
+                'error': repr(exc) if exc else None,
+                'preferences_signature': signature,
+                'preferences': prefs,
+                'wall_ms': round(wall_ms, 3),
+                'samples': session.sampler.samples,
+                'interval_ms': interval * 1000,
+                'mongo_ms': round(sum(s['ms'] for s in session.mongo.values()), 3),
+                'mongo': session.mongo,
+            }, indent=True))
+
+    return True
@@ -0,0 +1,134 @@
+import time
+from collections import OrderedDict
+import numpy as np
+from .ingredients import INGREDIENT_KEYS_FIELD, canonical_ingredients
+
+PROFILES_COLLECTION = 'user_profiles'
+
+
+def _field_name(key):
+    # Dots and dollar signs can't appear in MongoDB field names
+    return key.replace('.', ' ').replace('$', ' ') if '.' in key or '$' in key else key
+
+
+def feature_keys(recipe):
+    """Profile features of a recipe: 't:<tag>' and 'i:<ingredient>'"""
+    keys = recipe.get(INGREDIENT_KEYS_FIELD)
+    if keys is None:
+        keys = canonical_ingredients(recipe.get('ingredients'))
+    features = ['t:' + _field_name(t) for t in recipe.get('tags') or ()]
+    features.extend('i:' + _field_name(k) for k in keys)
+    return features
+
+
+def profile_update(recipe, sign=1):
+    """The $inc that adds (sign=1) or removes (sign=-1) one saved recipe"""
+    inc = {f'weights.{feature}': sign for feature in dict.fromkeys(feature_keys(recipe))}
+    inc['saves'] = sign
+    return {'$inc': inc}
+
+
+class TasteProfile:
+    """A user's tag and ingredient weights: how many of their saved recipes have each.
+
+    Kept as a feature -> position dict plus one float32 array, with a zero
+    slot at the end for features the user has never saved.
+    """
+
+    def __init__(self, weights=None, saves=0):
+        weights = {f: w for f, w in (weights or {}).items() if w > 0}
+        self.index = {feature: i for i, feature in enumerate(weights)}
+        self.weights = np.zeros(len(weights) + 1, dtype=np.float32)
+        self.weights[:-1] = list(weights.values())
+        self.saves = saves
+
+    @classmethod
+    def from_document(cls, doc):
+        return cls(doc.get('weights'), doc.get('saves', 0)) if doc else cls()
+
+    def __bool__(self):
+        return self.saves > 0 and len(self.index) > 0
+
+    def scores(self, recipes):
+        """Affinity of each recipe to the profile, as a float32 array.
+
+        Each recipe is a sparse 0/1 row over the profile's features; the dot
+        products of all rows are one gather and one segmented sum.  Rows are
+        divided by the square root of their length so recipes with long tag
+        lists don't win by size alone.
+        """
+        features = [feature_keys(r) for r in recipes]
+        lengths = np.fromiter((len(f) for f in features), dtype=np.int64, count=len(features))
+        missing = len(self.index)
+        columns = np.fromiter(
+            (self.index.get(f, missing) for row in features for f in row),
+            dtype=np.int64, count=int(lengths.sum())
+        )
+        rows = np.repeat(np.arange(len(features)), lengths)
+        totals = np.bincount(rows, weights=self.weights[columns], minlength=len(features))
+        return (totals / np.sqrt(np.maximum(lengths, 1))).astype(np.float32)
+
+    def rank(self, recipes):
+        """The recipes, best match first (ties keep their order)"""
+        if not self or len(recipes) < 2:
+            return list(recipes)
+        order = np.argsort(-self.scores(recipes), kind='stable')
+        return [recipes[i] for i in order]
+
+
+class ProfileStore:
+    """Taste profiles in MongoDB, with a small per-process LRU cache.
+
+    Saving or unsaving a recipe applies a single $inc to the user's profile
+    document rather than recomputing it from saved_recipes.  Other workers
+    pick the change up when their cached copy expires after TTL seconds.
+    """
+
+    MAX_CACHED = 1024
+    TTL = 60
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._cache = OrderedDict()
+
+    def get(self, username):
+        cached = self._cache.get(username)
+        if cached is not None and time.monotonic() - cached[0] < self.TTL:
+            self._cache.move_to_end(username)
+            return cached[1]
+        try:
+            profile = TasteProfile.from_document(self.collection.find_one({'user': username}))
+        except Exception as e:
+            print(f"Error loading taste profile: {e}")
+            return TasteProfile()
+        self._cache[username] = (time.monotonic(), profile)
+        self._cache.move_to_end(username)
+        if len(self._cache) > self.MAX_CACHED:
+            self._cache.popitem(last=False)
+        return profile
+
+    def record(self, username, recipe, sign=1):
+        """Add (sign=1) or remove (sign=-1) a saved recipe from the user's profile"""
+        if recipe is None:
+            return
+        try:
+            self.collection.update_one({'user': username}, profile_update(recipe, sign), upsert=True)
+        except Exception as e:
+            print(f"Error updating taste profile: {e}")
+        self.forget(username)
+
+    def forget(self, username):
+        self._cache.pop(username, None)
+
+    def rebuild(self, username, saved_recipes):
+        """Recompute a profile from scratch, e.g. for users who saved recipes before profiles existed"""
+        weights = {}
+        for recipe in saved_recipes:
+            for feature in dict.fromkeys(feature_keys(recipe)):
+                weights[feature] = weights.get(feature, 0) + 1
+        self.collection.replace_one(
+            {'user': username},
+            {'user': username, 'weights': weights, 'saves': len(saved_recipes)},
+            upsert=True
+        )
+        self.forget(username)
@@ -0,0 +1,254 @@
+"""Global recipe quality ranker.
+
+A logistic regression over simple recipe features (tags, minutes, n_steps,
+ingredient count and nutrition), trained offline on which recipes users
+saved.  The weights are a small JSON file; the recommender scores the
+candidates of a slot with one matrix-vector product and keeps the best.
+
+    python -m back_end.ranker --out data/ranker.json
+
+Run from the web_app directory.
+"""
+import argparse
+import json
+import os
+import numpy as np
+from .recipe_record import NUTRIENTS
+
+DEFAULT_WEIGHTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               'data', 'ranker.json')
+
+# Numeric features, all log1p-transformed then standardized
+NUMERIC_FEATURES = ('minutes', 'n_steps', 'n_ingredients') + tuple(f'nutrition.{n}' for n in NUTRIENTS)
+# The most common tags in the training data get a weight each
+TAG_FEATURES = 100
+# The document fields the features are computed from
+FEATURE_FIELDS = ('minutes', 'n_steps', 'ingredients', 'nutrition', 'tags')
+
+
+def _numeric_value(recipe, feature):
+    if feature == 'n_ingredients':
+        return len(recipe.get('ingredients') or ())
+    if feature.startswith('nutrition.'):
+        value = (recipe.get('nutrition') or {}).get(feature[len('nutrition.'):])
+    else:
+        value = recipe.get(feature)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return np.nan
+
+
+class QualityRanker:
+    """Linear scores (log-odds of being saved) for recipes"""
+
+    def __init__(self, tags, weights, bias=0.0, mean=None, std=None):
+        self.tags = list(tags)
+        self.tag_index = {tag: i for i, tag in enumerate(self.tags)}
+        n_numeric = len(NUMERIC_FEATURES)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = float(bias)
+        self.mean = np.zeros(n_numeric, np.float32) if mean is None else np.asarray(mean, np.float32)
+        self.std = np.ones(n_numeric, np.float32) if std is None else np.asarray(std, np.float32)
+        self._scored = (None, None)     # (corpus, scores of its rows)
+
+    # ── features ──────────────────────────────────────────────────────
+    def _standardize(self, numeric):
+        numeric = np.log1p(np.clip(numeric, 0, None))
+        numeric = (numeric - self.mean) / self.std
+        # Unknown values sit at the mean
+        numeric[np.isnan(numeric)] = 0
+        return numeric.astype(np.float32)
+
+    def features(self, recipes):
+        """Feature matrix (recipes x features), numeric columns first"""
+        n_numeric = len(NUMERIC_FEATURES)
+        X = np.zeros((len(recipes), n_numeric + len(self.tags)), dtype=np.float32)
+        numeric = np.array(
+            [[_numeric_value(r, f) for f in NUMERIC_FEATURES] for r in recipes],
+            dtype=np.float64
+        ).reshape(len(recipes), n_numeric)
+        X[:, :n_numeric] = self._standardize(numeric)
+        for i, recipe in enumerate(recipes):
+            for tag in recipe.get('tags') or ():
+                j = self.tag_index.get(tag)
+                if j is not None:
+                    X[i, n_numeric + j] = 1
+        return X
+
+    def score_matrix(self, X):
+        return X @ self.weights + self.bias
+
+    def scores(self, recipes):
+        return self.score_matrix(self.features(recipes))
+
+    def corpus_scores(self, corpus):
+        """Scores of every corpus row, computed once per corpus (and for rows added since).
+
+        The numeric block is one product over column arrays; tag weights are
+        added through the corpus's tag postings rather than one-hot columns.
+        """
+        scored, cached = self._scored
+        if scored is not corpus:
+            cached = None
+        start = 0 if cached is None else len(cached)
+        if start == corpus.size:
+            return cached
+        numeric = np.empty((corpus.size - start, len(NUMERIC_FEATURES)), dtype=np.float64)
+        for j, feature in enumerate(NUMERIC_FEATURES):
+            if feature == 'n_ingredients':
+                numeric[:, j] = [len(r.ingredients) for r in corpus.recipes[start:]]
+            else:
+                numeric[:, j] = corpus.columns[feature][start:]
+        scores = self._standardize(numeric) @ self.weights[:len(NUMERIC_FEATURES)] + self.bias
+        tag_weights = self.weights[len(NUMERIC_FEATURES):]
+        postings = corpus.list_index['tags']
+        for tag, weight in zip(self.tags, tag_weights):
+            rows = postings.get(tag)
+            if rows is not None and weight:
+                rows = rows[rows >= start] - start
+                scores[rows] += weight
+        scores = scores.astype(np.float32)
+        if cached is not None:
+            scores = np.concatenate((cached, scores))
+        self._scored = (corpus, scores)
+        return scores
+
+    # ── training and storage ─────────────────────────────────────────
+    @classmethod
+    def train(cls, recipes, labels, sample_weight=None, l2=1e-3, epochs=500, learning_rate=0.5):
+        """Fit a logistic regression by full-batch gradient descent"""
+        counts = {}
+        for recipe in recipes:
+            for tag in recipe.get('tags') or ():
+                counts[tag] = counts.get(tag, 0) + 1
+        tags = sorted(counts, key=lambda t: (-counts[t], t))[:TAG_FEATURES]
+
+        numeric = np.array(
+            [[_numeric_value(r, f) for f in NUMERIC_FEATURES] for r in recipes], dtype=np.float64
+        ).reshape(len(recipes), len(NUMERIC_FEATURES))
+        logged = np.log1p(np.clip(numeric, 0, None))
+        # Mean and spread of the known values; a feature nobody has stays 0/1
+        known = ~np.isnan(logged)
+        count = np.maximum(known.sum(axis=0), 1)
+        mean = np.where(known, logged, 0).sum(axis=0) / count
+        std = np.sqrt(np.where(known, (logged - mean) ** 2, 0).sum(axis=0) / count)
+        std = np.where(std > 0, std, 1)
+        model = cls(tags, np.zeros(len(NUMERIC_FEATURES) + len(tags)), 0.0, mean, std)
+
+        X = model.features(recipes).astype(np.float64)
+        y = np.asarray(labels, dtype=np.float64)
+        sw = np.ones(len(y)) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+        sw = sw / sw.sum()
+        w = np.zeros(X.shape[1])
+        b = 0.0
+        for _ in range(epochs):
+            p = 1 / (1 + np.exp(-(X @ w + b)))
+            error = (p - y) * sw
+            w -= learning_rate * (X.T @ error + l2 * w)
+            b -= learning_rate * error.sum()
+        model.weights = w.astype(np.float32)
+        model.bias = float(b)
+        return model
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({
+                'numeric_features': list(NUMERIC_FEATURES),
+                'tags': self.tags,
+                'weights': [round(float(w), 6) for w in self.weights],
+                'bias': self.bias,
+                'mean': [float(m) for m in self.mean],
+                'std': [float(s) for s in self.std],
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('numeric_features') != list(NUMERIC_FEATURES):
+            raise ValueError("ranker weights were trained on different features")
+        return cls(data['tags'], data['weights'], data['bias'], data['mean'], data['std'])
+
+
+def top_k(scores, k):
+    """Positions of the k highest scores, best first (ties by position).
+
+    A partial selection, O(n + k log k): with thousands of candidates it is
+    several times faster than pushing them through heapq.
+    """
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.zeros(0, dtype=np.int64)
+    if n > k:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(n)
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+
+# ── process-wide model used by the web app ───────────────────────────
+_shared_ranker = None
+
+
+def get_ranker(path=None):
+    """Load the weights once per process; None if no model has been trained"""
+    global _shared_ranker
+    if _shared_ranker is None:
+        path = path or os.environ.get('RANKER_WEIGHTS', DEFAULT_WEIGHTS)
+        if not os.path.exists(path):
+            return None
+        try:
+            _shared_ranker = QualityRanker.load(path)
+        except Exception as e:
+            print(f"Error loading ranker weights: {e}")
+            return None
+    return _shared_ranker
+
+
+def training_data(db, negatives_per_positive=4):
+    """Saved recipes (weighted by how many users saved them) against a random sample of the rest"""
+    saves = {
+        d['_id']: d['count'] for d in db.db['saved_recipes'].aggregate([
+            {"$group": {"_id": "$recipe_id", "count": {"$sum": 1}}}
+        ])
+    }
+    projection = {'description': 0, 'steps': 0}
+    positives = list(db.collection.find({'_id': {'$in': list(saves)}}, projection))
+    negatives = [
+        d for d in db.collection.aggregate([
+            {"$sample": {"size": negatives_per_positive * len(positives)}},
+            {"$project": projection},
+        ])
+        if d['_id'] not in saves
+    ]
+    recipes = positives + negatives
+    labels = [1] * len(positives) + [0] * len(negatives)
+    weights = [saves[r['_id']] for r in positives] + [1] * len(negatives)
+    return recipes, labels, weights
+
+
+def main():
+    from .mongo_connection import RecipeDatabase
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--out', default=DEFAULT_WEIGHTS)
+    parser.add_argument('--negatives', type=int, default=4)
+    args = parser.parse_args()
+
+    db = RecipeDatabase()
+    if not db.connect():
+        raise SystemExit(1)
+    recipes, labels, weights = training_data(db, args.negatives)
+    if not any(labels):
+        print("No saved recipes to learn from.")
+        raise SystemExit(1)
+    model = QualityRanker.train(recipes, labels, weights)
+    model.save(args.out)
+    print(f"Trained on {sum(labels)} saved and {len(labels) - sum(labels)} other recipes; "
+          f"wrote {args.out}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
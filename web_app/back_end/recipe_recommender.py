@@ -1,7 +1,210 @@
 import random
 import copy
+import numpy as np
+from .recipe_record import NUTRIENTS
+from .dedup import CLUSTER_FIELD
+from .allergens import ALLERGEN_FIELD
+from .ingredients import INGREDIENT_KEYS_FIELD, canonical_ingredients
+from .ranker import FEATURE_FIELDS, top_k
 
-def recommend_recipes(user_preferences, database):
+DIET_TAGS = ['vegetarian', 'vegan', 'gluten-free', 'kosher', 'lactose-free']
+ALLERGY_TAGS = ['eggs_dairy', 'seafood', 'nuts']
+
+TIME_RANGES = {
+    1: (0, 30), 2: (30, 60), 3: (60, 90),
+    4: (90, 120), 5: (120, float('inf'))
+}
+
+# Daily calorie range of each quiz answer (7 is "no preference")
+CALORIE_RANGES = {
+    1: (1200, 1400), 2: (1400, 1600), 3: (1600, 1800),
+    4: (1800, 2200), 5: (2200, 2500), 6: (2500, 3000)
+}
+
+# Dish & meal type weights for calorie distribution (a meal's weight is
+# drawn from its range for every plan)
+DISH_WEIGHTS = {
+    "main-dish": 2.1, "side-dishes": 1.0, "desserts": 0.9,
+    "appetizers": 0.7, "soups-stews": 0.8, "beverages": 0.3
+}
+MEAL_WEIGHT_RANGES = {
+    'breakfast': (0.9, 1.1), 'brunch': (1.8, 2.1),
+    'lunch': (2.1, 2.5), 'dinner': (1.9, 2.3)
+}
+
+# Quiz question 4, in answer order (15 is "any")
+CUISINE_TAGS = [
+    "north-american", "european", "asian", "italian", "mexican", "canadian",
+    "australian", "midwestern", "african", "indian", "greek", "french",
+    "middle-eastern", "chinese",
+]
+
+# Quiz dish answers -> recipe tags
+DISH_SELECTIONS = {
+    'main_dish': 'main-dish', 'side_dishes': 'side-dishes', 'desserts': 'desserts',
+    'appetizers': 'appetizers', 'soups_stews': 'soups-stews', 'beverage': 'beverages',
+}
+
+# Ladder level at which per-nutrient limits are dropped during relaxation:
+# 1 with cuisine, 2 with calories, 3 with time, 4 with diet, 5 only after
+# the meal/dish-only fallback has been tried with them
+DEFAULT_NUTRIENT_PRIORITY = 2
+
+
+def nutrient_filters(limits):
+    """Turn {'protein': {'min': 30}, 'sodium': {'max': 20}} into query parts.
+
+    Unknown nutrients and non-numeric bounds are ignored.  Against the
+    in-memory corpus every part is a comparison over a float column.
+    """
+    query_parts = []
+    for nutrient, bounds in (limits or {}).items():
+        if nutrient not in NUTRIENTS or not isinstance(bounds, dict):
+            continue
+        condition = {}
+        for key, op in (('min', '$gte'), ('max', '$lte')):
+            try:
+                if bounds.get(key) is not None:
+                    condition[op] = float(bounds[key])
+            except (TypeError, ValueError):
+                pass
+        if condition:
+            query_parts.append({f"nutrition.{nutrient}": condition})
+    return query_parts
+
+
+def allergy_filter(allergies):
+    """Recipes neither tagged with the allergies nor flagged for them from their ingredients"""
+    return {"tags": {"$nin": allergies}, ALLERGEN_FIELD: {"$nin": allergies}}
+
+
+def excluded_ingredients(user_preferences):
+    """Canonical names of the ingredients the user never wants ("cilantro, olives" or a list)"""
+    excluded = (user_preferences or {}).get('exclude_ingredients') or []
+    if isinstance(excluded, str):
+        excluded = excluded.split(',')
+    return canonical_ingredients(excluded)
+
+
+def exclusion_filter(excluded):
+    """Recipes with none of the excluded ingredients"""
+    return {INGREDIENT_KEYS_FIELD: {"$nin": excluded}}
+
+
+def with_exclusions(query, excluded):
+    """query, narrowed to recipes with none of the excluded ingredients"""
+    if not excluded:
+        return query
+    if not query:
+        return exclusion_filter(excluded)
+    return {"$and": [query, exclusion_filter(excluded)]}
+
+
+def quiz_filters(user_preferences):
+    """Hard filters from the quiz answers (diet, allergies, exclusions, time) as a query.
+
+    Used to narrow search results to what the user can eat and has time for.
+    """
+    query_parts = []
+    selections = (user_preferences or {}).get('question1') or []
+    diet_tags = [s for s in selections if s in DIET_TAGS]
+    allergy_tags = [s for s in selections if s in ALLERGY_TAGS]
+    if diet_tags:
+        query_parts.append({"tags": {"$all": diet_tags}})
+    if allergy_tags:
+        query_parts.append(allergy_filter(allergy_tags))
+    excluded = excluded_ingredients(user_preferences)
+    if excluded:
+        query_parts.append(exclusion_filter(excluded))
+    try:
+        time_option = int((user_preferences or {}).get('question3', 6))
+    except (TypeError, ValueError):
+        time_option = 6
+    if time_option in TIME_RANGES:
+        min_t, max_t = TIME_RANGES[time_option]
+        if max_t == float('inf'):
+            query_parts.append({"minutes": {"$gte": min_t}})
+        else:
+            query_parts.append({"minutes": {"$gte": min_t, "$lte": max_t}})
+    return {"$and": query_parts} if query_parts else {}
+
+
+# With a taste profile or a quality ranker, each slot looks at this many
+# matches and picks at random among the best few of them; without either,
+# at random among 5
+PROFILE_CANDIDATES = 50
+PROFILE_TOP_PICKS = 3
+# Matches scored by the ranker when they come from MongoDB (from the
+# in-memory corpus, all matches are scored)
+RANKED_FROM_DATABASE = 500
+# ...fetched with only what the ranker reads; the winners are fetched whole
+RANKER_PROJECTION = {field: 1 for field in FEATURE_FIELDS}
+
+
+def find_candidates(database, query, pool, ranker=None):
+    """Matches for a slot; with a ranker, the pool best by quality, best first"""
+    if ranker is None:
+        return list(database.find(query).limit(pool))
+    cursor = database.find(query, RANKER_PROJECTION)
+    rows = getattr(cursor, 'rows', None)
+    if rows is not None:
+        # Corpus: every match is scored, only the winners become dicts
+        rows = np.asarray(rows, dtype=np.int64)
+        cursor.rows = rows[top_k(ranker.corpus_scores(cursor.corpus)[rows], pool)]
+        return list(cursor)
+    scored = list(cursor.limit(RANKED_FROM_DATABASE))
+    if not scored:
+        return scored
+    ids = [scored[i]['_id'] for i in top_k(ranker.scores(scored), pool)]
+    winners = {r['_id']: r for r in database.find({'_id': {'$in': ids}})}
+    return [winners[i] for i in ids if i in winners]
+
+
+def choose(candidates, profile=None, ranked=False):
+    """Pick a recipe for a slot.
+
+    A profile re-ranks the candidates by the user's taste; either way, ranked
+    candidates are picked among the best few.
+    """
+    if profile:
+        return random.choice(profile.rank(candidates)[:PROFILE_TOP_PICKS])
+    if ranked:
+        return random.choice(candidates[:PROFILE_TOP_PICKS])
+    return random.choice(candidates)
+
+
+def beginner(user_preferences):
+    """Whether the user answered "beginner" (1) to question 5, as an int or as the quiz form's string"""
+    return str((user_preferences or {}).get('question5')) == '1'
+
+
+def dish_tags(selections):
+    """Recipe tags for the quiz's dish answers, in order"""
+    return [DISH_SELECTIONS[s] for s in selections or () if s in DISH_SELECTIONS]
+
+
+def plan_key(recipe):
+    """Near-duplicate recipes share a cluster_id; a plan uses one per cluster"""
+    return recipe.get(CLUSTER_FIELD) or recipe['_id']
+
+
+def unused(candidates, used_recipe_ids, seen=None):
+    """Candidates not in the plan yet; those in the seen filter only if nothing else is left"""
+    candidates = [r for r in candidates if plan_key(r) not in used_recipe_ids]
+    if seen:
+        unseen = [r for r in candidates if plan_key(r) not in seen]
+        if unseen:
+            return unseen
+    return candidates
+
+
+def remember_pool(pools, selected, candidates):
+    """Keep the candidates a dish was chosen from, so it can be rerolled later"""
+    if pools is not None:
+        pools[str(plan_key(selected))] = candidates
+
+
+def recommend_recipes(user_preferences, database, profile=None, ranker=None, seen=None, pools=None):
     # 1. Extract user preferences
     diet_selections = user_preferences.get('question1', [10])  # Default "no restriction"
     try:
@@ -13,9 +216,16 @@ def recommend_recipes(user_preferences, database):
     except (TypeError, ValueError):
         time_option = 6         # Default "any time"
     cuisine_selections = user_preferences.get('question4', [15])  # Default "any cuisine"
-    is_beginner = user_preferences.get('question5', 2) == 1    # Default not beginner
+    is_beginner = beginner(user_preferences)    # Default not beginner
     meal_type_selections = user_preferences.get('question6', [])
     dish_type_selections = user_preferences.get('question7', [1])  # Default main dish
+    nutrient_parts = nutrient_filters(user_preferences.get('nutrients'))
+    # Ingredients the user excluded; like allergies, never relaxed
+    excluded = excluded_ingredients(user_preferences)
+    try:
+        nutrient_priority = int(user_preferences.get('nutrient_priority', DEFAULT_NUTRIENT_PRIORITY))
+    except (TypeError, ValueError):
+        nutrient_priority = DEFAULT_NUTRIENT_PRIORITY
 
 
     print("Diet: ", diet_selections)
@@ -25,6 +235,8 @@ def recommend_recipes(user_preferences, database):
     print("Beginner: ", is_beginner)
     print("Meal Type: ", meal_type_selections)
     print("Dish: ", dish_type_selections)
+    print("Nutrients: ", nutrient_parts)
+    print("Excluded: ", excluded)
 
     diet_tags_to_include = []
     allergy_tags_to_exclude = []
@@ -33,12 +245,7 @@ def recommend_recipes(user_preferences, database):
     dish_types = []
 
     # Mappings
-    cuisine_mapping = {
-        1: "north-american", 2: "european", 3: "asian", 4: "italian",
-        5: "mexican", 6: "canadian", 7: "australian", 8: "midwestern",
-        9: "african", 10: "indian", 11: "greek", 12: "french",
-        13: "middle-eastern", 14: "chinese"
-    }
+    cuisine_mapping = dict(enumerate(CUISINE_TAGS, 1))
     meal_mapping = {1: 'breakfast', 2: 'brunch', 3: 'lunch', 4: 'dinner'}
     dish_mapping = {
         1: "main-dish", 2: "side-dishes", 3: "desserts",
@@ -46,34 +253,18 @@ def recommend_recipes(user_preferences, database):
     }
     
     # Dish&Meal type weights for calorie distribution
-    dish_weights = {
-        "main-dish": 2.1, "side-dishes": 1.0, "desserts": 0.9,
-        "appetizers": 0.7, "soups-stews": 0.8, "beverages": 0.3
-    }
-    meal_weights = {
-        'breakfast': random.uniform(0.9, 1.1), 'brunch': random.uniform(1.8, 2.1),
-        'lunch': random.uniform(2.1, 2.5), 'dinner': random.uniform(1.9, 2.3)
-    }
-    calorie_ranges = {
-        1: (1200, 1400), 2: (1400, 1600), 3: (1600, 1800),
-        4: (1800, 2200), 5: (2200, 2500), 6: (2500, 3000)
-    }
-    time_ranges = {
-        1: (0, 30), 2: (30, 60), 3: (60, 90),
-        4: (90, 120), 5: (120, float('inf'))
-    }
+    dish_weights = DISH_WEIGHTS
+    meal_weights = {meal: random.uniform(*bounds) for meal, bounds in MEAL_WEIGHT_RANGES.items()}
+    calorie_ranges = CALORIE_RANGES
+    time_ranges = TIME_RANGES
 
     # Process preferences
     print("Diet Selection: ", diet_selections)
     for selection in diet_selections:
-        if selection in ['vegetarian', 'vegan', 'gluten-free', 'kosher', 'lactose-free']:
+        if selection in DIET_TAGS:
             diet_tags_to_include.append(selection)
-        elif selection == 'eggs_dairy':
-            allergy_tags_to_exclude.append('eggs_dairy')
-        elif selection == 'seafood':
-            allergy_tags_to_exclude.append('seafood')
-        elif selection == 'nuts':
-            allergy_tags_to_exclude.append('nuts')
+        elif selection in ALLERGY_TAGS:
+            allergy_tags_to_exclude.append(selection)
     print("Diet: ", allergy_tags_to_exclude)
 
     print("Cuisine Selections: ", cuisine_selections)
@@ -96,17 +287,7 @@ def recommend_recipes(user_preferences, database):
         meal_types = ['breakfast', 'lunch', 'dinner']
 
     print("Dish Selections: ", dish_type_selections)
-    for selection in dish_type_selections:
-        if selection == 'main_dish':
-            dish_types.append('main-dish')
-        elif selection == "side_dishes":
-            dish_types.append('side-dishes')
-        elif selection == "desserts" or selection == "appetizers":
-            dish_types.append(selection)
-        elif selection == "soups_stews":
-            dish_types.append('soups-stews')
-        elif selection == "beverage":
-            dish_types.append('beverages')
+    dish_types = dish_tags(dish_type_selections)
     # dish_types = dish_type_selections
     print("Dish: ", dish_types)
     
@@ -154,7 +335,10 @@ def recommend_recipes(user_preferences, database):
     
     # Initialize recommendations container
     recommendations = {meal: [] for meal in meal_types}
+    # Holds plan_key()s, so near-duplicates of a chosen recipe are skipped too
     used_recipe_ids = set()
+    # Recently seen recipes are passed over, so look at more matches then
+    pool = PROFILE_CANDIDATES if profile or ranker or seen else 5
     # print(recommendations)
     # Build the query
     for meal in meal_types:                           # ───── MEAL LOOP ─────
@@ -170,7 +354,10 @@ def recommend_recipes(user_preferences, database):
                 query_parts.append({"tags": {"$all": diet_tags_to_include}})
             
             if allergy_tags_to_exclude:
-                query_parts.append({"tags": {"$nin": allergy_tags_to_exclude}})
+                query_parts.append(allergy_filter(allergy_tags_to_exclude))
+
+            if excluded:
+                query_parts.append(exclusion_filter(excluded))
 
             # ❷ meal tag
             query_parts.append({"tags": {"$in": [meal]}})
@@ -199,6 +386,9 @@ def recommend_recipes(user_preferences, database):
                 query_parts.append({"nutrition.calories": {"$gte": cmin, "$lte": cmax}})
                 has_calorie = True
 
+            # ❼ per-nutrient limits
+            query_parts.extend(nutrient_parts)
+
             # Combine all query parts with $and
             if len(query_parts) > 1:
                 query = {"$and": query_parts}
@@ -220,24 +410,28 @@ def recommend_recipes(user_preferences, database):
                 "has_diet": has_diet,
                 "diet_tags": diet_tags_to_include,
                 "allergy_tags": allergy_tags_to_exclude,
+                "excluded_ingredients": excluded,
                 "meal_tags": [meal],
-                "dish_tags": []
+                "dish_tags": [],
+                "nutrient_parts": nutrient_parts,
+                "nutrient_priority": nutrient_priority
             }
             
             # We need exactly one recipe for breakfast/brunch
-            matched = list(database.find(query).limit(5))
-            matched = [r for r in matched if r['_id'] not in used_recipe_ids]
+            matched = find_candidates(database, query, pool, ranker)
+            matched = unused(matched, used_recipe_ids, seen)
 
             if not matched:
                 # progressive relaxation with improved strategy
                 selected = find_with_improved_relaxation(database, search_params)
-                if selected and selected['_id'] not in used_recipe_ids:
+                if selected and plan_key(selected) not in used_recipe_ids:
                     recommendations[meal] = [selected]
-                    used_recipe_ids.add(selected['_id'])
+                    used_recipe_ids.add(plan_key(selected))
             else:
-                selected = random.choice(matched)
+                selected = choose(matched, profile, ranker is not None)
+                remember_pool(pools, selected, matched)
                 recommendations[meal] = [selected]
-                used_recipe_ids.add(selected['_id'])
+                used_recipe_ids.add(plan_key(selected))
 
         # ───────────────────────────── LUNCH / DINNER ─────────────────────────────
         else:
@@ -260,7 +454,10 @@ def recommend_recipes(user_preferences, database):
                     query_parts.append({"tags": {"$all": diet_tags_to_include}})
                 
                 if allergy_tags_to_exclude:
-                    query_parts.append({"tags": {"$nin": allergy_tags_to_exclude}})
+                    query_parts.append(allergy_filter(allergy_tags_to_exclude))
+
+                if excluded:
+                    query_parts.append(exclusion_filter(excluded))
 
                 # ❷ meal and dish tags - explicitly require both tags
                 #test point 2 here, get rid of meal type
@@ -291,6 +488,9 @@ def recommend_recipes(user_preferences, database):
                     query_parts.append({"nutrition.calories": {"$gte": cmin, "$lte": cmax}})
                     has_calorie = True
 
+                # ❼ per-nutrient limits
+                query_parts.extend(nutrient_parts)
+
                 # Combine query parts
                 if len(query_parts) > 1:
                     query = {"$and": query_parts}
@@ -311,19 +511,23 @@ def recommend_recipes(user_preferences, database):
                     "has_diet": has_diet,
                     "diet_tags": diet_tags_to_include,
                     "allergy_tags": allergy_tags_to_exclude,
+                    "excluded_ingredients": excluded,
                     "meal_tags": [meal],
-                    "dish_tags": [dish_type]
+                    "dish_tags": [dish_type],
+                    "nutrient_parts": nutrient_parts,
+                    "nutrient_priority": nutrient_priority
                 }
                 print(search_params)
                 # Try to find a recipe for this dish type
-                matched = list(database.find(query).limit(5))
-                matched = [r for r in matched if r['_id'] not in used_recipe_ids]
+                matched = find_candidates(database, query, pool, ranker)
+                matched = unused(matched, used_recipe_ids, seen)
                 
                 if matched:
                     # Select one recipe and add it
-                    selected = random.choice(matched)
+                    selected = choose(matched, profile, ranker is not None)
+                    remember_pool(pools, selected, matched)
                     recommendations[meal].append(selected)
-                    used_recipe_ids.add(selected['_id'])
+                    used_recipe_ids.add(plan_key(selected))
                     found_dish_types[dish_type] = selected
                     print(f"Found a {dish_type} for {meal} with primary search")
                 else:
@@ -331,46 +535,49 @@ def recommend_recipes(user_preferences, database):
                     print(f"No {dish_type} found for {meal}, trying relaxation")
                     selected = find_with_improved_relaxation(database, search_params)
                     
-                    if selected and selected['_id'] not in used_recipe_ids:
+                    if selected and plan_key(selected) not in used_recipe_ids:
                         recommendations[meal].append(selected)
-                        used_recipe_ids.add(selected['_id'])
+                        used_recipe_ids.add(plan_key(selected))
                         found_dish_types[dish_type] = selected
                         print(f"Found a {dish_type} for {meal} with relaxation")
                     else:
                         # Try with just meal and dish tags
                         print(f"Trying simple query for {dish_type} in {meal}")
-                        basic_query = {"$and": [{}, {"tags": dish_type}]} #test point here
-                        basic_matched = list(database.find(basic_query).limit(5))
-                        basic_matched = [r for r in basic_matched if r['_id'] not in used_recipe_ids]
+                        basic_query = {"$and": [with_exclusions({}, excluded), {"tags": dish_type}]} #test point here
+                        basic_matched = find_candidates(database, basic_query, pool, ranker)
+                        basic_matched = unused(basic_matched, used_recipe_ids, seen)
                         
                         if basic_matched:
-                            selected = random.choice(basic_matched)
+                            selected = choose(basic_matched, profile, ranker is not None)
+                            remember_pool(pools, selected, basic_matched)
                             recommendations[meal].append(selected)
-                            used_recipe_ids.add(selected['_id'])
+                            used_recipe_ids.add(plan_key(selected))
                             found_dish_types[dish_type] = selected
                             print(f"Found a {dish_type} for {meal} with basic query")
                         else:
                             # Try with just the dish type
                             print(f"Trying dish-only query for {dish_type}")
-                            dish_query = {"tags": dish_type}
-                            dish_matched = list(database.find(dish_query).limit(5))
-                            dish_matched = [r for r in dish_matched if r['_id'] not in used_recipe_ids]
+                            dish_query = with_exclusions({"tags": dish_type}, excluded)
+                            dish_matched = find_candidates(database, dish_query, pool, ranker)
+                            dish_matched = unused(dish_matched, used_recipe_ids, seen)
                             
                             if dish_matched:
-                                selected = random.choice(dish_matched)
+                                selected = choose(dish_matched, profile, ranker is not None)
+                                remember_pool(pools, selected, dish_matched)
                                 recommendations[meal].append(selected)
-                                used_recipe_ids.add(selected['_id'])
+                                used_recipe_ids.add(plan_key(selected))
                                 found_dish_types[dish_type] = selected
                                 print(f"Found a {dish_type} with dish-only query")
                             else:
                                 # Try ultimate fallback - any recipe
                                 print(f"No {dish_type} found even with minimal constraints. Using fallback.")
-                                fallback_query = {"tags": {"$nin": allergy_tags_to_exclude}} if allergy_tags_to_exclude else {}
-                                fallback_recipes = list(database.find(fallback_query).limit(5))
-                                fallback_recipes = [r for r in fallback_recipes if r['_id'] not in used_recipe_ids]
+                                fallback_query = allergy_filter(allergy_tags_to_exclude) if allergy_tags_to_exclude else {}
+                                fallback_query = with_exclusions(fallback_query, excluded)
+                                fallback_recipes = find_candidates(database, fallback_query, pool, ranker)
+                                fallback_recipes = unused(fallback_recipes, used_recipe_ids, seen)
                                 
                                 if fallback_recipes:
-                                    selected = random.choice(fallback_recipes)
+                                    selected = choose(fallback_recipes, profile, ranker is not None)
                                     # Add the missing tags to this recipe
                                     if dish_type not in selected.get('tags', []):
                                         selected.setdefault('tags', []).append(dish_type)
@@ -378,7 +585,7 @@ def recommend_recipes(user_preferences, database):
                                         selected.setdefault('tags', []).append(meal)
                                     
                                     recommendations[meal].append(selected)
-                                    used_recipe_ids.add(selected['_id'])
+                                    used_recipe_ids.add(plan_key(selected))
                                     found_dish_types[dish_type] = selected
                                     print(f"Using a generic recipe as {dish_type} for {meal}")
     
@@ -389,20 +596,20 @@ def recommend_recipes(user_preferences, database):
             # For breakfast/brunch, just make sure we have exactly one recipe
             if not recommendations[meal]:
                 print(f"No {meal} recipes found. Using generic fallback.")
-                basic_query = {"tags": meal}
+                basic_query = with_exclusions({"tags": meal}, excluded)
                 fallback_recipe = database.find_one(basic_query)
                 if fallback_recipe:
                     recommendations[meal] = [fallback_recipe]
-                    used_recipe_ids.add(fallback_recipe['_id'])
+                    used_recipe_ids.add(plan_key(fallback_recipe))
                 else:
                     # Really desperate fallback - any recipe
-                    last_resort = database.find_one({})
+                    last_resort = database.find_one(with_exclusions({}, excluded))
                     if last_resort:
                         # Make sure it has the meal tag
                         if meal not in last_resort.get('tags', []):
                             last_resort.setdefault('tags', []).append(meal)
                         recommendations[meal] = [last_resort]
-                        used_recipe_ids.add(last_resort['_id'])
+                        used_recipe_ids.add(plan_key(last_resort))
         else:
             # For lunch/dinner, we've already handled the finding of recipes
             # in the previous loop, so no need to add more here
@@ -428,15 +635,32 @@ def find_with_improved_relaxation(database, params):
     2. Calories (important for some)
     3. Time (moderately important) 
     4. Diet restrictions (most important but may need relaxation as last resort)
+
+    Per-nutrient limits (params['nutrient_parts']) are kept until the level
+    given by params['nutrient_priority'] and dropped from there on.
     
     params should contain: query, cuisine_tags, has_calorie, has_time, 
     has_diet, diet_tags, allergy_tags, meal_tags, dish_tags
+
+    Excluded ingredients (params['excluded_ingredients']) are never dropped.
     """
     print(f"Starting relaxation for {params['meal_tags']} and {params['dish_tags']}")
     
     # Create a baseline query with only meal and dish tags
     # This ensures we're starting with the right meal/dish type
-    baseline_query = {"tags": params['dish_tags']}
+    # ($all: a bare list would only match recipes tagged with exactly that
+    # list; breakfast/brunch have no dish tag, so fall back to the meal)
+    baseline_query = {"tags": {"$all": params['dish_tags'] or params['meal_tags']}}
+    # Every level below starts from the baseline, so exclusions ride along
+    excluded = params.get('excluded_ingredients') or []
+    baseline_query = with_exclusions(baseline_query, excluded)
+
+    nutrient_parts = params.get('nutrient_parts') or []
+    nutrient_priority = params.get('nutrient_priority', DEFAULT_NUTRIENT_PRIORITY)
+
+    def keep_nutrients(query_parts, level):
+        if level < nutrient_priority:
+            query_parts.extend(nutrient_parts)
     
     # Level 1: Drop cuisine tags
     if params['cuisine_tags']:
@@ -449,7 +673,7 @@ def find_with_improved_relaxation(database, params):
         
         # Add allergy restrictions if present  
         if params['allergy_tags']:
-            query_parts.append({"tags": {"$nin": params['allergy_tags']}})
+            query_parts.append(allergy_filter(params['allergy_tags']))
         
         # Add meal/dish tags
         query_parts.append(baseline_query)
@@ -468,6 +692,8 @@ def find_with_improved_relaxation(database, params):
                     query_parts.append(part)
                     break
         
+        keep_nutrients(query_parts, 1)
+
         # Build the query
         query_no_cuisine = {"$and": query_parts} if len(query_parts) > 1 else query_parts[0]
         
@@ -487,7 +713,7 @@ def find_with_improved_relaxation(database, params):
             
         # Add allergy restrictions
         if params['allergy_tags']:
-            query_parts.append({"tags": {"$nin": params['allergy_tags']}})
+            query_parts.append(allergy_filter(params['allergy_tags']))
         
         # Add meal/dish tags
         query_parts.append(baseline_query)
@@ -499,6 +725,8 @@ def find_with_improved_relaxation(database, params):
                     query_parts.append(part)
                     break
         
+        keep_nutrients(query_parts, 2)
+
         query_no_calories = {"$and": query_parts} if len(query_parts) > 1 else query_parts[0]
         result = database.find_one(query_no_calories)
         if result:
@@ -515,11 +743,13 @@ def find_with_improved_relaxation(database, params):
             
         # Add allergy restrictions
         if params['allergy_tags']:
-            query_parts.append({"tags": {"$nin": params['allergy_tags']}})
+            query_parts.append(allergy_filter(params['allergy_tags']))
         
         # Add meal/dish tags
         query_parts.append(baseline_query)
         
+        keep_nutrients(query_parts, 3)
+
         query_basic = {"$and": query_parts} if len(query_parts) > 1 else query_parts[0]
         result = database.find_one(query_basic)
         if result:
@@ -532,11 +762,13 @@ def find_with_improved_relaxation(database, params):
         
         # Keep allergy restrictions
         if params['allergy_tags']:
-            query_parts.append({"tags": {"$nin": params['allergy_tags']}})
+            query_parts.append(allergy_filter(params['allergy_tags']))
         
         # Add meal/dish tags
         query_parts.append(baseline_query)
         
+        keep_nutrients(query_parts, 4)
+
         query_no_diet = {"$and": query_parts} if len(query_parts) > 1 else query_parts[0]
         result = database.find_one(query_no_diet)
         if result:
@@ -544,6 +776,11 @@ def find_with_improved_relaxation(database, params):
             return result
     
     # Level 5: Last resort - just find something matching the meal and dish type
+    if nutrient_parts and nutrient_priority >= 5:
+        result = database.find_one({"$and": [baseline_query] + nutrient_parts})
+        if result:
+            print("Found recipe with meal/dish and nutrient match")
+            return result
     result = database.find_one(baseline_query)
     if result:
         print("Found recipe with only meal/dish match")
@@ -551,7 +788,7 @@ def find_with_improved_relaxation(database, params):
         
     # If still nothing, try just the meal type
     if params['meal_tags']:
-        meal_only_query = {"tags": {"$in": params['meal_tags']}}
+        meal_only_query = with_exclusions({"tags": {"$in": params['meal_tags']}}, excluded)
         return database.find_one(meal_only_query)
     
     # Nothing found at all
@@ -0,0 +1,146 @@
+import sys
+from .ingredients import INGREDIENT_KEYS_FIELD, canonical_ingredients
+from .dedup import CLUSTER_FIELD
+from .allergens import ALLERGEN_FIELD, recipe_allergens
+
+NUTRIENTS = (
+    'calories', 'total_fat', 'sugar', 'sodium',
+    'protein', 'saturated_fat', 'carbohydrates',
+)
+
+# Large text fields that are left in MongoDB until somebody needs them
+LAZY_FIELDS = ('description', 'steps')
+
+_MISSING = object()
+
+
+def _number(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return None
+
+
+class Nutrition:
+    """Typed nutrition facts; reads like the {'calories': ...} dict in MongoDB"""
+
+    __slots__ = NUTRIENTS
+
+    def __init__(self, values=None):
+        values = values or {}
+        for nutrient in NUTRIENTS:
+            setattr(self, nutrient, _number(values.get(nutrient)))
+
+    def items(self):
+        return [(n, getattr(self, n)) for n in NUTRIENTS if getattr(self, n) is not None]
+
+    def keys(self):
+        return [n for n, _ in self.items()]
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in NUTRIENTS else None
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def to_dict(self):
+        return dict(self.items())
+
+
+class RecipeRecord:
+    """Compact, read-only recipe used by the in-memory corpus.
+
+    Tags and ingredients are tuples of interned strings, so the thousands of
+    recipes tagged 'easy' or using 'salt' share one string object; description
+    and steps are not kept in memory (see RecipeCorpus.hydrate).  Supports the
+    read side of the dict interface so templates and display code can use a
+    record wherever they used a document.
+    """
+
+    __slots__ = ('_id', 'name', 'minutes', 'n_steps', 'tags',
+                 'ingredients', 'ingredient_keys', 'allergens', 'nutrition', 'cluster_id', 'extra')
+
+    def __init__(self, _id, name, minutes=None, n_steps=None, tags=(),
+                 ingredients=(), nutrition=None, extra=None, ingredient_keys=None,
+                 cluster_id=None, allergens=None):
+        self._id = _id
+        self.name = name
+        self.minutes = minutes
+        self.n_steps = n_steps
+        self.tags = tuple(sys.intern(t) for t in tags or ())
+        self.ingredients = tuple(sys.intern(i) for i in ingredients or ())
+        # Canonical names for ingredient search; computed here for documents
+        # that predate the ingredient_keys field
+        if ingredient_keys is None:
+            ingredient_keys = canonical_ingredients(self.ingredients)
+        self.ingredient_keys = tuple(sys.intern(k) for k in ingredient_keys)
+        # Same for the allergen flags (see allergens.py)
+        if allergens is None:
+            allergens = recipe_allergens({INGREDIENT_KEYS_FIELD: self.ingredient_keys})
+        self.allergens = tuple(sys.intern(a) for a in allergens)
+        self.nutrition = nutrition if isinstance(nutrition, Nutrition) else Nutrition(nutrition)
+        # Shared by near-duplicate recipes (see dedup.py)
+        self.cluster_id = cluster_id
+        # Any other scalar fields
+        self.extra = extra or None
+
+    @classmethod
+    def from_document(cls, doc):
+        """Build a record from a raw MongoDB recipe document"""
+        known = {'_id', 'name', 'minutes', 'n_steps', 'tags', 'ingredients',
+                 'nutrition', INGREDIENT_KEYS_FIELD, CLUSTER_FIELD, ALLERGEN_FIELD}
+        extra = {k: v for k, v in doc.items() if k not in known and k not in LAZY_FIELDS}
+        return cls(
+            doc.get('_id'), doc.get('name'), doc.get('minutes'), doc.get('n_steps'),
+            doc.get('tags'), doc.get('ingredients'), doc.get('nutrition'), extra,
+            doc.get(INGREDIENT_KEYS_FIELD), doc.get(CLUSTER_FIELD), doc.get(ALLERGEN_FIELD),
+        )
+
+    def to_dict(self):
+        """A fresh, mutable document with the same shape as the MongoDB one.
+
+        allergens is a search field and is left out; ingredient_keys stays,
+        so taste profiles score candidates without canonicalizing again.
+        """
+        doc = {
+            '_id': self._id,
+            'name': self.name,
+            'minutes': self.minutes,
+            'n_steps': self.n_steps,
+            'tags': list(self.tags),
+            'ingredients': list(self.ingredients),
+            INGREDIENT_KEYS_FIELD: list(self.ingredient_keys),
+            'nutrition': self.nutrition.to_dict(),
+        }
+        if self.cluster_id is not None:
+            doc[CLUSTER_FIELD] = self.cluster_id
+        if self.extra:
+            doc.update(self.extra)
+        return doc
+
+    # ── read-only mapping interface ──────────────────────────────────
+    def get(self, key, default=None):
+        if key in self.__slots__ and key != 'extra':
+            value = getattr(self, key)
+            return default if value is None else value
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        return default
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __repr__(self):
+        return f"RecipeRecord({self._id!r}, {self.name!r})"
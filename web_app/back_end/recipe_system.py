@@ -1,14 +1,46 @@
 import json
 import random
 from pprint import pprint
+from bson import ObjectId
 from .mongo_connection import RecipeDatabase
 from .mongo_connection import JSONEncoder
-from .recipe_recommender import recommend_recipes
+from .recipe_recommender import recommend_recipes, quiz_filters, plan_key
+from .plan_optimizer import optimize_plan
+from .meal_plan import build_plan
+from .household import household_plan
+from .corpus import get_shared_corpus
+from .ingredients import INGREDIENT_KEYS_FIELD, PANTRY_STAPLES, canonical_ingredients
+from .similar import get_neighbour_table
+from .profiles import ProfileStore, PROFILES_COLLECTION
+from .seen_filter import SeenStore
+from .reroll import SlotPools, plan_version, pool_key, reroll, slot_pool
+from .ranker import get_ranker
+from .serialization import dump_to_file, to_jsonable
 
 class RecipeRecommendationSystem:
-    def __init__(self):
+    def __init__(self, corpus=None):
         self.db = RecipeDatabase()
         self.connected = self.db.connect()
+        # In-memory recipe snapshot; defaults to the one preloaded by the
+        # production server (see front_end/wsgi.py), if any
+        self.corpus = corpus if corpus is not None else get_shared_corpus()
+        # Taste profiles built from each user's saved recipes
+        self.profiles = ProfileStore(self.db.db[PROFILES_COLLECTION]) if self.connected else None
+        # Recipes each user was recommended lately, to pass over next time
+        self.seen = SeenStore(self.db.db['user_information']) if self.connected else None
+        # Each user's latest plan and its dishes' candidates, for rerolls
+        self.slot_pools = SlotPools()
+
+    def reconnect(self):
+        """Retry MongoDB; the snapshot, reroll pools and cached profiles are kept"""
+        self.db.close()
+        self.connected = self.db.connect()
+        if self.connected:
+            if self.profiles is None:
+                self.profiles = ProfileStore(self.db.db[PROFILES_COLLECTION])
+            if self.seen is None:
+                self.seen = SeenStore(self.db.db['user_information'])
+        return self.connected
         
     def __del__(self):
         try:
@@ -17,17 +49,132 @@ class RecipeRecommendationSystem:
             pass  # Ignore shutdown errors
 
     
-    def get_recommendations(self, user_preferences):
-        """Get recipe recommendations based on user preferences"""
+    def get_recommendations(self, user_preferences, username=None, version=None):
+        """Get recipe recommendations based on user preferences.
+
+        With a username, each slot favours recipes like the ones they saved
+        and passes over the ones they were recommended lately; with
+        'optimize_calories' set, the slots are chosen together so the day's
+        calories fall in the chosen range.  version is the stored plan's
+        (see reroll_dish).
+        """
+        profile = self.get_profile(username)
+        seen = self.seen.get(username) if username is not None and self.seen is not None else None
+        plan = optimize_plan if user_preferences.get('optimize_calories') else recommend_recipes
+        pools = {}
+        if self.corpus is not None:
+            # Answer every query from memory; only the descriptions/steps of
+            # the chosen recipes are fetched, in a single query
+            recommendations = plan(user_preferences, self.corpus, profile, get_ranker(), seen, pools)
+            self.corpus.hydrate(
+                [r for recipes in recommendations.values() for r in recipes],
+                self.db.collection if self.connected else None
+            )
+            self.record_seen(username, seen, recommendations)
+            self.remember_plan(username, version, recommendations, pools)
+            return recommendations
+
         if not self.connected:
             print("Error: Not connected to database")
             return {}
             
         # Use the recommend_recipes function from recipe_recommender.py
-        recommendations = recommend_recipes(user_preferences, self.db.collection)
+        recommendations = plan(user_preferences, self.db.collection, profile, get_ranker(), seen, pools)
+        self.record_seen(username, seen, recommendations)
+        self.remember_plan(username, version, recommendations, pools)
         # print(user_preferences)
         return recommendations
+
+    def remember_plan(self, username, version, recommendations, pools):
+        if username is not None and version is not None:
+            self.slot_pools.put(username, version, recommendations, pools)
+
+    def reroll_dish(self, username, user_preferences, meal, index, version, load_plan):
+        """Swap the plan's dish meal[index] for another one from the same slot.
+
+        version is the stored plan's version the user last saw.  If this
+        worker cached that version, the plan and the dish's candidates come
+        from the cache; otherwise load_plan() returns the stored plan and its
+        version, and the slot is queried again.  Returns (new recipe,
+        version it replaces a dish of, new version), the recipe JSON-ready,
+        or None if there is no such dish or nothing else fits the slot.
+        """
+        cached = self.slot_pools.get(username, version)
+        if cached is None:
+            version, plan = load_plan()
+            pools = {}
+        else:
+            plan, pools = cached
+        recipes = (plan or {}).get(meal) or []
+        if not 0 <= index < len(recipes):
+            return None
+        old = recipes[index]
+        pool = pools.get(pool_key(old))
+        if pool is None:
+            if self.corpus is None and not self.connected:
+                print("Error: Not connected to database")
+                return None
+            database = self.corpus if self.corpus is not None else self.db.collection
+            pool = slot_pool(user_preferences, database, meal, old, get_ranker())
+        # The dish rerolled away doesn't come back
+        pool = [r for r in pool if pool_key(r) != pool_key(old)]
+        seen = self.seen.get(username) if self.seen is not None else None
+        new = reroll(plan, pool, get_ranker() is not None, seen)
+        if new is None:
+            return None
+        if self.corpus is not None:
+            # Corpus recipes come without description and steps
+            self.corpus.hydrate([new], self.db.collection if self.connected else None)
+        new = to_jsonable(new)
+        self.record_seen(username, seen, {meal: [new]})
+        # A new plan, so threads still holding the old one aren't affected
+        plan = {m: list(r) for m, r in plan.items()}
+        plan[meal][index] = new
+        pools = dict(pools)
+        pools[pool_key(new)] = pool
+        new_version = plan_version()
+        self.slot_pools.put(username, new_version, plan, pools)
+        return new, version, new_version
+
+    def record_seen(self, username, seen, recommendations):
+        if seen is None:
+            return
+        self.seen.record(username, seen, [plan_key(r) for recipes in recommendations.values() for r in recipes])
     
+    def get_meal_plan(self, user_preferences, days=7, username=None):
+        """A plan of several days with no recipe twice (see back_end/meal_plan.py)"""
+        profile = self.get_profile(username)
+        if self.corpus is not None:
+            return build_plan(user_preferences, self.corpus, days, profile, get_ranker())
+        if not self.connected:
+            print("Error: Not connected to database")
+            return []
+        return build_plan(user_preferences, self.db.collection, days, profile, get_ranker())
+
+    def get_household_plan(self, members):
+        """One day's plan for several people at once (see back_end/household.py)"""
+        if self.corpus is not None:
+            return household_plan(members, self.corpus, get_ranker())
+        if not self.connected:
+            print("Error: Not connected to database")
+            return {'recommendations': {}, 'relaxed': {}}
+        return household_plan(members, self.db.collection, get_ranker())
+
+    def get_profile(self, username):
+        """The user's cached taste profile, or None"""
+        if username is None or self.profiles is None:
+            return None
+        return self.profiles.get(username)
+
+    def record_saved_recipe(self, username, recipe_id, saved=True):
+        """Update the user's taste profile after a save (or an unsave)"""
+        if self.profiles is None:
+            return
+        recipe = self.corpus.get(recipe_id) if self.corpus is not None else None
+        if recipe is None:
+            recipe = self.db.find_recipe_by_id(recipe_id)
+        self.profiles.record(username, recipe, 1 if saved else -1)
+
     def display_recommendations(self, recommendations):
         """Display the recommended recipes in a readable format"""
         print("\n" + "=" * 50)
@@ -63,28 +210,117 @@ class RecipeRecommendationSystem:
     
     def get_recipe_details(self, recipe_id):
         """Get detailed information about a specific recipe"""
+        if self.corpus is not None:
+            recipe = self.corpus.get(
+                ObjectId(recipe_id) if isinstance(recipe_id, str) else recipe_id,
+                self.db.collection if self.connected else None
+            )
+            if recipe is not None:
+                return recipe
         recipe = self.db.find_recipe_by_id(recipe_id)
         return recipe
     
     def search_by_name(self, name_query, limit=10):
         """Search recipes by name"""
+        if self.corpus is not None:
+            return [
+                self.corpus.get(match['_id'])
+                for match in self.corpus.autocomplete(name_query, limit)
+            ]
         return self.db.search_recipes_by_name(name_query, limit)
+
+    def autocomplete(self, prefix, limit=10):
+        """Recipe names (with ids) matching what the user has typed so far"""
+        if self.corpus is not None:
+            return self.corpus.autocomplete(prefix, limit)
+        return [
+            {'_id': r['_id'], 'name': r['name']}
+            for r in self.db.search_recipes_by_name(prefix, limit)
+        ]
     
+    def search_text(self, text, preferences=None, limit=10):
+        """Full-text (BM25) search; quiz preferences narrow it by diet, allergies and time.
+
+        Answered from the preloaded snapshot and its text index only (see
+        front_end/wsgi.py); None without them, rather than scanning the
+        collection mid-request.
+        """
+        if self.corpus is None or self.corpus.text_index is None:
+            print("Error: Full-text search needs the preloaded recipe snapshot")
+            return None
+        return self.corpus.search_text(text, limit, quiz_filters(preferences) if preferences else None)
+
+    def pantry_match(self, pantry, preferences=None, limit=10):
+        """'Cook with what I have': recipes ranked by how much of them the pantry covers.
+
+        Salt, pepper and water are taken as given; quiz preferences narrow
+        the results by diet, allergies, exclusions and time.  Like
+        search_text, None without the preloaded snapshot.
+        """
+        keys = canonical_ingredients(pantry)
+        if not keys:
+            return []
+        if self.corpus is None:
+            print("Error: Pantry matching needs the preloaded recipe snapshot")
+            return None
+        return self.corpus.pantry_match(
+            keys + [s for s in PANTRY_STAPLES if s not in keys], limit,
+            quiz_filters(preferences) if preferences else None
+        )
+
+    def similar_recipes(self, recipe_id, limit=6):
+        """'More like this': precomputed nearest neighbours (see back_end/similar.py)"""
+        table = get_neighbour_table()
+        if table is None:
+            return []
+        ids = table.similar(ObjectId(recipe_id) if isinstance(recipe_id, str) else recipe_id, limit)
+        if not ids:
+            return []
+        if self.corpus is not None:
+            recipes = [self.corpus.get(rid) for rid in ids]
+            return [r for r in recipes if r is not None]
+        if not self.connected:
+            return []
+        found = {r['_id']: r for r in self.db.find_recipes({'_id': {'$in': ids}}, len(ids))}
+        return [found[rid] for rid in ids if rid in found]
+
+    def browse(self, tags=None, ingredients=None, name=None, limit=20, page_token=None):
+        """A page of recipes matching every given filter, plus the next page's token.
+
+        Always served by MongoDB, in _id order, so deep pages stay cheap.
+        """
+        parts = []
+        if tags:
+            parts.append(self.db.tags_query(tags))
+        if ingredients:
+            query = self.db.ingredients_query(ingredients)
+            if query is None:
+                return [], None
+            parts.append(query)
+        if name:
+            parts.append(self.db.name_query(name))
+        query = {"$and": parts} if len(parts) > 1 else (parts[0] if parts else {})
+        return self.db.find_recipes_page(query, limit, page_token)
+
     def search_by_tags(self, tags, limit=10):
         """Search recipes by tags"""
         return self.db.find_recipes_by_tags(tags, limit)
     
     def search_by_ingredients(self, ingredients, limit=10):
         """Search recipes by ingredients"""
+        if self.corpus is not None:
+            keys = canonical_ingredients(ingredients)
+            if not keys:
+                return []
+            return list(self.corpus.find({INGREDIENT_KEYS_FIELD: {"$all": keys}}).limit(limit))
         return self.db.find_recipes_by_ingredients(ingredients, limit)
     
     def export_recommendations_to_json(self, recommendations, filename):
         """Export recommendations to a JSON file"""
-        from bson import json_util
-
         try:
-            with open(filename, 'w') as f:
-                f.write(json_util.dumps(recommendations, indent=2))
+            # Stream recipe by recipe instead of building one big string
+            with open(filename, 'wb') as f:
+                dump_to_file(recommendations, f)
             print(f"Recommendations exported to {filename}")
             return True
         except Exception as e:
@@ -0,0 +1,130 @@
+"""Swapping one dish of a plan for another.
+
+When a plan is made, the candidates each dish was chosen from are kept in
+a per-process cache (SlotPools), together with the plan and its version.
+Every stored plan has a version, changed by every reroll; the cache is only
+used for the version the user last saw, so a plan changed by another worker
+is never rerolled from a stale copy.  Rerolling a dish picks again from its
+pool, leaving out everything already in the plan and the dishes rerolled
+away, so a warm reroll doesn't query the recipes.  With a cold cache
+(another worker made or changed the plan, or it expired) the slot's pool
+is queried again from the quiz answers, with the same constraints.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from .recipe_recommender import (
+    CALORIE_RANGES, DISH_WEIGHTS, MEAL_WEIGHT_RANGES, PROFILE_CANDIDATES,
+    choose, dish_tags, plan_key,
+)
+from .plan_optimizer import hard_filters, plan_slots, slot_candidates, slot_query
+
+
+def plan_version():
+    """A new version for a stored plan"""
+    return uuid.uuid4().hex
+
+
+def pool_key(recipe):
+    """plan_key as a string, the same before and after a JSON round trip"""
+    return str(plan_key(recipe))
+
+
+def calorie_window(user_preferences, meal, dish=None):
+    """(min, max) calories of a slot's recipes for the quiz's calorie answer, or None.
+
+    optimize_plan caps every slot at the day's maximum.  recommend_recipes
+    splits the day's range over the meals by weights drawn for each plan,
+    then over the dishes; this is the window over every possible draw.
+    """
+    try:
+        calorie_option = int(user_preferences.get('question2', 7))
+    except (TypeError, ValueError):
+        return None
+    if calorie_option not in CALORIE_RANGES:
+        return None
+    low, high = CALORIE_RANGES[calorie_option]
+    if user_preferences.get('optimize_calories'):
+        return 0, high
+    meal_types, _ = plan_slots(user_preferences)
+    weights = {m: MEAL_WEIGHT_RANGES.get(m, (1.0, 1.0)) for m in meal_types}
+    least, most = weights.get(meal, (1.0, 1.0))
+    others = [w for m, w in weights.items() if m != meal]
+    min_calories = int(low * least / (least + sum(w[1] for w in others)))
+    max_calories = int(high * most / (most + sum(w[0] for w in others)))
+    if dish is not None:
+        dishes = dish_tags(user_preferences.get('question7', [1])) or ['main-dish']
+        share = DISH_WEIGHTS.get(dish, 1.0) / sum(DISH_WEIGHTS.get(d, 1.0) for d in dishes)
+        min_calories, max_calories = int(min_calories * share), int(max_calories * share)
+    return min_calories, max_calories
+
+
+def slot_pool(user_preferences, database, meal, recipe, ranker=None):
+    """Candidates for the slot recipe fills, queried from the quiz answers"""
+    dish = None
+    if meal not in ('breakfast', 'brunch'):
+        dishes = dish_tags(user_preferences.get('question7', [1])) or ['main-dish']
+        dish = next((d for d in dishes if d in (recipe.get('tags') or ())), dishes[0])
+    common, cuisine_tags = hard_filters(user_preferences)
+    window = calorie_window(user_preferences, meal, dish)
+    if window is not None:
+        common.append({"nutrition.calories": {"$gte": window[0], "$lte": window[1]}})
+    pool = []
+    for cuisine in ([cuisine_tags, None] if cuisine_tags else [None]):
+        pool = slot_candidates(database, slot_query(common, (meal, dish), cuisine), PROFILE_CANDIDATES, ranker)
+        if pool:
+            break
+    return pool
+
+
+def reroll(plan, pool, ranked=False, seen=None):
+    """Another recipe from pool, none of whose near-duplicates is in the plan; None if none is left.
+
+    Recipes in the seen filter, such as the dishes rerolled away, are only
+    picked if nothing else is left.
+    """
+    in_plan = {pool_key(r) for recipes in plan.values() for r in recipes}
+    candidates = [r for r in pool if pool_key(r) not in in_plan]
+    if seen:
+        candidates = [r for r in candidates if pool_key(r) not in seen] or candidates
+    if not candidates:
+        return None
+    return choose(candidates, ranked=ranked)
+
+
+class SlotPools:
+    """Each user's latest plan and the pools of its dishes, with LRU eviction and a TTL.
+
+    Shared by a worker's threads, so every access holds the lock.
+    """
+
+    MAX_USERS = 1024
+    TTL = 30 * 60
+
+    def __init__(self):
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, username, version, plan, pools):
+        with self._lock:
+            self._cache[username] = (time.monotonic(), version, plan, pools)
+            self._cache.move_to_end(username)
+            if len(self._cache) > self.MAX_USERS:
+                self._cache.popitem(last=False)
+
+    def get(self, username, version):
+        """(plan, pools) if this version of the user's plan is cached here, else None"""
+        with self._lock:
+            cached = self._cache.get(username)
+            if cached is None or time.monotonic() - cached[0] >= self.TTL:
+                self._cache.pop(username, None)
+                return None
+            if version is None or cached[1] != version:
+                return None
+            self._cache.move_to_end(username)
+            return cached[2], cached[3]
+
+    def forget(self, username):
+        with self._lock:
+            self._cache.pop(username, None)
@@ -0,0 +1,98 @@
+"""Recipes a user was recommended recently, as a per-user Bloom filter.
+
+recommend_recipes only avoids repeats within one plan, so a returning user
+keeps getting the same matches.  Each plan's recipes (by plan_key, so near
+duplicates count too) go into a Bloom filter kept in the user's
+user_information document, and the next plans prefer recipes not in it.
+
+A filter holds two generations of SEEN_FILTER_BITS bits each (4 KB in
+all).  New recipes go into the current one; once it holds
+GENERATION_CAPACITY of them it becomes the previous one and the old
+previous one is dropped, so the false-positive rate stays below ~0.1% and
+recipes come back after one to two generations.  A false positive only
+means a recipe is passed over once.
+"""
+import hashlib
+import numpy as np
+from bson import Binary
+
+SEEN_FILTER_FIELD = 'seen_filter'
+SEEN_FILTER_BITS = 16384     # per generation
+SEEN_FILTER_HASHES = 7
+GENERATION_CAPACITY = 1000   # recipes per generation
+
+
+def _positions(key):
+    """Bit positions of a key (double hashing over one blake2b digest)"""
+    digest = hashlib.blake2b(str(key).encode(), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], 'little')
+    h2 = int.from_bytes(digest[8:], 'little') | 1
+    return [(h1 + i * h2) % SEEN_FILTER_BITS for i in range(SEEN_FILTER_HASHES)]
+
+
+def _bits(data):
+    if data is None or len(data) != SEEN_FILTER_BITS // 8:
+        # Missing, or written with another size: start afresh
+        return np.zeros(SEEN_FILTER_BITS, dtype=bool)
+    return np.unpackbits(np.frombuffer(bytes(data), dtype=np.uint8)).astype(bool)
+
+
+class SeenFilter:
+    """Two-generation Bloom filter of recently recommended plan keys"""
+
+    def __init__(self, current=None, previous=None, count=0):
+        self.current = _bits(current)
+        self.previous = _bits(previous)
+        self.count = count if current is not None else 0
+
+    @classmethod
+    def from_document(cls, doc):
+        seen = (doc or {}).get(SEEN_FILTER_FIELD) or {}
+        return cls(seen.get('current'), seen.get('previous'), seen.get('count', 0))
+
+    def to_document(self):
+        return {
+            'current': Binary(np.packbits(self.current).tobytes()),
+            'previous': Binary(np.packbits(self.previous).tobytes()),
+            'count': self.count,
+        }
+
+    def __contains__(self, key):
+        positions = _positions(key)
+        return bool(self.current[positions].all() or self.previous[positions].all())
+
+    def __bool__(self):
+        return bool(self.count) or bool(self.previous.any())
+
+    def add(self, key):
+        if self.count >= GENERATION_CAPACITY:
+            self.previous = self.current
+            self.current = np.zeros(SEEN_FILTER_BITS, dtype=bool)
+            self.count = 0
+        self.current[_positions(key)] = True
+        self.count += 1
+
+
+class SeenStore:
+    """Seen-recipe filters kept in the user_information collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def get(self, username):
+        try:
+            doc = self.collection.find_one({'username': username}, {SEEN_FILTER_FIELD: 1})
+        except Exception as e:
+            print(f"Error loading seen recipes: {e}")
+            return SeenFilter()
+        return SeenFilter.from_document(doc)
+
+    def record(self, username, seen, keys):
+        """Add keys to the user's filter and store it"""
+        for key in keys:
+            if key not in seen:
+                seen.add(key)
+        try:
+            self.collection.update_one({'username': username}, {'$set': {SEEN_FILTER_FIELD: seen.to_document()}})
+        except Exception as e:
+            print(f"Error saving seen recipes: {e}")
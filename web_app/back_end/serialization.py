@@ -0,0 +1,117 @@
+import json
+from datetime import date, datetime
+from bson import ObjectId
+
+# orjson is a native encoder that is several times faster than the stdlib
+# json module; it is optional and we fall back to json when it is missing.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(o):
+    """Encode BSON / Python types that JSON does not know about"""
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    if hasattr(o, 'to_dict'):
+        return o.to_dict()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def to_jsonable(data):
+    """Convert ObjectIds (and other BSON types) in a payload to plain JSON types.
+
+    Run this once when documents leave MongoDB; the result can then be cached,
+    stored and encoded any number of times without walking it again.
+    """
+    if orjson is not None:
+        # A native encode/decode round trip beats walking the payload in Python
+        return orjson.loads(orjson.dumps(data, default=_default,
+                                         option=orjson.OPT_NON_STR_KEYS))
+    return _to_jsonable(data)
+
+
+def _to_jsonable(data):
+    if isinstance(data, dict):
+        return {str(k): _to_jsonable(v) for k, v in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [_to_jsonable(v) for v in data]
+    if isinstance(data, (str, int, float, bool)) or data is None:
+        return data
+    return _to_jsonable(_default(data))
+
+
+def dumps_bytes(data, indent=False):
+    """Encode a payload to UTF-8 JSON bytes using the fastest available encoder"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_default, option=option)
+    return json.dumps(data, default=_default, indent=2 if indent else None,
+                      ensure_ascii=False).encode('utf-8')
+
+
+def dumps(data, indent=False):
+    """Encode a payload to a JSON string"""
+    return dumps_bytes(data, indent).decode('utf-8')
+
+
+def loads(raw):
+    """Decode JSON bytes or str"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def iter_json_array(items, indent=False):
+    """Yield a JSON array chunk by chunk, one encoded element at a time.
+
+    Large result lists are never turned into one big string, so this can be
+    fed straight into a streamed Flask response or a file.
+    """
+    yield b'['
+    first = True
+    for item in items:
+        if not first:
+            yield b','
+        if indent:
+            yield b'\n'
+        yield dumps_bytes(item, indent)
+        first = False
+    yield b'\n]' if indent and not first else b']'
+
+
+def iter_json_object(mapping, indent=False):
+    """Yield a JSON object whose values are lists (e.g. recommendations per meal)"""
+    yield b'{'
+    first = True
+    for key, value in mapping.items():
+        if not first:
+            yield b','
+        if indent:
+            yield b'\n'
+        yield dumps_bytes(str(key)) + b':'
+        if isinstance(value, (list, tuple)):
+            yield from iter_json_array(value, indent)
+        else:
+            yield dumps_bytes(value, indent)
+        first = False
+    yield b'\n}' if indent and not first else b'}'
+
+
+def dump_to_file(data, fp, indent=True):
+    """Stream a payload to a binary file object without building the whole string"""
+    if isinstance(data, dict):
+        chunks = iter_json_object(data, indent)
+    elif isinstance(data, (list, tuple)):
+        chunks = iter_json_array(data, indent)
+    else:
+        chunks = [dumps_bytes(data, indent)]
+    for chunk in chunks:
+        fp.write(chunk)
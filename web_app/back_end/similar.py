@@ -0,0 +1,293 @@
+"""Precomputed "more like this" neighbours.
+
+Every recipe is a sparse TF-IDF vector over its tags and canonical
+ingredients; the similarity of two recipes is the cosine of their vectors.
+The offline job below finds the top-k neighbours of every recipe and writes
+them, with their scores, as a compact array file that the web app loads once
+per process (before forking, under gunicorn) and reads with a single lookup.
+
+    python -m back_end.similar --out data/similar_recipes.npz --workers 4
+    python -m back_end.similar --out data/similar_recipes.npz --incremental
+
+Run from the web_app directory.  --memory-mb bounds the scratch memory of
+each worker; --incremental only scores recipes missing from the existing
+table (and lets them into their neighbours' lists).
+"""
+import argparse
+import multiprocessing
+import os
+from array import array
+import numpy as np
+from bson import ObjectId
+
+DEFAULT_TABLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'data', 'similar_recipes.npz')
+
+# Tags say what kind of dish it is; ingredients say more about what it is like
+TAG_WEIGHT = 0.5
+INGREDIENT_WEIGHT = 1.0
+
+
+class FeatureMatrix:
+    """L2-normalized TF-IDF rows in CSR form, plus the same data by feature (CSC).
+
+    Features in fewer than min_df recipes can't make two recipes similar and
+    features in more than max_df of them ('easy', 'salt') barely tell recipes
+    apart while costing the most to score, so both are dropped.
+    """
+
+    def __init__(self, records, min_df=2, max_df=0.2):
+        vocabulary = {}
+        weights = []
+        cols = array('i')
+        indptr = array('q', [0])
+        for record in records:
+            for prefix, values, weight in (('t:', record.get('tags') or (), TAG_WEIGHT),
+                                           ('i:', record.get('ingredient_keys') or (), INGREDIENT_WEIGHT)):
+                for value in dict.fromkeys(values):
+                    key = prefix + value
+                    feature = vocabulary.get(key)
+                    if feature is None:
+                        feature = vocabulary[key] = len(weights)
+                        weights.append(weight)
+                    cols.append(feature)
+            indptr.append(len(cols))
+        self.size = len(indptr) - 1
+
+        cols = np.frombuffer(cols, dtype=np.int32) if len(cols) else np.zeros(0, np.int32)
+        indptr = np.frombuffer(indptr, dtype=np.int64)
+        rows = np.repeat(np.arange(self.size, dtype=np.int32), np.diff(indptr))
+        df = np.bincount(cols, minlength=len(weights))
+        keep_feature = (df >= min_df) & (df <= max(min_df, max_df * self.size))
+        idf = np.zeros(len(weights), dtype=np.float32)
+        idf[keep_feature] = np.log(self.size / df[keep_feature]) * np.array(weights)[keep_feature]
+
+        data = idf[cols]
+        keep = data > 0
+        rows, cols, data = rows[keep], cols[keep], data[keep]
+        norms = np.sqrt(np.bincount(rows, weights=data.astype(np.float64) ** 2, minlength=self.size))
+        data = (data / np.where(norms > 0, norms, 1)[rows]).astype(np.float32)
+
+        self.indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=self.size))))
+        self.indices = cols
+        self.data = data
+        order = np.argsort(cols, kind='stable')
+        self.feature_indptr = np.concatenate(([0], np.cumsum(np.bincount(cols, minlength=len(weights)))))
+        self.feature_rows = rows[order]
+        self.feature_data = data[order]
+
+    def scores(self, rows):
+        """Dense cosine similarities of the given rows against every row"""
+        slab = np.zeros((len(rows), self.size), dtype=np.float32)
+        for i, row in enumerate(rows):
+            for p in range(self.indptr[row], self.indptr[row + 1]):
+                feature = self.indices[p]
+                start, end = self.feature_indptr[feature], self.feature_indptr[feature + 1]
+                slab[i, self.feature_rows[start:end]] += self.data[p] * self.feature_data[start:end]
+            slab[i, row] = 0        # never your own neighbour
+        return slab
+
+
+def top_k(slab, k):
+    """Best k columns per slab row as (neighbours, scores); -1 marks no neighbour"""
+    k = min(k, slab.shape[1])
+    if k == 0:
+        return np.zeros((len(slab), 0), np.int32), np.zeros((len(slab), 0), np.float16)
+    columns = slab.shape[1]
+    part = np.argpartition(slab, columns - k, axis=1)[:, columns - k:]
+    values = np.take_along_axis(slab, part, axis=1)
+    order = np.argsort(-values, axis=1, kind='stable')
+    neighbours = np.take_along_axis(part, order, axis=1).astype(np.int32)
+    values = np.take_along_axis(values, order, axis=1)
+    neighbours[values <= 0] = -1
+    return neighbours, values.astype(np.float16)
+
+
+# ── offline job ───────────────────────────────────────────────────────
+_job = {}
+
+
+def _score_chunk(chunk):
+    """Worker: neighbours of a chunk of rows, plus the old rows they should join"""
+    matrix, k, thresholds = _job['matrix'], _job['k'], _job.get('thresholds')
+    slab = matrix.scores(chunk)
+    neighbours, scores = top_k(slab, k)
+    joins = []
+    if thresholds is not None:
+        # Similarity is symmetric: a new recipe belongs in an old recipe's
+        # list if it beats that list's current last entry
+        for i, row in enumerate(chunk):
+            old = np.flatnonzero(slab[i, :len(thresholds)] > thresholds)
+            joins.extend((int(o), int(row), float(slab[i, o])) for o in old)
+    return chunk, neighbours, scores, joins
+
+
+def compute_neighbours(matrix, rows, k=10, workers=1, memory_mb=256, thresholds=None):
+    """Top-k neighbours of the given rows, in chunks sized to the memory budget.
+
+    Yields (chunk, neighbours, scores, joins) per chunk.
+    """
+    chunk_size = max(1, int(memory_mb * 2 ** 20 // (matrix.size * 4 * 2)))
+    chunks = [rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)]
+    _job.update(matrix=matrix, k=k, thresholds=thresholds)
+    try:
+        if workers > 1:
+            # Forked workers inherit the matrix without copying it
+            with multiprocessing.get_context('fork').Pool(workers) as pool:
+                yield from pool.imap_unordered(_score_chunk, chunks)
+        else:
+            yield from map(_score_chunk, chunks)
+    finally:
+        _job.clear()
+
+
+def build_table(records, ids, k=10, workers=1, memory_mb=256, previous=None):
+    """Neighbour table for all records.
+
+    With a previous table only rows whose id it doesn't know are scored; the
+    old lists are kept (remapped to the new rows) and the new recipes are
+    merged into them where they rank.
+    """
+    matrix = FeatureMatrix(records)
+    size = matrix.size
+    neighbours = np.full((size, k), -1, dtype=np.int32)
+    scores = np.zeros((size, k), dtype=np.float16)
+
+    todo = np.arange(size, dtype=np.int32)
+    thresholds = None
+    if previous is not None and previous.k != k:
+        raise ValueError(f"the previous table has k={previous.k}; rebuild it in full for k={k}")
+    if previous is not None:
+        row_of = {rid: row for row, rid in enumerate(ids)}
+        old_rows = np.array([row_of.get(rid, -1) for rid in previous.ids], dtype=np.int32)
+        known = old_rows >= 0
+        # Old rows that still exist, at their new positions
+        remapped = np.where(previous.neighbours >= 0, old_rows[previous.neighbours], -1)
+        neighbours[old_rows[known]] = remapped[known][:, :k]
+        scores[old_rows[known]] = previous.scores[known][:, :k]
+        scores[neighbours < 0] = 0
+        seen = np.zeros(size, dtype=bool)
+        seen[old_rows[known]] = True
+        todo = np.flatnonzero(~seen).astype(np.int32)
+        # Existing recipes must come first for the thresholds to line up
+        order = np.concatenate((np.flatnonzero(seen), todo))
+        if not np.array_equal(order, np.arange(size)):
+            raise ValueError("new recipes must come after the existing ones")
+        thresholds = np.where(neighbours[:, -1] >= 0, scores[:, -1], 0).astype(np.float32)[seen]
+
+    joins = []
+    for chunk, chunk_neighbours, chunk_scores, chunk_joins in compute_neighbours(
+            matrix, todo, k, workers, memory_mb, thresholds):
+        neighbours[chunk, :chunk_neighbours.shape[1]] = chunk_neighbours
+        scores[chunk, :chunk_scores.shape[1]] = chunk_scores
+        joins.extend(chunk_joins)
+
+    for old, new, score in joins:
+        merged = [(float(s), int(n)) for n, s in zip(neighbours[old], scores[old]) if n >= 0]
+        merged.append((score, new))
+        merged.sort(key=lambda pair: -pair[0])
+        merged = merged[:k]
+        neighbours[old] = [n for _, n in merged] + [-1] * (k - len(merged))
+        scores[old] = [s for s, _ in merged] + [0] * (k - len(merged))
+    return NeighbourTable(ids, neighbours, scores)
+
+
+class NeighbourTable:
+    """Top-k neighbour rows (int32) and scores (float16) per recipe id"""
+
+    def __init__(self, ids, neighbours, scores):
+        self.ids = list(ids)
+        self.neighbours = neighbours
+        self.scores = scores
+        self.row_of = {rid: row for row, rid in enumerate(self.ids)}
+
+    @property
+    def k(self):
+        return self.neighbours.shape[1]
+
+    def similar(self, recipe_id, k=None):
+        """Ids of the most similar recipes, best first"""
+        row = self.row_of.get(recipe_id)
+        if row is None:
+            return []
+        return [self.ids[n] for n in self.neighbours[row][:k] if n >= 0]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if all(isinstance(i, ObjectId) for i in self.ids):
+            # Raw bytes, not 'S12': numpy strips trailing NULs from bytes strings
+            ids = np.frombuffer(b''.join(i.binary for i in self.ids), dtype=np.uint8)
+            ids, id_type = ids.reshape(-1, 12), 'objectid'
+        else:
+            ids, id_type = np.array(self.ids, dtype=np.int64), 'int'
+        with open(path, 'wb') as f:
+            np.savez(f, ids=ids, id_type=np.array(id_type),
+                     neighbours=self.neighbours, scores=self.scores)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as table:
+            if str(table['id_type']) == 'objectid':
+                ids = [ObjectId(row.tobytes()) for row in table['ids']]
+            else:
+                ids = [int(i) for i in table['ids']]
+            return cls(ids, table['neighbours'], table['scores'])
+
+
+# ── process-wide table used by the web app ───────────────────────────
+_shared_table = None
+
+
+def get_neighbour_table(path=None):
+    """Load the table once per process; None if the job hasn't been run"""
+    global _shared_table
+    if _shared_table is None:
+        path = path or os.environ.get('SIMILAR_TABLE', DEFAULT_TABLE)
+        if not os.path.exists(path):
+            return None
+        try:
+            _shared_table = NeighbourTable.load(path)
+        except Exception as e:
+            print(f"Error loading similar-recipe table: {e}")
+            return None
+    return _shared_table
+
+
+def main():
+    from .mongo_connection import RecipeDatabase
+    from .corpus import RecipeCorpus
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--out', default=DEFAULT_TABLE)
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--memory-mb', type=int, default=256)
+    parser.add_argument('--incremental', action='store_true')
+    args = parser.parse_args()
+
+    db = RecipeDatabase()
+    if not db.connect():
+        raise SystemExit(1)
+    corpus = RecipeCorpus.load(db.collection)
+    records, ids = corpus.recipes, corpus.ids
+    previous = None
+    if args.incremental and os.path.exists(args.out):
+        previous = NeighbourTable.load(args.out)
+    if previous is not None and previous.k != args.k:
+        print(f"{args.out} has {previous.k} neighbours per recipe, not {args.k}; rebuilding in full.")
+        previous = None
+    if previous is not None:
+        # Known recipes first, new ones after, as build_table expects
+        known = set(previous.ids)
+        order = sorted(range(len(ids)), key=lambda row: ids[row] not in known)
+        records = [records[row] for row in order]
+        ids = [ids[row] for row in order]
+        print(f"{sum(1 for i in ids if i not in known)} new recipes to score.")
+    table = build_table(records, ids, args.k, args.workers, args.memory_mb, previous)
+    table.save(args.out)
+    print(f"Wrote neighbours of {len(table.ids)} recipes to {args.out}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import math
+import re
+from array import array
+import numpy as np
+from .ingredients import singular
+
+# Field weights for BM25F: a hit in the name counts most, then the
+# description and ingredients, then the steps
+FIELD_BOOSTS = {'name': 3.0, 'description': 1.5, 'ingredients': 1.2, 'steps': 1.0}
+TEXT_FIELDS = tuple(FIELD_BOOSTS)
+
+K1 = 1.2
+B = 0.75
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'from',
+    'has', 'have', 'i', 'in', 'into', 'is', 'it', 'its', 'my', 'of', 'on',
+    'or', 'so', 'that', 'the', 'then', 'this', 'to', 'until', 'was', 'will',
+    'with', 'you', 'your',
+}
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """Lowercased, singular word tokens without stopwords"""
+    if isinstance(text, (list, tuple)):
+        text = ' '.join(t for t in text if isinstance(t, str))
+    return [
+        singular(w) for w in _WORD.findall((text or '').lower())
+        if w not in STOPWORDS
+    ]
+
+
+class BM25Index:
+    """BM25F search over recipe text with impact-ordered postings.
+
+    The text itself is not kept.  For every term the index stores the rows
+    containing it (int32) and that row's precomputed BM25F contribution,
+    quantized to a uint8 "impact", sorted from highest impact to lowest.  All
+    postings live in two flat arrays addressed by per-term offsets.
+
+    search() reads the postings of the query terms in growing blocks, highest
+    impacts first, and stops as soon as no row that has not been scored yet -
+    and no partly scored row - can still reach the top k.
+    """
+
+    BLOCK = 4096
+    MAX_QUERY_TERMS = 16
+    # Queries with fewer postings than this many per row are cheaper to
+    # score in a single pass than to check for early termination
+    EXHAUSTIVE_BELOW = 1.0
+
+    def __init__(self, documents, size=None):
+        """documents yields (row, {field: text}) pairs, rows counting from 0"""
+        n_fields = len(TEXT_FIELDS)
+        term_ids = {}
+        rows_of = []        # term id -> array('i') of rows
+        counts_of = []      # term id -> array('B'), n_fields counts per row
+        lengths = array('f')
+        length_rows = array('i')
+
+        # One pass over the documents: per-term rows and per-field counts
+        n_rows = 0
+        for row, doc in documents:
+            counts = {}
+            for f, field in enumerate(TEXT_FIELDS):
+                tokens = tokenize(doc.get(field))
+                lengths.append(len(tokens))
+                for token in tokens:
+                    per_field = counts.get(token)
+                    if per_field is None:
+                        per_field = counts[token] = [0] * n_fields
+                    per_field[f] = min(per_field[f] + 1, 255)
+            length_rows.append(row)
+            for token, per_field in counts.items():
+                term = term_ids.get(token)
+                if term is None:
+                    term = term_ids[token] = len(rows_of)
+                    rows_of.append(array('i'))
+                    counts_of.append(array('B'))
+                rows_of[term].append(row)
+                counts_of[term].extend(per_field)
+            n_rows = max(n_rows, row + 1)
+        self.size = n_rows if size is None else size
+
+        # BM25 length normalization per row and field
+        field_lengths = np.zeros((self.size, n_fields), dtype=np.float32)
+        field_lengths[np.frombuffer(length_rows, dtype=np.int32)] = \
+            np.frombuffer(lengths, dtype=np.float32).reshape(-1, n_fields)
+        average = field_lengths.mean(axis=0) if self.size else np.ones(n_fields)
+        average[average == 0] = 1.0
+        norms = 1 - B + B * field_lengths / average
+        boosts = np.array([FIELD_BOOSTS[f] for f in TEXT_FIELDS], dtype=np.float32)
+        weights = boosts / norms
+        del field_lengths, norms
+
+        # BM25 contribution of every (term, row), then quantize
+        impacts_of = []
+        max_impact = 0.0
+        for rows, counts in zip(rows_of, counts_of):
+            rows = np.frombuffer(rows, dtype=np.int32)
+            counts = np.frombuffer(counts, dtype=np.uint8).reshape(-1, n_fields)
+            # BM25F: boosted, length-normalized frequency summed over fields
+            tf = (counts * weights[rows]).sum(axis=1)
+            df = len(rows)
+            idf = math.log(1 + (self.size - df + 0.5) / (df + 0.5))
+            impact = idf * tf * (K1 + 1) / (K1 + tf)
+            impacts_of.append(impact)
+            max_impact = max(max_impact, float(impact.max()))
+        del counts_of
+        self.scale = 255.0 / max_impact if max_impact else 1.0
+
+        total = sum(len(r) for r in rows_of)
+        self.rows = np.empty(total, dtype=np.int32)
+        self.impacts = np.empty(total, dtype=np.uint8)
+        self.offsets = np.zeros(len(rows_of) + 1, dtype=np.int64)
+        position = 0
+        for term, (rows, impact) in enumerate(zip(rows_of, impacts_of)):
+            quantized = np.clip(np.rint(impact * self.scale), 1, 255).astype(np.uint8)
+            order = np.argsort(-quantized.astype(np.int16), kind='stable')
+            end = position + len(rows)
+            self.rows[position:end] = np.frombuffer(rows, dtype=np.int32)[order]
+            self.impacts[position:end] = quantized[order]
+            position = end
+            self.offsets[term + 1] = end
+        self.term_ids = term_ids
+
+    @classmethod
+    def from_collection(cls, collection, row_of, size, batch_size=2000):
+        """Stream the text fields of a recipes collection into an index.
+
+        row_of maps recipe _id to the corpus row the index should use.
+        """
+        projection = {field: 1 for field in TEXT_FIELDS}
+        cursor = collection.find({}, projection).batch_size(batch_size)
+        documents = (
+            (row_of[doc['_id']], doc) for doc in cursor if doc.get('_id') in row_of
+        )
+        return cls(documents, size=size)
+
+    def _postings(self, term):
+        start, end = self.offsets[term], self.offsets[term + 1]
+        return self.rows[start:end], self.impacts[start:end]
+
+    def search(self, query, k=10, mask=None):
+        """Top-k (row, score) pairs, best first.
+
+        mask is an optional boolean array over rows (e.g. the quiz filters);
+        rows where it is False are never returned.
+        """
+        terms = []
+        for token in dict.fromkeys(tokenize(query)):
+            if token in self.term_ids:
+                terms.append(self.term_ids[token])
+        if not terms or k <= 0:
+            return []
+        # Rarest (highest impact) terms first; very long queries keep the best ones
+        terms.sort(key=lambda t: self.offsets[t + 1] - self.offsets[t])
+        terms = terms[:self.MAX_QUERY_TERMS]
+        postings = [self._postings(t) for t in terms]
+
+        scores = np.zeros(self.size, dtype=np.int32)
+        # Bit i set: term i has been counted for this row
+        seen = np.zeros(self.size, dtype=np.uint16)
+        position = [0] * len(terms)
+        total = sum(len(rows) for rows, _ in postings)
+        block = self.BLOCK if total >= self.EXHAUSTIVE_BELOW * self.size else total
+
+        while True:
+            for i, (rows, impacts) in enumerate(postings):
+                start = position[i]
+                if start >= len(rows):
+                    continue
+                block_rows = rows[start:start + block]
+                block_impacts = impacts[start:start + block]
+                position[i] = start + len(block_rows)
+                if mask is not None:
+                    keep = mask[block_rows]
+                    block_rows, block_impacts = block_rows[keep], block_impacts[keep]
+                scores[block_rows] += block_impacts
+                seen[block_rows] |= np.uint16(1 << i)
+
+            # Highest impact still unread per term: an upper bound on what
+            # each term can add to any row from here on
+            remaining = [
+                int(impacts[position[i]]) if position[i] < len(impacts) else 0
+                for i, (_, impacts) in enumerate(postings)
+            ]
+            if not any(remaining):
+                break
+            # Checking costs a pass over all rows, so read ever larger blocks
+            block *= 2
+            candidates = np.flatnonzero(seen)
+            if len(candidates) < k:
+                continue
+            partial = scores[candidates]
+            kth = np.partition(partial, len(partial) - k)[len(partial) - k]
+            if sum(remaining) > kth:
+                continue            # an unseen row could still make it
+            bound = partial.copy()
+            bits = seen[candidates]
+            for i, extra in enumerate(remaining):
+                if extra:
+                    bound += extra * ((bits >> i) & 1 == 0)
+            if np.count_nonzero(bound > kth) <= k:
+                break               # the top-k set can no longer change
+
+        candidates = np.flatnonzero(seen)
+        if not len(candidates):
+            return []
+        partial = scores[candidates]
+        bound = partial.copy()
+        bits = seen[candidates]
+        for i, extra in enumerate(remaining):
+            if extra:
+                bound += extra * ((bits >> i) & 1 == 0)
+        # The top k by partial score plus every row that could still pass them
+        pool = np.union1d(_top(candidates, partial, k), _top(candidates, bound, k))
+        # Finish the scores of those rows from the postings left unread
+        wanted = np.zeros(self.size, dtype=bool)
+        for i, (rows, impacts) in enumerate(postings):
+            if position[i] >= len(rows):
+                continue
+            missing = pool[(seen[pool] >> i) & 1 == 0]
+            if not len(missing):
+                continue
+            wanted[missing] = True
+            tail_rows = rows[position[i]:]
+            hit = wanted[tail_rows]
+            if mask is not None:
+                hit &= mask[tail_rows]
+            scores[tail_rows[hit]] += impacts[position[i]:][hit]
+            wanted[missing] = False
+        order = np.lexsort((pool, -scores[pool]))[:k]
+        return [(int(pool[j]), float(scores[pool[j]]) / self.scale) for j in order]
+
+
+def _top(rows, values, k):
+    """The k rows with the largest values, in no particular order"""
+    if len(rows) <= k:
+        return rows
+    return rows[np.argpartition(-values, k - 1)[:k]]
@@ -0,0 +1,93 @@
+"""Throughput of allergen flagging.
+
+    python benchmarks/allergen_bench.py [RAW_recipes.csv]
+
+With a Food.com CSV, flags every recipe of it; without one, a synthetic
+corpus of 230k recipes drawn from a few thousand ingredient names.  Prints
+the scan rate over distinct ingredient names (the Aho-Corasick automaton
+against one regex search per lexicon word) and the rate over whole recipes,
+where repeated names come from the classifier's memo.
+"""
+import csv
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(os.path.dirname(__file__), '..')
+    )
+)
+from back_end.allergens import AllergenClassifier, LEXICONS, EXCEPTIONS
+from back_end.ingredients import canonical_ingredients
+from back_end.ingest import parse_list
+
+WORDS = ['chicken', 'onion', 'garlic', 'tomato', 'rice', 'bean', 'pepper', 'oil', 'flour',
+         'sugar', 'salt', 'lemon', 'potato', 'carrot', 'celery', 'basil', 'thyme', 'broth',
+         'egg', 'butter', 'cheddar cheese', 'milk', 'walnut', 'peanut butter', 'shrimp',
+         'coconut milk', 'nutmeg', 'eggplant', 'cream of tartar', 'salmon', 'pecan']
+
+
+def csv_recipes(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return [canonical_ingredients(parse_list(row.get('ingredients'))) for row in csv.DictReader(f)]
+
+
+def synthetic_recipes(n, rng):
+    names = [f'{rng.choice(["red", "dried", "smoked", "ground", ""])} {rng.choice(WORDS)} {i % 7 or ""}'.strip()
+             for i in range(4000)]
+    return [rng.sample(names, rng.randint(4, 15)) for _ in range(n)]
+
+
+def regex_mask(patterns, text):
+    """The naive alternative: one search per pattern, exceptions applied per allergen"""
+    mask = 0
+    for bit, positive, excepted in patterns:
+        for p in positive:
+            for m in p.finditer(text):
+                if not any(e.start() <= m.start() and m.end() <= e.end()
+                           for x in excepted for e in x.finditer(text)):
+                    mask |= bit
+    return mask
+
+
+def main():
+    if len(sys.argv) > 1:
+        recipes = csv_recipes(sys.argv[1])
+    else:
+        recipes = synthetic_recipes(230000, random.Random(1))
+    names = list({name for recipe in recipes for name in recipe})
+    total = sum(len(r) for r in recipes)
+    print(f"{len(recipes)} recipes, {total} ingredient strings, {len(names)} distinct")
+
+    classifier = AllergenClassifier()
+    start = time.perf_counter()
+    for name in names:
+        classifier.mask(name)
+    elapsed = time.perf_counter() - start
+    print(f"  automaton, distinct names   {len(names) / elapsed:,.0f} names/s")
+
+    def compile_words(words):
+        return [re.compile(r'\b' + re.escape(w) + r'(?:e?s)?\b') for w in words]
+    patterns = [(1 << i, compile_words(LEXICONS[a]), compile_words(EXCEPTIONS.get(a, ())))
+                for i, a in enumerate(LEXICONS)]
+    sample = names[:2000]
+    start = time.perf_counter()
+    for name in sample:
+        regex_mask(patterns, name)
+    elapsed = time.perf_counter() - start
+    print(f"  regex per word, distinct    {len(sample) / elapsed:,.0f} names/s")
+
+    start = time.perf_counter()
+    for recipe in recipes:
+        classifier.classify(recipe)
+    elapsed = time.perf_counter() - start
+    print(f"  all recipes (memoized)      {len(recipes) / elapsed:,.0f} recipes/s "
+          f"({total / elapsed:,.0f} strings/s)")
+
+
+if __name__ == "__main__":
+    main()
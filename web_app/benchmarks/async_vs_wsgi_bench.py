@@ -0,0 +1,103 @@
+"""Compare the WSGI app (front_end/app.py) with the ASGI entry point
+(front_end/async_app.py) under concurrent I/O-bound traffic.
+
+Start both servers against the same database, e.g.
+
+    python front_end/app.py                         # WSGI, port 5000
+    PORT=5002 python front_end/async_app.py         # ASGI, port 5002
+
+then run from the web_app directory:
+
+    python benchmarks/async_vs_wsgi_bench.py \
+        --target wsgi=http://127.0.0.1:5000 --target asgi=http://127.0.0.1:5002 \
+        --username testuser --password password --recipe-id <an ObjectId>
+
+Each virtual user logs in once and then loops over /view_recipe,
+/saved_recipes and /results.  Throughput and latency percentiles are printed
+per target.
+"""
+import argparse
+import http.cookiejar
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def login(base_url, username, password):
+    """Return a urllib opener that carries a logged-in session cookie"""
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    body = urllib.parse.urlencode({'username': username, 'password': password}).encode()
+    opener.open(f"{base_url}/login", data=body, timeout=60).read()
+    return opener
+
+
+def run_user(base_url, paths, args, deadline, latencies, errors, lock):
+    opener = login(base_url, args.username, args.password)
+    while time.perf_counter() < deadline:
+        for path in paths:
+            start = time.perf_counter()
+            try:
+                opener.open(base_url + path, timeout=60).read()
+                ok = True
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors.append(path)
+
+
+def bench_target(label, base_url, args):
+    paths = [f"/view_recipe/{args.recipe_id}", "/saved_recipes", "/results"]
+    latencies, errors = [], []
+    lock = threading.Lock()
+    start = time.perf_counter()
+    deadline = start + args.duration
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [
+            pool.submit(run_user, base_url, paths, args, deadline, latencies, errors, lock)
+            for _ in range(args.concurrency)
+        ]
+        for f in futures:
+            f.result()
+    wall = time.perf_counter() - start
+
+    print(f"{label:<6} {base_url}")
+    print(f"  requests: {len(latencies)}  errors: {len(errors)}  "
+          f"throughput: {len(latencies) / wall:.1f} req/s")
+    print(f"  latency p50: {percentile(latencies, 50) * 1000:.1f} ms  "
+          f"p95: {percentile(latencies, 95) * 1000:.1f} ms  "
+          f"p99: {percentile(latencies, 99) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', action='append', required=True,
+                        help="label=base_url, may be repeated")
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--recipe-id', required=True)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=20.0, help="seconds per target")
+    args = parser.parse_args()
+
+    for target in args.target:
+        label, _, base_url = target.partition('=')
+        bench_target(label, base_url.rstrip('/'), args)
+
+
+if __name__ == "__main__":
+    main()
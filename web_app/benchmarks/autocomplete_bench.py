@@ -0,0 +1,78 @@
+"""Build time and query latency of the trigram name index.
+
+    python benchmarks/autocomplete_bench.py [n_names]
+
+Names are made up from recipe-like words; queries are prefixes typed letter
+by letter, plus misspellings.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(os.path.dirname(__file__), '..')
+    )
+)
+from back_end.name_index import TrigramIndex
+
+ADJECTIVES = ['easy', 'quick', 'spicy', 'creamy', 'baked', 'grilled', 'slow cooker',
+              'crispy', 'healthy', 'classic', 'lemon', 'garlic', 'honey', 'smoky',
+              'sheet pan', 'grandma s', 'low fat', 'cheesy', 'roasted', 'one pot']
+MAINS = ['chicken', 'beef', 'pork', 'salmon', 'shrimp', 'tofu', 'lentil', 'chickpea',
+         'mushroom', 'potato', 'pasta', 'rice', 'noodle', 'turkey', 'sweet potato',
+         'cauliflower', 'eggplant', 'spinach', 'black bean', 'zucchini']
+DISHES = ['soup', 'stew', 'curry', 'salad', 'casserole', 'tacos', 'stir fry', 'bake',
+          'skillet', 'chili', 'burgers', 'pie', 'risotto', 'lasagna', 'wraps',
+          'muffins', 'bread', 'cookies', 'pizza', 'enchiladas']
+QUERIES = ['chicken curry', 'spicy black bean soup', 'sweet potato casserole',
+           'creamy mushroom risotto', 'sheet pan salmon']
+TYPOS = ['chiken cury', 'spcy blak bean soup', 'swet potatoe casserol', 'lazagna', 'enchilladas']
+
+
+def make_names(n, rng):
+    return [
+        f"{rng.choice(ADJECTIVES)} {rng.choice(MAINS)} {rng.choice(DISHES)} {i % 997}"
+        for i in range(n)
+    ]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def timed_queries(index, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, 10)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    names = make_names(n, random.Random(1))
+
+    start = time.perf_counter()
+    index = TrigramIndex(names)
+    index.search('warm up')
+    print(f"built index over {n} names in {time.perf_counter() - start:.1f}s "
+          f"({len(index.postings)} trigrams)")
+
+    # Every keystroke from the third letter on, like the search box sends them
+    keystrokes = [q[:i] for q in QUERIES for i in range(3, len(q) + 1)]
+    for label, queries in (('keystrokes', keystrokes), ('misspelt', TYPOS * 10)):
+        timings = timed_queries(index, queries)
+        print(f"  {label:10s} {len(timings):4d} queries  "
+              f"p50 {percentile(timings, 50):6.2f} ms  p99 {percentile(timings, 99):6.2f} ms")
+    for query in TYPOS[:3]:
+        best = index.search(query, 1)
+        print(f"  {query!r:26} -> {names[best[0][0]] if best else None!r}")
+
+
+if __name__ == "__main__":
+    main()
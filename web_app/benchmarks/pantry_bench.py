@@ -0,0 +1,84 @@
+"""Latency of pantry matching ("cook with what I have").
+
+    python benchmarks/pantry_bench.py [n_recipes] [pantry_size]
+
+Builds a synthetic corpus (1M recipes by default) whose ingredients follow
+a Zipf-like popularity curve, like Food.com's, then times
+RecipeCorpus.pantry_match for random pantries drawn from the popular end,
+with and without a quiz filter.
+"""
+import os
+import random
+import sys
+import time
+import numpy as np
+
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(os.path.dirname(__file__), '..')
+    )
+)
+from back_end.corpus import RecipeCorpus
+
+N_INGREDIENTS = 15000
+TAGS = ['breakfast', 'lunch', 'dinner', 'vegetarian', 'easy', 'main-dish', 'side-dishes']
+
+
+def synthetic_recipes(n, rng):
+    names = [f'ingredient {i}' for i in range(N_INGREDIENTS)]
+    weights = 1 / np.arange(1, N_INGREDIENTS + 1)
+    weights /= weights.sum()
+    sizes = rng.integers(4, 16, size=n)
+    picks = rng.choice(N_INGREDIENTS, size=int(sizes.sum()), p=weights)
+    recipes, at = [], 0
+    for i, size in enumerate(sizes):
+        keys = list(dict.fromkeys(names[j] for j in picks[at:at + size]))
+        at += size
+        recipes.append({
+            '_id': i, 'name': f'recipe {i}', 'minutes': int(rng.integers(5, 240)),
+            'tags': [TAGS[j] for j in rng.choice(len(TAGS), 3, replace=False)],
+            'ingredients': keys, 'ingredient_keys': keys, 'allergens': [],
+        })
+    return recipes, names
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def timed(fn, repeat=50):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return f"p50 {percentile(timings, 50):.1f} ms  p99 {percentile(timings, 99):.1f} ms"
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    pantry_size = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rng = np.random.default_rng(1)
+    start = time.perf_counter()
+    recipes, names = synthetic_recipes(n, rng)
+    corpus = RecipeCorpus(recipes)
+    del recipes
+    print(f"built {n} recipes in {time.perf_counter() - start:.0f} s")
+
+    pick = random.Random(1)
+    pantries = [pick.sample(names[:500], pantry_size) for _ in range(50)]
+    postings = corpus.list_index['ingredient_keys']
+    average = np.mean([sum(len(postings.get(k, ())) for k in p) for p in pantries])
+    print(f"pantry of {pantry_size}: {average:,.0f} postings on average")
+
+    it = iter(pantries * 2)
+    print(f"  top 20              {timed(lambda: corpus.pantry_match(next(it), 20))}")
+    quiz = {"$and": [{"tags": {"$all": ["vegetarian"]}}, {"minutes": {"$lte": 60}}]}
+    it = iter(pantries * 2)
+    print(f"  top 20, quiz filter {timed(lambda: corpus.pantry_match(next(it), 20, quiz))}")
+
+
+if __name__ == "__main__":
+    main()
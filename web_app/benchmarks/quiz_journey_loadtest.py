@@ -0,0 +1,347 @@
+"""Load test for the full quiz-to-results user journey.
+
+Every virtual user signs up once, then repeats
+
+    login -> start_quiz -> page1..page7 -> results -> save_recipe -> saved_recipes
+
+with answers drawn from the distributions below.  Run from the web_app
+directory, either against a live server:
+
+    python benchmarks/quiz_journey_loadtest.py --base-url http://127.0.0.1:5000
+
+or in-process, through the Flask test client backed by mongomock (this mode
+also counts MongoDB operations per journey and per route):
+
+    python benchmarks/quiz_journey_loadtest.py --in-process --recipes 5000 \
+        --users 16 --journeys 5 --report bench_output.json
+
+The JSON report is written with sorted keys so two runs can be diffed.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+WEB_APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# ── answer distributions (value -> weight), mirrors page1..page7 ─────
+DIET_WEIGHTS = {
+    'no_restriction': 55, 'vegetarian': 14, 'vegan': 5, 'gluten_free': 6,
+    'kosher': 2, 'lactose_free': 4, 'eggs_dairy': 4, 'seafood': 4, 'nuts': 6,
+}
+CALORIE_WEIGHTS = {'1': 6, '2': 10, '3': 16, '4': 22, '5': 8, '6': 4, '7': 34}
+TIME_WEIGHTS = {'1': 30, '2': 32, '3': 10, '4': 4, '5': 2, '6': 22}
+CUISINE_WEIGHTS = {
+    'any': 45, 'italian': 10, 'mexican': 7, 'asian': 7, 'north-american': 6,
+    'chinese': 5, 'indian': 5, 'european': 4, 'french': 3, 'greek': 3,
+    'middle_eastern': 2, 'midwestern': 1, 'canadian': 1, 'australian': 1,
+}
+BEGINNER_WEIGHTS = {'1': 35, '2': 65}
+MEAL_WEIGHTS = {'breakfast': 25, 'brunch': 8, 'lunch': 30, 'dinner': 37}
+DISH_WEIGHTS = {
+    'main_dish': 45, 'side_dishes': 20, 'desserts': 12,
+    'appetizers': 8, 'soups_stews': 9, 'beverage': 6,
+}
+# How many options users tick on the multi-select pages
+MULTI_SELECT_SIZES = {1: 60, 2: 28, 3: 12}
+
+SAVE_LINK = re.compile(r'/save_recipe/([0-9a-f]{24})')
+
+
+def pick(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def pick_many(rng, weights):
+    size = pick(rng, MULTI_SELECT_SIZES)
+    chosen = []
+    while len(chosen) < min(size, len(weights)):
+        value = pick(rng, weights)
+        if value not in chosen:
+            chosen.append(value)
+    return chosen
+
+
+def quiz_answers(rng):
+    """One set of quiz answers, keyed by the form field names"""
+    return [
+        ('/page1', {'dietary_preferences[]': pick_many(rng, DIET_WEIGHTS)}),
+        ('/page2', {'response2': pick(rng, CALORIE_WEIGHTS)}),
+        ('/page3', {'response3': pick(rng, TIME_WEIGHTS)}),
+        ('/page4', {'response4[]': pick_many(rng, CUISINE_WEIGHTS)}),
+        ('/page5', {'response5': pick(rng, BEGINNER_WEIGHTS)}),
+        ('/page6', {'response6[]': pick_many(rng, MEAL_WEIGHTS)}),
+        ('/page7', {'response7[]': pick_many(rng, DISH_WEIGHTS)}),
+    ]
+
+
+# ── transports ───────────────────────────────────────────────────────
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpTransport:
+    """Talks to a live server; redirects are returned, not followed"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect()
+        )
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data, doseq=True).encode() if data is not None else None
+        if method == 'POST' and body is None:
+            body = b''
+        try:
+            with self.opener.open(self.base_url + path, data=body, timeout=60) as resp:
+                return resp.status, resp.read().decode('utf-8', 'replace')
+        except urllib.error.HTTPError as e:
+            return e.code, ''
+
+
+class FlaskTransport:
+    """Drives the Flask app in-process through its test client"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        if method == 'POST':
+            resp = self.client.post(path, data=data or {})
+        else:
+            resp = self.client.get(path)
+        return resp.status_code, resp.get_data(as_text=True)
+
+
+# ── in-process stand-in for MongoDB ──────────────────────────────────
+def synthetic_recipes(count, rng):
+    meals = ['breakfast', 'brunch', 'lunch', 'dinner']
+    dishes = ['main-dish', 'side-dishes', 'desserts', 'appetizers', 'soups-stews', 'beverages']
+    cuisines = ['north-american', 'european', 'asian', 'italian', 'mexican', 'canadian',
+                'australian', 'midwestern', 'african', 'indian', 'greek', 'french',
+                'middle-eastern', 'chinese']
+    diets = ['vegetarian', 'vegan', 'gluten-free', 'kosher', 'lactose-free']
+    recipes = []
+    for i in range(count):
+        tags = rng.sample(meals, rng.randint(1, 2)) + [rng.choice(dishes), rng.choice(cuisines)]
+        tags += rng.sample(diets, rng.randint(0, 2))
+        if rng.random() < 0.4:
+            tags.append(rng.choice(['easy', 'beginner-cook']))
+        recipes.append({
+            'name': f'synthetic recipe {i}',
+            'minutes': rng.choice([10, 20, 25, 35, 45, 60, 75, 100, 150]),
+            'description': 'generated for load testing',
+            'tags': tags,
+            'nutrition': {'calories': round(rng.uniform(40, 1200), 1), 'protein': rng.randint(0, 80)},
+            'n_steps': 3,
+            'steps': ['prepare', 'cook', 'serve'],
+            'ingredients': ['ingredient a', 'ingredient b'],
+        })
+    return recipes
+
+
+def build_in_process_app(recipe_count, preload_corpus, rng):
+    """Import front_end/app.py with MongoClient replaced by a counting mongomock"""
+    import mongomock
+
+    sys.path.insert(0, WEB_APP_DIR)
+    sys.path.insert(0, os.path.join(WEB_APP_DIR, 'front_end'))
+    import back_end.mongo_connection as mongo_connection
+    from tests.op_counter import CountingClient, OperationLog
+
+    store = mongomock.MongoClient()
+    store['recipe_database']['recipes'].insert_many(synthetic_recipes(recipe_count, rng))
+    log = OperationLog()
+    mongo_connection.MongoClient = lambda *args, **kwargs: CountingClient(store, log)
+
+    import app as web
+    if preload_corpus:
+        from back_end.corpus import load_shared_corpus
+        load_shared_corpus(store['recipe_database']['recipes'])
+    web.app.config['TESTING'] = True
+    return web.app, log
+
+
+# ── the journey ──────────────────────────────────────────────────────
+class Stats:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.journeys = 0
+        self.failed_journeys = 0
+        self.lock = threading.Lock()
+
+    def add(self, label, elapsed, ok):
+        with self.lock:
+            self.latencies.setdefault(label, [])
+            self.errors.setdefault(label, 0)
+            if ok:
+                self.latencies[label].append(elapsed)
+            else:
+                self.errors[label] += 1
+
+
+def step(transport, stats, log, label, method, path, data=None, expect=(200, 302)):
+    if log is not None:
+        log.set_label(label)
+    start = time.perf_counter()
+    try:
+        status, body = transport.request(method, path, data)
+        ok = status in expect
+    except Exception:
+        status, body, ok = None, '', False
+    stats.add(label, time.perf_counter() - start, ok)
+    if not ok:
+        raise RuntimeError(f"{label} returned {status}")
+    return body
+
+
+def run_user(user_no, make_transport, args, stats, log):
+    rng = random.Random(args.seed * 1000 + user_no)
+    transport = make_transport()
+    credentials = {'username': f'loadtest-{args.seed}-{user_no}', 'password': 'loadtest'}
+    step(transport, stats, log, 'POST /sign_up', 'POST', '/sign_up', credentials)
+    step(transport, stats, log, 'GET /logout', 'GET', '/logout')
+
+    for _ in range(args.journeys):
+        try:
+            step(transport, stats, log, 'GET /login', 'GET', '/login')
+            step(transport, stats, log, 'POST /login', 'POST', '/login', credentials)
+            step(transport, stats, log, 'GET /start_quiz', 'GET', '/start_quiz')
+            for path, answers in quiz_answers(rng):
+                step(transport, stats, log, f'GET {path}', 'GET', path)
+                step(transport, stats, log, f'POST {path}', 'POST', path, answers)
+            body = step(transport, stats, log, 'GET /results', 'GET', '/results')
+            recipe_ids = SAVE_LINK.findall(body)
+            if recipe_ids:
+                step(transport, stats, log, 'POST /save_recipe', 'POST',
+                     f'/save_recipe/{rng.choice(recipe_ids)}')
+            step(transport, stats, log, 'GET /saved_recipes', 'GET', '/saved_recipes')
+            step(transport, stats, log, 'GET /logout', 'GET', '/logout')
+            with stats.lock:
+                stats.journeys += 1
+        except RuntimeError:
+            with stats.lock:
+                stats.failed_journeys += 1
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    k = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return round(values[k] * 1000, 3)
+
+
+def build_report(args, stats, log, wall):
+    routes = {}
+    for label in sorted(stats.latencies):
+        latencies = stats.latencies[label]
+        total = len(latencies) + stats.errors[label]
+        routes[label] = {
+            'requests': total,
+            'errors': stats.errors[label],
+            'error_rate': round(stats.errors[label] / total, 4) if total else 0.0,
+            'throughput_rps': round(total / wall, 2),
+            'latency_ms': {p: percentile(latencies, int(p[1:])) for p in ('p50', 'p90', 'p95', 'p99')},
+        }
+        if log is not None:
+            routes[label]['mongo_ops'] = log.count(label)
+
+    journeys = max(stats.journeys, 1)
+    report = {
+        'config': {
+            'mode': 'in-process' if args.in_process else 'http',
+            'base_url': None if args.in_process else args.base_url,
+            'users': args.users,
+            'journeys_per_user': args.journeys,
+            'recipes': args.recipes if args.in_process else None,
+            'preload_corpus': args.preload_corpus,
+            'seed': args.seed,
+        },
+        'wall_seconds': round(wall, 3),
+        'journeys': {
+            'completed': stats.journeys,
+            'failed': stats.failed_journeys,
+            'throughput_per_s': round(stats.journeys / wall, 3),
+        },
+        'routes': routes,
+        'mongo': None,
+    }
+    if log is not None:
+        journey_ops = log.count() - log.count('POST /sign_up')
+        report['mongo'] = {
+            'total_ops': log.count(),
+            'ops_per_journey': round(journey_ops / journeys, 2),
+            'by_operation': log.by_operation(),
+        }
+    return report
+
+
+def print_report(report):
+    print(f"{report['journeys']['completed']} journeys in {report['wall_seconds']} s "
+          f"({report['journeys']['throughput_per_s']} journeys/s, "
+          f"{report['journeys']['failed']} failed)")
+    print(f"{'route':<22}{'req':>7}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'mongo':>8}")
+    for label, r in report['routes'].items():
+        lat = r['latency_ms']
+        print(f"{label:<22}{r['requests']:>7}{r['errors']:>6}{r['throughput_rps']:>9}"
+              f"{lat['p50'] or 0:>9.1f}{lat['p95'] or 0:>9.1f}{lat['p99'] or 0:>9.1f}"
+              f"{r.get('mongo_ops', '-'):>8}")
+    if report['mongo']:
+        print(f"MongoDB operations per journey: {report['mongo']['ops_per_journey']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--base-url', help="live server, e.g. http://127.0.0.1:5000")
+    target.add_argument('--in-process', action='store_true',
+                        help="use the Flask test client and a mongomock database")
+    parser.add_argument('--users', type=int, default=8, help="concurrent virtual users")
+    parser.add_argument('--journeys', type=int, default=5, help="journeys per user")
+    parser.add_argument('--recipes', type=int, default=2000, help="synthetic recipes (in-process)")
+    parser.add_argument('--preload-corpus', action='store_true',
+                        help="serve recommendations from the in-memory corpus (in-process)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--report', help="write the JSON report to this path")
+    args = parser.parse_args()
+
+    log = None
+    if args.in_process:
+        app, log = build_in_process_app(args.recipes, args.preload_corpus, random.Random(args.seed))
+        log.reset()
+        make_transport = lambda: FlaskTransport(app)
+    else:
+        make_transport = lambda: HttpTransport(args.base_url)
+
+    stats = Stats()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        futures = [pool.submit(run_user, n, make_transport, args, stats, log)
+                   for n in range(args.users)]
+        for f in futures:
+            f.result()
+    wall = time.perf_counter() - start
+
+    report = build_report(args, stats, log, wall)
+    print_report(report)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Scoring latency of the quality ranker.
+
+    python benchmarks/ranker_bench.py [n_candidates] [n_corpus]
+
+Times the per-slot work: one matrix-vector product over the candidates'
+feature matrix plus top-k selection, and the same from precomputed corpus
+scores.  The weights are random; only the shapes matter here.
+"""
+import os
+import random
+import sys
+import time
+import numpy as np
+
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(os.path.dirname(__file__), '..')
+    )
+)
+from back_end.ranker import QualityRanker, NUMERIC_FEATURES, TAG_FEATURES, top_k
+from back_end.corpus import RecipeCorpus
+
+TAGS = [f'tag{i}' for i in range(500)]
+
+
+def synthetic_recipes(n, rng):
+    return [{
+        '_id': i, 'name': f'recipe {i}', 'minutes': rng.randint(5, 240),
+        'n_steps': rng.randint(2, 20), 'tags': rng.sample(TAGS, 15),
+        'ingredients': ['x'] * rng.randint(3, 15),
+        'nutrition': {'calories': rng.randint(50, 1200), 'protein': rng.randint(0, 80)},
+    } for i in range(n)]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def timed(fn, repeat=200):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return f"p50 {percentile(timings, 50):.3f} ms  p99 {percentile(timings, 99):.3f} ms"
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    n_corpus = int(sys.argv[2]) if len(sys.argv) > 2 else 230000
+    rng = random.Random(1)
+    np_rng = np.random.default_rng(1)
+    ranker = QualityRanker(TAGS[:TAG_FEATURES],
+                           np_rng.normal(size=len(NUMERIC_FEATURES) + TAG_FEATURES), 0.1)
+
+    X = ranker.features(synthetic_recipes(n, rng))
+    print(f"{n} candidates x {X.shape[1]} features")
+    print(f"  mat-vec              {timed(lambda: ranker.score_matrix(X))}")
+    print(f"  mat-vec + top 50     {timed(lambda: top_k(ranker.score_matrix(X), 50))}")
+
+    corpus = RecipeCorpus(synthetic_recipes(n_corpus, rng))
+    start = time.perf_counter()
+    scores = ranker.corpus_scores(corpus)
+    print(f"scored {n_corpus} corpus recipes in {(time.perf_counter() - start) * 1000:.0f} ms")
+    rows = np.sort(np_rng.choice(n_corpus, n, replace=False))
+    print(f"  {n} corpus rows + top 50  {timed(lambda: top_k(scores[rows], 50))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Per-recipe memory of raw MongoDB documents vs. the corpus RecipeRecord.
+
+    python benchmarks/recipe_memory_bench.py [n_recipes]
+"""
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(os.path.dirname(__file__), '..')
+    )
+)
+from back_end.recipe_record import RecipeRecord
+from back_end.serialization import dumps_bytes, loads
+from benchmarks.quiz_journey_loadtest import synthetic_recipes
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return objects, after - before
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    source = synthetic_recipes(n, random.Random(1))
+    for i, doc in enumerate(source):
+        doc['_id'] = i
+        doc['description'] = 'a long description of the recipe ' * 6
+        doc['steps'] = [f'step {s} with some instructions' for s in range(8)]
+    raw = dumps_bytes(source)
+
+    # Decoding gives every document its own strings, like documents off the wire
+    docs, doc_bytes = measure(lambda: loads(raw))
+    records, record_bytes = measure(lambda: [RecipeRecord.from_document(d) for d in docs])
+
+    print(f"{n} recipes")
+    print(f"  dict documents  {doc_bytes / n:8.0f} bytes/recipe")
+    print(f"  RecipeRecord    {record_bytes / n:8.0f} bytes/recipe "
+          f"({doc_bytes / max(record_bytes, 1):.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
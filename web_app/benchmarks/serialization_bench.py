@@ -0,0 +1,76 @@
+"""Micro-benchmark for recipe / recommendation payload serialization.
+
+Run from the web_app directory:
+
+    python benchmarks/serialization_bench.py [n_recipes] [repeat]
+
+Prints the cost per payload of the legacy encoders (bson.json_util and
+mongo_connection.JSONEncoder) next to back_end.serialization.
+"""
+import io
+import json
+import os
+import random
+import sys
+import timeit
+
+from bson import ObjectId, json_util
+
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(os.path.dirname(__file__), '..')
+    )
+)
+from back_end.mongo_connection import JSONEncoder
+from back_end import serialization
+
+
+def make_recipe(i):
+    """Build a document shaped like the ones in recipe_database.recipes"""
+    return {
+        '_id': ObjectId(),
+        'name': f'recipe number {i}',
+        'minutes': random.randint(5, 240),
+        'description': 'a tasty recipe ' * 8,
+        'tags': random.sample(['easy', 'dinner', 'lunch', 'main-dish', 'vegetarian',
+                               'italian', 'side-dishes', 'desserts', 'healthy',
+                               '60-minutes-or-less', 'low-sodium', 'beginner-cook'], 8),
+        'nutrition': {
+            'calories': round(random.uniform(50, 900), 1),
+            'total_fat': random.randint(0, 80), 'sugar': random.randint(0, 80),
+            'sodium': random.randint(0, 80), 'protein': random.randint(0, 80),
+            'saturated_fat': random.randint(0, 80), 'carbohydrates': random.randint(0, 80),
+        },
+        'n_steps': 6,
+        'steps': [f'step {s} of the recipe' for s in range(6)],
+        'ingredients': [f'ingredient {s}' for s in range(9)],
+    }
+
+
+def bench(label, fn, repeat):
+    per_call = min(timeit.repeat(fn, number=1, repeat=repeat))
+    print(f"  {label:<38} {per_call * 1000:9.3f} ms")
+    return per_call
+
+
+def main():
+    n_recipes = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    recipes = [make_recipe(i) for i in range(n_recipes)]
+    payload = {'lunch': recipes[: n_recipes // 2], 'dinner': recipes[n_recipes // 2:]}
+    prepared = serialization.to_jsonable(payload)
+
+    print(f"Payload: {n_recipes} recipes, encoder: "
+          f"{'orjson' if serialization.orjson else 'json (fallback)'}")
+    bench("bson.json_util.dumps", lambda: json_util.dumps(payload), repeat)
+    bench("json.dumps(cls=JSONEncoder)", lambda: json.dumps(payload, cls=JSONEncoder), repeat)
+    bench("serialization.to_jsonable", lambda: serialization.to_jsonable(payload), repeat)
+    bench("serialization.dumps (raw docs)", lambda: serialization.dumps(payload), repeat)
+    bench("serialization.dumps (pre-converted)", lambda: serialization.dumps(prepared), repeat)
+    bench("serialization.dump_to_file (stream)",
+          lambda: serialization.dump_to_file(prepared, io.BytesIO()), repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Build time, size and lookup latency of the "more like this" neighbour table.
+
+    python benchmarks/similar_bench.py [n_recipes] [workers]
+
+Tags and ingredients are drawn from Zipf-distributed vocabularies, so a few
+("easy", "salt") are in most recipes, as in the real data.
+"""
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(os.path.dirname(__file__), '..')
+    )
+)
+from back_end.similar import build_table
+
+
+def synthetic_recipes(n, rng, tags=550, ingredients=14000):
+    def sampler(prefix, size):
+        values = [f'{prefix}{i}' for i in range(size)]
+        cumulative = list(itertools.accumulate(1 / (i + 1) for i in range(size)))
+        return lambda k: rng.choices(values, cum_weights=cumulative, k=k)
+
+    tag, ingredient = sampler('t', tags), sampler('i', ingredients)
+    return [{'tags': tag(15), 'ingredient_keys': ingredient(9)} for _ in range(n)]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    rng = random.Random(1)
+    records = synthetic_recipes(n, rng)
+    ids = list(range(n))
+
+    start = time.perf_counter()
+    table = build_table(records, ids, k=10, workers=workers)
+    elapsed = time.perf_counter() - start
+    size_mb = (table.neighbours.nbytes + table.scores.nbytes) / 2 ** 20
+    print(f"neighbours of {n} recipes in {elapsed:.1f}s with {workers} worker(s), "
+          f"table {size_mb:.1f} MB")
+
+    extra = synthetic_recipes(n // 100, rng)
+    start = time.perf_counter()
+    build_table(records + extra, ids + list(range(n, n + len(extra))), k=10,
+                workers=workers, previous=table)
+    print(f"  incremental: {len(extra)} new recipes in {time.perf_counter() - start:.1f}s")
+
+    timings = []
+    for recipe_id in rng.sample(ids, 1000):
+        t = time.perf_counter()
+        table.similar(recipe_id, 6)
+        timings.append((time.perf_counter() - t) * 1e6)
+    print(f"  lookup p50 {percentile(timings, 50):.1f} us  p99 {percentile(timings, 99):.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Build time, memory and query latency of the BM25 full-text index.
+
+    python benchmarks/text_search_bench.py [n_recipes]
+
+Recipe text is drawn from a Zipf-distributed vocabulary so that, as in the
+real data, a few words ("add", "pan", "minute") appear in most recipes.
+The default size matches the Food.com corpus.
+"""
+import itertools
+import os
+import random
+import sys
+import time
+import numpy as np
+
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(os.path.dirname(__file__), '..')
+    )
+)
+from back_end.text_search import BM25Index
+
+QUERIES = ['crispy sheet pan', 'w12 w480', 'w3 w40 w900', 'w7', 'w2500 w31 w5', 'w1 w2 w3 w4']
+
+
+def synthetic_text(n, rng, vocabulary=20000):
+    words = [f'w{i}' for i in range(vocabulary)] + ['crispy', 'sheet', 'pan']
+    weights = [1 / (i + 1) for i in range(vocabulary)] + [1 / 300, 1 / 200, 1 / 40]
+    cumulative = list(itertools.accumulate(weights))
+
+    def sample(k):
+        return ' '.join(rng.choices(words, cum_weights=cumulative, k=k))
+
+    for row in range(n):
+        yield row, {
+            'name': sample(4),
+            'description': sample(rng.randint(10, 60)),
+            'steps': [sample(12) for _ in range(rng.randint(3, 12))],
+            'ingredients': [sample(2) for _ in range(9)],
+        }
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 230000
+    rng = random.Random(1)
+    start = time.perf_counter()
+    index = BM25Index(synthetic_text(n, rng))
+    postings_mb = (index.rows.nbytes + index.impacts.nbytes) / 2 ** 20
+    print(f"indexed {n} recipes in {time.perf_counter() - start:.1f}s: "
+          f"{len(index.term_ids)} terms, {len(index.rows)} postings, {postings_mb:.0f} MB")
+
+    mask = np.array([rng.random() < 0.3 for _ in range(n)])
+    for label, m in (('no filter', None), ('30% pass filter', mask)):
+        for block, mode in ((index.BLOCK, 'default'), (10 ** 9, 'exhaustive')):
+            index.BLOCK = block
+            timings = []
+            for _ in range(5):
+                for query in QUERIES:
+                    t = time.perf_counter()
+                    index.search(query, 20, m)
+                    timings.append((time.perf_counter() - t) * 1000)
+            print(f"  {label:16s} {mode:18s} p50 {percentile(timings, 50):6.2f} ms  "
+                  f"p99 {percentile(timings, 99):6.2f} ms")
+        index.BLOCK = BM25Index.BLOCK
+
+
+if __name__ == "__main__":
+    main()
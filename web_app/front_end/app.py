@@ -15,17 +15,64 @@ sys.path.insert(
     )
 )
 from back_end.mongo_connection import RecipeDatabase
+from back_end.ingredients import canonical_ingredients
+from back_end.profiler import init_profiler
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET", "change_me")
 
+# ── opt-in request profiler, a no-op unless PROFILE_* is set ─────────
+# (must run before connecting so MongoDB timings are captured)
+init_profiler(app, preferences=lambda: quiz_preferences(session))
+
 # ── connect to MongoDB ──────────────────────────────────────────────
 db = RecipeDatabase()
-if not db.connect():
-    raise RuntimeError("Failed to connect to MongoDB Atlas!")
-user_coll  = db.db['user_information']
-saved_coll = db.db['saved_recipes']
-temp_coll = db.db['temp_recommendations']
+
+def connect_db():
+    """(Re)connect to MongoDB; the pre-fork server calls this in every worker"""
+    global user_coll, saved_coll, temp_coll
+    if not db.connect():
+        raise RuntimeError("Failed to connect to MongoDB Atlas!")
+    user_coll  = db.db['user_information']
+    saved_coll = db.db['saved_recipes']
+    temp_coll = db.db['temp_recommendations']
+
+connect_db()
+
+# ── shared view helpers (also used by async_app.py) ──────────────────
+def cuisine_images():
+    """List the cuisine images available in the static folder"""
+    cuisine_img_folder = os.path.join(app.static_folder, 'images/cuisines')
+    return [
+        f for f in os.listdir(cuisine_img_folder)
+        if f.lower().endswith(('.jpg', '.jpeg', '.png'))
+    ]
+
+def quiz_preferences(sess):
+    """Build the recommender preference payload from the quiz answers in a session"""
+    return {
+        'question1': sess.get('response1', []),
+        'question2': sess.get('response2', None),
+        'question3': sess.get('response3', None),
+        'question4': sess.get('response4', []),
+        'question5': sess.get('response5', None),
+        'question6': sess.get('response6', []),
+        'question7': sess.get('response7', []),
+        'exclude_ingredients': sess.get('exclude_ingredients', []),
+        'optimize_calories': sess.get('optimize_calories', False)
+    }
+
+def assign_images(recommendations):
+    """Assign random, unique cuisine images to each recommended recipe"""
+    available_images = cuisine_images()
+    random.shuffle(available_images)
+
+    all_recipes = [r for recs in recommendations.values() for r in recs]
+    image_map = {}
+    for i, recipe in enumerate(all_recipes):
+        assigned_img = available_images[i % len(available_images)]
+        image_map[str(recipe['_id'])] = assigned_img
+    return image_map
 
 # ── require login for everything except these endpoints ──────────────
 @app.before_request
@@ -85,11 +132,7 @@ def saved_recipes():
     recipes = list(db.collection.find({'_id': {'$in': saved_ids}}))
 
     # Load cuisine images from static folder
-    cuisine_img_folder = os.path.join(app.static_folder, 'images/cuisines')
-    available_images = [
-        f for f in os.listdir(cuisine_img_folder)
-        if f.lower().endswith(('.jpg', '.jpeg', '.png'))
-    ]
+    available_images = cuisine_images()
 
     # Assign a random image to each recipe
     for recipe in recipes:
@@ -105,6 +148,7 @@ def save_recipe(recipe_id):
         'user': session['username'],
         'recipe_id': ObjectId(recipe_id)
     })
+    get_rec_system().record_saved_recipe(session['username'], ObjectId(recipe_id))
     flash("Recipe saved!", "success")
     return redirect(request.referrer or url_for('main'))
 
@@ -114,25 +158,29 @@ def unsave_recipe(recipe_id):
         'user': session['username'],
         'recipe_id': ObjectId(recipe_id)
     })
+    get_rec_system().record_saved_recipe(session['username'], ObjectId(recipe_id), saved=False)
     flash("Removed from saved recipes", "info")
     return redirect(request.referrer or url_for('saved_recipes'))
 
 # ── VIEW A SINGLE RECIPE ────────────────────────────────────────────
 @app.route('/view_recipe/<recipe_id>')
 def view_recipe(recipe_id):
-    recipe = db.collection.find_one({'_id': ObjectId(recipe_id)})
+    return render_template("view.html", **recipe_page(recipe_id))
+
+def recipe_page(recipe_id):
+    """view.html's context; shared with the async app's view route"""
+    # Served from the in-memory snapshot when the server preloaded one
+    recipe = get_rec_system().get_recipe_details(ObjectId(recipe_id))
+    # Precomputed neighbours; empty until the offline job has been run
+    similar = get_rec_system().similar_recipes(ObjectId(recipe_id))
 
     # Get list of cuisine images
-    cuisine_img_folder = os.path.join(app.static_folder, 'images/cuisines')
-    available_images = [
-        f for f in os.listdir(cuisine_img_folder)
-        if f.lower().endswith(('.jpg', '.jpeg', '.png'))
-    ]
+    available_images = cuisine_images()
 
     # Randomly select one
     recipe_img = random.choice(available_images) if available_images else 'default.jpg'
 
-    return render_template("view.html", recipe=recipe, recipe_img=recipe_img)
+    return {'recipe': recipe, 'recipe_img': recipe_img, 'similar': similar}
 
 
 
@@ -148,12 +196,17 @@ def page1():
         
         if not selected:
             flash("Please select at least one dietary or allergy option.", "warning")
-            return render_template('page1.html', response1=session.get('response1', []))
+            return render_template('page1.html', response1=session.get('response1', []),
+                                   exclude_ingredients=session.get('exclude_ingredients', []))
         
         session['response1'] = selected
+        session['exclude_ingredients'] = canonical_ingredients(
+            request.form.get('exclude_ingredients', '').split(',')
+        )
         return redirect(url_for('page2'))
 
-    return render_template('page1.html', response1=session.get('response1', []))
+    return render_template('page1.html', response1=session.get('response1', []),
+                           exclude_ingredients=session.get('exclude_ingredients', []))
 
 
 
@@ -168,9 +221,11 @@ def page2():
             flash("Please select a calorie range.", "warning")
             return render_template('page2.html', response2='')
         session['response2'] = choice
+        session['optimize_calories'] = 'optimize_calories' in request.form
         return redirect(url_for('page3'))
     return render_template('page2.html',
-                           response2=session.get('response2',''))
+                           response2=session.get('response2',''),
+                           optimize_calories=session.get('optimize_calories', False))
 
 
 @app.route('/page3', methods=['GET','POST'])
@@ -266,6 +321,10 @@ import os
 import random
 from flask import render_template, session, flash
 from back_end.recipe_system import RecipeRecommendationSystem
+from back_end.serialization import to_jsonable
+from back_end.meal_plan import MAX_PLAN_DAYS
+from back_end.reroll import plan_version
+from back_end.household import member_preferences
 
 """ @app.route('/results')
 def results():
@@ -341,31 +400,16 @@ def results():
 
     if saved_doc:
         recommendations = saved_doc['data']
+        # The version rerolls start from (see /reroll)
+        session['plan_version'] = saved_doc.get('version')
     else:
         # Generate preferences from session
-        prefs = {
-            'question1': session.get('response1', []),
-            'question2': session.get('response2', None),
-            'question3': session.get('response3', None),
-            'question4': session.get('response4', []),
-            'question5': session.get('response5', None),
-            'question6': session.get('response6', []),
-            'question7': session.get('response7', [])
-        }
-
-        rec_sys = RecipeRecommendationSystem()
-        if not rec_sys.connected:
+        version = plan_version()
+        recommendations = build_recommendations(quiz_preferences(session), session['username'], version)
+        if recommendations is None:
             flash("Cannot reach recommendation engine", "danger")
             recommendations = {}
         else:
-            recommendations = rec_sys.get_recommendations(prefs)
-
-            # Convert ObjectIds to strings for JSON storage
-            for meal, recs in recommendations.items():
-                for r in recs:
-                    if '_id' in r:
-                        r['_id'] = str(r['_id'])
-
             # Store recommendations in MongoDB
             temp_coll.delete_many({
                 "user": session['username'],
@@ -374,45 +418,215 @@ def results():
             temp_coll.insert_one({
                 "user": session['username'],
                 "type": "quiz_result",
-                "data": recommendations
+                "data": recommendations,
+                "version": version
             })
+            session['plan_version'] = version
 
     # 🔁 Assign random images for display
-    cuisine_img_folder = os.path.join(app.static_folder, 'images/cuisines')
-    available_images = [
-        f for f in os.listdir(cuisine_img_folder)
-        if f.lower().endswith(('.jpg', '.jpeg', '.png'))
-    ]
-    random.shuffle(available_images)
-
-    all_recipes = [r for recs in recommendations.values() for r in recs]
-    image_map = {}
-    for i, recipe in enumerate(all_recipes):
-        assigned_img = available_images[i % len(available_images)]
-        image_map[str(recipe['_id'])] = assigned_img
-
     return render_template(
         'results.html',
         recommendations=recommendations,
-        image_map=image_map,
-        prefs={
-            'question1': session.get('response1', []),
-            'question2': session.get('response2', None),
-            'question3': session.get('response3', None),
-            'question4': session.get('response4', []),
-            'question5': session.get('response5', None),
-            'question6': session.get('response6', []),
-            'question7': session.get('response7', [])
-        }
+        image_map=assign_images(recommendations),
+        prefs=quiz_preferences(session)
+    )
+
+@app.route('/plan')
+def meal_plan():
+    """?days=N: a plan of N days (default 7) from the quiz answers, no recipe twice"""
+    try:
+        days = min(max(int(request.args.get('days', 7)), 1), MAX_PLAN_DAYS)
+    except ValueError:
+        days = 7
+    rec_sys = get_rec_system()
+    if not rec_sys.connected and rec_sys.corpus is None:
+        flash("Cannot reach recommendation engine", "danger")
+        plan = []
+    else:
+        plan = to_jsonable(rec_sys.get_meal_plan(quiz_preferences(session), days, session['username']))
+    return render_template('plan.html', plan=plan, days=days)
+
+@app.route('/reroll/<meal>/<int:index>', methods=['POST'])
+def reroll_dish(meal, index):
+    """Swap one dish of the stored results for another from the same slot"""
+    result = {"user": session['username'], "type": "quiz_result"}
+
+    def stored_plan():
+        doc = temp_coll.find_one(result) or {}
+        return doc.get('version'), doc.get('data')
+
+    rec_sys = get_rec_system()
+    swap = rec_sys.reroll_dish(
+        session['username'], quiz_preferences(session), meal, index,
+        session.get('plan_version'), stored_plan
     )
+    if swap is None:
+        flash("No other recipe fits this dish", "info")
+        return redirect(url_for('results'))
+    recipe, version, new_version = swap
+    # Only if the plan is still the one the dish was picked for
+    written = temp_coll.update_one(
+        dict(result, version=version),
+        {"$set": {f"data.{meal}.{index}": recipe, "version": new_version}}
+    )
+    if written.matched_count:
+        session['plan_version'] = new_version
+    else:
+        rec_sys.slot_pools.forget(session['username'])
+        flash("Your plan changed in the meantime, please try again", "info")
+    return redirect(url_for('results'))
+
+rec_sys = None
+
+def get_rec_system():
+    """One recommendation system per process, created on first use.
+
+    If MongoDB was down, only the connection is retried: the instance, and
+    with it the snapshot and the users' reroll pools, stays.
+    """
+    global rec_sys
+    if rec_sys is None:
+        rec_sys = RecipeRecommendationSystem()
+    elif not rec_sys.connected:
+        rec_sys.reconnect()
+    return rec_sys
+
+def build_recommendations(prefs, username=None, version=None):
+    """Run the recommender, personalized for username if given; None if the engine can't reach MongoDB.
+
+    version is the one the plan is stored with, for rerolls.
+    """
+    rec_sys = get_rec_system()
+    if not rec_sys.connected and rec_sys.corpus is None:
+        return None
+    # Convert ObjectIds to strings once; the same payload is
+    # cached in MongoDB and rendered
+    return to_jsonable(rec_sys.get_recommendations(prefs, username, version))
+
+# ── JSON API ─────────────────────────────────────────────────────────
+from back_end.serialization import dumps_bytes
+from back_end.pagination import InvalidPageToken
+from pymongo.errors import OperationFailure
+
+def json_response(payload, status=200):
+    """Serialize with orjson (ObjectIds become strings)"""
+    return app.response_class(dumps_bytes(payload), status=status, mimetype='application/json')
+
+@app.route('/api/autocomplete')
+def autocomplete():
+    query = request.args.get('q', '').strip()
+    try:
+        k = min(max(int(request.args.get('k', 10)), 1), 50)
+    except ValueError:
+        k = 10
+    if not query:
+        return json_response([])
+    return json_response(get_rec_system().autocomplete(query, k))
+
+@app.route('/api/search')
+def search():
+    query = request.args.get('q', '').strip()
+    try:
+        k = min(max(int(request.args.get('k', 20)), 1), 100)
+    except ValueError:
+        k = 20
+    if not query:
+        return json_response([])
+    # ?quiz=1 limits results to the diet, allergies and time from the quiz
+    prefs = quiz_preferences(session) if request.args.get('quiz') == '1' else None
+    results = get_rec_system().search_text(query, prefs, k)
+    if results is None:
+        return json_response({'error': 'search index not loaded'}, 503)
+    return json_response([
+        {'_id': r['_id'], 'name': r['name'], 'minutes': r['minutes'], 'score': r['score']}
+        for r in results
+    ])
+
+@app.route('/api/pantry')
+def pantry():
+    """?ingredients=eggs,flour,milk[&quiz=1][&k=...]: recipes the pantry covers best"""
+    pantry_items = [v.strip() for v in request.args.get('ingredients', '').split(',') if v.strip()]
+    try:
+        k = min(max(int(request.args.get('k', 20)), 1), 100)
+    except ValueError:
+        k = 20
+    if not pantry_items:
+        return json_response([])
+    prefs = quiz_preferences(session) if request.args.get('quiz') == '1' else None
+    results = get_rec_system().pantry_match(pantry_items, prefs, k)
+    if results is None:
+        return json_response({'error': 'search index not loaded'}, 503)
+    return json_response([
+        {'_id': r['_id'], 'name': r['name'], 'minutes': r['minutes'],
+         'coverage': r['coverage'], 'missing': r['missing']}
+        for r in results
+    ])
+
+@app.route('/api/household', methods=['POST'])
+def household():
+    """{"members": [quiz answers, ...]}: one plan everyone in the household can eat"""
+    members = (request.get_json(silent=True) or {}).get('members')
+    if not isinstance(members, list) or not members or not all(isinstance(m, dict) for m in members):
+        return json_response({'error': 'members must be a list of preferences'}, 400)
+    try:
+        members = [member_preferences(m) for m in members]
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+    plan = get_rec_system().get_household_plan(members)
+    return json_response({
+        'recommendations': {
+            meal: [{'_id': r['_id'], 'name': r['name'], 'minutes': r['minutes'],
+                    'calories': r.get('nutrition', {}).get('calories')} for r in recipes]
+            for meal, recipes in plan['recommendations'].items()
+        },
+        'relaxed': plan['relaxed'],
+    })
+
+@app.route('/api/recipes')
+def browse_recipes():
+    """?tags=a,b&ingredients=x,y&name=...&limit=...; follow 'next' with ?cursor=..."""
+    def listed(arg):
+        return [v.strip() for v in request.args.get(arg, '').split(',') if v.strip()]
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+    except ValueError:
+        limit = 20
+    rec_sys = get_rec_system()
+    if not rec_sys.connected:
+        return json_response({'error': 'database unavailable'}, 503)
+    try:
+        recipes, next_token = rec_sys.browse(
+            listed('tags'), listed('ingredients'), request.args.get('name', '').strip() or None,
+            limit, request.args.get('cursor') or None
+        )
+    except InvalidPageToken as e:
+        return json_response({'error': str(e)}, 400)
+    except OperationFailure as e:
+        # MongoDB rejected the query built from the arguments
+        return json_response({'error': f'invalid query: {e}'}, 400)
+    return json_response({
+        'results': [
+            {'_id': r['_id'], 'name': r.get('name'), 'minutes': r.get('minutes')}
+            for r in recipes
+        ],
+        'next': next_token,
+    })
 
 @app.route('/start_quiz')
 def start_quiz():
     # Clear all quiz responses before starting a new quiz
     for i in range(1, 8):
         session.pop(f'response{i}', None)
+    session.pop('exclude_ingredients', None)
+    session.pop('optimize_calories', None)
     return redirect(url_for('page1'))
 
 
 if __name__ == "__main__":
+    if os.environ.get("PRELOAD_CORPUS") == "1":
+        # Search and pantry matching need the snapshot; build it before
+        # serving, as wsgi.py does
+        from back_end.corpus import load_shared_corpus
+        corpus = load_shared_corpus(db.collection)
+        corpus.build_text_index(db.collection)
     app.run(debug=True, host="0.0.0.0", port=5000)
@@ -0,0 +1,187 @@
+"""ASGI entry point for I/O-bound traffic.
+
+The recommendation, saved-recipes and view routes are served by a Quart app
+backed by PyMongo's asyncio client, so a worker is no longer blocked for the
+whole Atlas round trip.  Every other path (login, quiz pages, static files)
+is forwarded to the regular Flask app from app.py, which keeps owning them.
+
+    hypercorn front_end.async_app:application --bind 0.0.0.0:5000
+or
+    python front_end/async_app.py
+"""
+import asyncio
+import os
+import random
+import sys
+from bson import ObjectId
+from hypercorn.middleware import AsyncioWSGIMiddleware
+from pymongo import AsyncMongoClient
+from quart import (
+    Quart, render_template, request,
+    session, redirect, url_for, flash
+)
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Importing app.py also connects the synchronous client used by the
+# recommender, which runs in a worker thread.
+from app import (
+    app as flask_app, db, cuisine_images, quiz_preferences,
+    assign_images, build_recommendations, get_rec_system, recipe_page
+)
+from back_end.reroll import plan_version
+
+quart_app = Quart(
+    __name__,
+    template_folder=flask_app.template_folder,
+    static_folder=flask_app.static_folder,
+)
+# Same secret as the Flask app so both halves can read the session cookie
+quart_app.secret_key = flask_app.secret_key
+
+# Paths served by the async app; everything else goes to Flask
+ASYNC_PREFIXES = (
+    '/results', '/saved_recipes', '/view_recipe/',
+    '/save_recipe/', '/unsave_recipe/',
+)
+
+# ── asyncio MongoDB client ──────────────────────────────────────────
+mongo = {}
+
+@quart_app.before_serving
+async def connect_mongo():
+    client = AsyncMongoClient(
+        db.uri,
+        connectTimeoutMS=30000,
+        socketTimeoutMS=30000,
+        retryWrites=True,
+        tls=True
+    )
+    database = client['recipe_database']
+    mongo['client'] = client
+    mongo['recipes'] = database['recipes']
+    mongo['saved'] = database['saved_recipes']
+    mongo['temp'] = database['temp_recommendations']
+
+@quart_app.after_serving
+async def close_mongo():
+    if mongo.get('client'):
+        await mongo['client'].close()
+
+# ── require login, same rule as the Flask app ────────────────────────
+@quart_app.before_request
+async def require_login():
+    if request.endpoint != 'static' and 'username' not in session:
+        return redirect(url_for('login'))
+
+# ── RESULTS ──────────────────────────────────────────────────────────
+@quart_app.route('/results')
+async def results():
+    saved_doc = await mongo['temp'].find_one({
+        "user": session['username'],
+        "type": "quiz_result"
+    })
+
+    if saved_doc:
+        recommendations = saved_doc['data']
+        session['plan_version'] = saved_doc.get('version')
+    else:
+        # The recommender itself is shared with the WSGI app; it runs in a
+        # thread so the event loop keeps serving other requests meanwhile
+        version = plan_version()
+        recommendations = await asyncio.to_thread(
+            build_recommendations, quiz_preferences(session), session['username'], version
+        )
+        if recommendations is None:
+            await flash("Cannot reach recommendation engine", "danger")
+            recommendations = {}
+        else:
+            await mongo['temp'].delete_many({
+                "user": session['username'],
+                "type": "quiz_result"
+            })
+            await mongo['temp'].insert_one({
+                "user": session['username'],
+                "type": "quiz_result",
+                "data": recommendations,
+                "version": version
+            })
+            session['plan_version'] = version
+
+    return await render_template(
+        'results.html',
+        recommendations=recommendations,
+        image_map=assign_images(recommendations),
+        prefs=quiz_preferences(session)
+    )
+
+# ── SAVED LIST ───────────────────────────────────────────────────────
+@quart_app.route('/saved_recipes')
+async def saved_recipes():
+    saved_docs = await mongo['saved'].find({'user': session['username']}).to_list(None)
+    saved_ids = [d['recipe_id'] for d in saved_docs]
+    recipes = await mongo['recipes'].find({'_id': {'$in': saved_ids}}).to_list(None)
+
+    available_images = cuisine_images()
+    for recipe in recipes:
+        recipe['random_image'] = random.choice(available_images) if available_images else 'default.jpg'
+
+    return await render_template('saved.html', saved=recipes)
+
+# ── SAVE / UNSAVE ───────────────────────────────────────────────────
+@quart_app.route('/save_recipe/<recipe_id>', methods=['POST'])
+async def save_recipe(recipe_id):
+    await mongo['saved'].insert_one({
+        'user': session['username'],
+        'recipe_id': ObjectId(recipe_id)
+    })
+    await asyncio.to_thread(
+        get_rec_system().record_saved_recipe, session['username'], ObjectId(recipe_id)
+    )
+    await flash("Recipe saved!", "success")
+    return redirect(request.referrer or url_for('main'))
+
+@quart_app.route('/unsave_recipe/<recipe_id>', methods=['POST'])
+async def unsave_recipe(recipe_id):
+    await mongo['saved'].delete_one({
+        'user': session['username'],
+        'recipe_id': ObjectId(recipe_id)
+    })
+    await asyncio.to_thread(
+        get_rec_system().record_saved_recipe, session['username'], ObjectId(recipe_id), False
+    )
+    await flash("Removed from saved recipes", "info")
+    return redirect(request.referrer or url_for('saved_recipes'))
+
+# ── VIEW A SINGLE RECIPE ────────────────────────────────────────────
+@quart_app.route('/view_recipe/<recipe_id>')
+async def view_recipe(recipe_id):
+    # Same page as the WSGI app's: the snapshot (or the sync client) and the
+    # similar-recipes table, in a thread like the recommender
+    context = await asyncio.to_thread(recipe_page, recipe_id)
+    return await render_template("view.html", **context)
+
+# Templates link to endpoints owned by the Flask app (login, quiz pages...);
+# register them build-only so url_for() works from Quart templates too.
+for rule in flask_app.url_map.iter_rules():
+    if rule.endpoint not in quart_app.view_functions:
+        quart_app.add_url_rule(rule.rule, endpoint=rule.endpoint,
+                               methods=rule.methods)
+
+wsgi_fallback = AsyncioWSGIMiddleware(flask_app)
+
+
+async def application(scope, receive, send):
+    """ASGI app: async routes go to Quart, the rest to the WSGI Flask app"""
+    if scope['type'] == 'lifespan' or scope['path'].startswith(ASYNC_PREFIXES):
+        await quart_app(scope, receive, send)
+    else:
+        await wsgi_fallback(scope, receive, send)
+
+
+if __name__ == "__main__":
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    config = Config()
+    config.bind = [f"0.0.0.0:{os.environ.get('PORT', '5000')}"]
+    asyncio.run(serve(application, config))
@@ -0,0 +1,35 @@
+"""Production WSGI entry point for the pre-fork server.
+
+    gunicorn -c gunicorn.conf.py front_end.wsgi:app
+
+With preload_app on, this module is imported once in the gunicorn master:
+the recipe snapshot and its indexes are built here, then gunicorn.conf.py
+freezes the heap and forks the workers, which share those pages
+copy-on-write.  Set PRELOAD_CORPUS=0 to serve straight from MongoDB.
+"""
+import gc
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import app as web
+from back_end.corpus import load_shared_corpus
+from back_end.similar import get_neighbour_table
+from back_end.ranker import get_ranker
+
+if os.environ.get("PRELOAD_CORPUS", "1") == "1":
+    # No cyclic GC while building millions of small objects; the master
+    # re-enables it right after gc.freeze() in gunicorn.conf.py
+    gc.disable()
+    corpus = load_shared_corpus(web.db.collection)
+    # Build the search indexes before forking so workers share them too
+    corpus.build_name_index()
+    corpus.build_text_index(web.db.collection)
+    # "More like this" table written by python -m back_end.similar, if present
+    get_neighbour_table()
+    # Quality scores of every recipe, if a ranker has been trained
+    ranker = get_ranker()
+    if ranker is not None:
+        ranker.corpus_scores(corpus)
+
+app = web.app
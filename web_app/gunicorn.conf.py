@@ -0,0 +1,40 @@
+# Pre-fork production server settings, see front_end/wsgi.py
+#
+#   gunicorn -c gunicorn.conf.py front_end.wsgi:app
+#
+# WEB_CONCURRENCY   worker processes (default: one per CPU)
+# GUNICORN_THREADS  threads per worker (default: 4)
+# PORT              listen port (default: 5000)
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+worker_class = "gthread"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+
+# Load the app (and the recipe snapshot) once in the master, before forking
+preload_app = True
+
+
+def when_ready(server):
+    import app as web
+
+    # MongoClient is not fork-safe: drop the master's client, every worker
+    # opens its own in post_fork
+    web.db.close()
+
+    # Move everything loaded so far into the permanent generation so the
+    # collector never writes to those pages and they stay shared
+    gc.collect()
+    gc.freeze()
+    gc.enable()
+    server.log.info("Froze %d objects before forking", gc.get_freeze_count())
+
+
+def post_fork(server, worker):
+    import app as web
+
+    web.connect_db()
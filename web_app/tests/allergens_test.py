@@ -0,0 +1,51 @@
+import mongomock
+from web_app.back_end.allergens import AhoCorasick, AllergenClassifier, recipe_allergens, ALLERGEN_FIELD
+from web_app.back_end.recipe_recommender import recommend_recipes, quiz_filters
+from web_app.back_end.mongo_connection import RecipeDatabase
+from web_app.back_end.corpus import RecipeCorpus
+from web_app.tests.mongo_helpers import BulkAsUpdates
+
+def test_matcher_finds_overlapping_patterns_in_one_scan():
+    matcher = AhoCorasick([('he', 1), ('she', 2), ('his', 3), ('hers', 4)])
+    assert sorted(matcher.matches('ushers')) == [(1, 4, 2), (2, 4, 1), (2, 6, 4)]
+    assert list(AhoCorasick([]).matches('anything')) == []
+
+def test_whole_words_and_exceptions():
+    classify = AllergenClassifier().classify
+    assert classify(['eggplant', 'nutmeg', 'butternut squash', 'coconut', 'doughnut']) == []
+    assert classify(['cream of tartar', 'coconut milk', 'water chestnut', 'oyster mushroom']) == []
+    assert classify(['egg']) == ['eggs_dairy']
+    assert classify(['mixed nuts']) == ['nuts']
+    # an exception only cancels its own allergen
+    assert classify(['peanut butter']) == ['nuts']
+    assert classify(['almond milk', 'worcestershire sauce', 'parmesan cheese']) == ['eggs_dairy', 'seafood', 'nuts']
+
+def test_recipe_allergens_uses_canonical_names():
+    assert recipe_allergens({'ingredients': ['2 Large Eggs', 'Chopped Walnuts']}) == ['eggs_dairy', 'nuts']
+    assert recipe_allergens({'ingredient_keys': ['shrimp'], 'ingredients': ['ignored']}) == ['seafood']
+
+RECIPES = [
+    {'_id': 1, 'name': 'Pad Thai', 'tags': ['dinner', 'main-dish'],
+     'ingredients': ['rice noodles', 'shrimp', 'crushed peanuts'], 'nutrition': {'calories': 500}},
+    {'_id': 2, 'name': 'Veggie Stir Fry', 'tags': ['dinner', 'main-dish'],
+     'ingredients': ['broccoli', 'soy sauce', 'rice'], 'nutrition': {'calories': 400}},
+]
+
+def test_plans_exclude_untagged_allergens():
+    prefs = {'question1': ['nuts'], 'question6': ['dinner'], 'question7': ['main_dish']}
+    corpus = RecipeCorpus(RECIPES)
+    assert corpus.recipes[0].allergens == ('seafood', 'nuts')
+    for _ in range(10):
+        assert [r['_id'] for r in recommend_recipes(prefs, corpus)['dinner']] == [2]
+    assert corpus.count_documents(quiz_filters({'question1': ['seafood', 'eggs_dairy']})) == 1
+
+def test_backfill_flags_every_recipe():
+    collection = mongomock.MongoClient().db.recipes
+    collection.insert_many([{k: v for k, v in r.items()} for r in RECIPES])
+    db = RecipeDatabase()
+    db.collection = BulkAsUpdates(collection)
+    assert db.build_allergen_index() == 2
+    assert collection.find_one({'_id': 1})[ALLERGEN_FIELD] == ['seafood', 'nuts']
+    assert collection.find_one({'_id': 2})[ALLERGEN_FIELD] == []
+    prefs = {'question1': ['seafood'], 'question6': ['dinner'], 'question7': ['main_dish']}
+    assert [r['_id'] for r in recommend_recipes(prefs, collection)['dinner']] == [2]
@@ -0,0 +1,49 @@
+"""Fixtures for the tests that go through the Flask app.
+
+    def test_something(store, client):
+        store['recipe_database']['recipes'].insert_many(...)
+        client.get(...)
+
+The app talks to an in-memory MongoDB (store); each test file seeds its own
+recipes and, where it needs one, sets web.rec_sys.
+"""
+import os
+import sys
+import pytest
+import mongomock
+
+WEB_APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture
+def store():
+    """An empty in-memory MongoDB"""
+    return mongomock.MongoClient()
+
+
+@pytest.fixture
+def mongo_client(store):
+    """What the app's MongoClient() returns; override to wrap store"""
+    return store
+
+
+@pytest.fixture
+def web(mongo_client, monkeypatch):
+    """front_end/app.py, connected to mongo_client, with no recommender yet"""
+    monkeypatch.setattr(sys, 'path', [WEB_APP_DIR, os.path.join(WEB_APP_DIR, 'front_end')] + sys.path)
+    import back_end.mongo_connection as mongo_connection
+    monkeypatch.setattr(mongo_connection, 'MongoClient', lambda *args, **kwargs: mongo_client)
+    import app as web
+    web.connect_db()
+    web.rec_sys = None
+    yield web
+    web.rec_sys = None
+
+
+@pytest.fixture
+def client(web):
+    """A test client logged in as 'tester'"""
+    client = web.app.test_client()
+    with client.session_transaction() as sess:
+        sess['username'] = 'tester'
+    return client
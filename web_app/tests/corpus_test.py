@@ -0,0 +1,167 @@
+import json
+import pytest
+import mongomock
+from web_app.back_end.corpus import RecipeCorpus
+from web_app.back_end.recipe_recommender import recommend_recipes
+from web_app.back_end.recipe_system import RecipeRecommendationSystem
+from web_app.tests.mongo_helpers import BulkAsUpdates
+
+RECIPES = [
+    {'_id': 1, 'name': 'Omelette', 'minutes': 10, 'tags': ['breakfast', 'main-dish', 'easy', 'vegetarian'],
+     'nutrition': {'calories': 300, 'protein': 20}, 'ingredients': ['eggs', 'cheese']},
+    {'_id': 2, 'name': 'Pasta', 'minutes': 45, 'tags': ['lunch', 'dinner', 'main-dish', 'italian'],
+     'nutrition': {'calories': 650, 'protein': 25}, 'ingredients': ['pasta', 'tomato']},
+    {'_id': 3, 'name': 'Salad', 'minutes': 15, 'tags': ['lunch', 'side-dishes', 'vegetarian', 'easy'],
+     'nutrition': {'calories': 150, 'protein': 4}, 'ingredients': ['lettuce', 'tomato']},
+    {'_id': 4, 'name': 'Brownies', 'minutes': 70, 'tags': ['desserts', 'nuts'],
+     'nutrition': {'calories': 420}, 'ingredients': ['chocolate', 'walnuts']},
+    {'_id': 5, 'name': 'Soup', 'minutes': 130, 'tags': ['dinner', 'soups-stews', 'vegan'],
+     'ingredients': ['carrot']},
+]
+
+QUERIES = [
+    {},
+    {"tags": "main-dish"},
+    {"tags": ["main-dish"]},
+    {"tags": {"$all": ["lunch", "vegetarian"]}},
+    {"tags": {"$in": ["desserts", "soups-stews"]}},
+    {"tags": {"$nin": ["nuts", "italian"]}},
+    {"minutes": {"$gte": 30, "$lte": 60}},
+    {"minutes": {"$gte": 120}},
+    {"nutrition.calories": {"$gte": 200, "$lte": 500}},
+    {"nutrition.protein": {"$gt": 10}},
+    {"_id": {"$nin": [1, 2]}},
+    {"_id": 3},
+    {"$and": [{"tags": {"$nin": ["nuts"]}}, {"tags": "main-dish"}, {"minutes": {"$lte": 60}}]},
+    {"$or": [{"tags": "desserts"}, {"minutes": {"$lt": 12}}]},
+    {"name": "Salad"},
+]
+
+@pytest.fixture
+def collection():
+    coll = mongomock.MongoClient()['recipe_database']['recipes']
+    coll.insert_many([dict(r) for r in RECIPES])
+    return coll
+
+@pytest.fixture
+def corpus(collection):
+    return RecipeCorpus.load(collection)
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_corpus_matches_mongo_semantics(collection, corpus, query):
+    expected = [r['_id'] for r in collection.find(query)]
+    assert [r['_id'] for r in corpus.find(query)] == expected
+    assert corpus.count_documents(query) == len(expected)
+
+def test_membership_bitsets_are_reused_and_refreshed(corpus):
+    query = {"ingredient_keys": {"$nin": ["tomato", "egg"]}}
+    assert [r['_id'] for r in corpus.find(query)] == [4, 5]
+    assert ('ingredient_keys', 'tomato') in corpus._bitsets
+    assert [r['_id'] for r in corpus.find({"ingredient_keys": {"$in": ["tomato", "nope"]}})] == [2, 3]
+    # Appended rows must show up in the next evaluation
+    corpus.add([{'_id': 6, 'name': 'Bruschetta', 'tags': [], 'ingredients': ['tomatoes', 'bread']}])
+    assert [r['_id'] for r in corpus.find(query)] == [4, 5]
+    assert [r['_id'] for r in corpus.find({"ingredient_keys": {"$in": ["tomato"]}})] == [2, 3, 6]
+
+def test_find_limit_and_find_one(corpus):
+    assert [r['_id'] for r in corpus.find({"tags": "main-dish"}).limit(1)] == [1]
+    assert corpus.find_one({"tags": "desserts"})['name'] == 'Brownies'
+    assert corpus.find_one({"tags": "no-such-tag"}) is None
+
+def test_results_are_copies(corpus):
+    recipe = corpus.find_one({"_id": 1})
+    recipe['tags'].append('lunch')
+    assert 'lunch' not in corpus.get(1)['tags']
+
+def test_missing_nutrition_never_matches_ranges(corpus):
+    assert 5 not in [r['_id'] for r in corpus.find({"nutrition.calories": {"$lte": 10000}})]
+
+def test_recommend_recipes_runs_on_corpus(corpus):
+    prefs = {
+        'question1': ['nuts'],
+        'question2': 7,
+        'question3': 6,
+        'question4': ['any'],
+        'question5': 2,
+        'question6': ['breakfast', 'lunch'],
+        'question7': ['main_dish', 'side_dishes']
+    }
+    results = recommend_recipes(prefs, corpus)
+    assert [r['_id'] for r in results['breakfast']] == [1]
+    assert sorted(r['_id'] for r in results['lunch']) == [2, 3]
+
+def test_lazy_fields_are_hydrated_in_one_query(collection):
+    collection.update_many({}, {'$set': {'description': 'desc', 'steps': ['a', 'b']}})
+    corpus = RecipeCorpus.load(collection)
+    recipes = list(corpus.find({"tags": "vegetarian"}))
+    assert all('steps' not in r for r in recipes)
+
+    find = collection.find
+    calls = []
+    class Spy:
+        def find(self, *args, **kwargs):
+            calls.append(args)
+            return find(*args, **kwargs)
+    corpus.hydrate(recipes, Spy())
+    assert len(calls) == 1
+    assert all(r['description'] == 'desc' and r['steps'] == ['a', 'b'] for r in recipes)
+    assert corpus.get(2, collection)['steps'] == ['a', 'b']
+
+def test_ingredient_search_uses_the_index(collection):
+    from web_app.back_end.mongo_connection import RecipeDatabase
+    db = RecipeDatabase()
+    db.collection = BulkAsUpdates(collection)
+    assert db.build_ingredient_index() == len(RECIPES)
+    assert 'ingredient_keys_1' in collection.index_information()
+    assert collection.find_one({'_id': 4})['ingredient_keys'] == ['chocolate', 'walnut']
+
+    corpus = RecipeCorpus.load(collection)
+    for query, expected in ((['Tomatoes'], [2, 3]), (['fresh tomato', 'Pasta'], [2]),
+                            (['eggs', 'tomato'], []), (['walnut'], [4]), ([], [])):
+        assert [r['_id'] for r in db.find_recipes_by_ingredients(query)] == expected
+        system = RecipeRecommendationSystem.__new__(RecipeRecommendationSystem)
+        system.corpus = corpus
+        assert [r['_id'] for r in system.search_by_ingredients(query)] == expected
+
+def test_pantry_match_ranks_by_coverage(corpus):
+    # Salad is fully covered, Pasta half (and Omelette not at all)
+    results = corpus.pantry_match(['tomato', 'lettuce', 'basil'])
+    assert [(r['_id'], r['coverage'], r['missing']) for r in results] == [(3, 1.0, []), (2, 0.5, ['pasta'])]
+    assert [r['_id'] for r in corpus.pantry_match(['tomato'], query={"tags": "main-dish"})] == [2]
+    assert corpus.pantry_match(['tomato'], k=1)[0]['matched'] == 1
+    assert corpus.pantry_match(['caviar']) == []
+
+    system = RecipeRecommendationSystem.__new__(RecipeRecommendationSystem)
+    system.corpus = RecipeCorpus(RECIPES + [
+        {'_id': 6, 'name': 'Boiled Eggs', 'tags': ['breakfast'], 'ingredients': ['eggs', 'water', 'salt']},
+    ])
+    # Water and salt are staples; a nut allergy rules out the brownies
+    results = system.pantry_match(['Eggs', 'chocolate'], {'question1': ['nuts']})
+    assert [(r['_id'], r['coverage']) for r in results] == [(6, 1.0), (1, 0.5)]
+    assert system.pantry_match([]) == []
+
+def test_intersect_starts_from_rarest_postings(corpus):
+    assert list(corpus.intersect('tags', ['main-dish', 'italian'])) == [1]
+    assert list(corpus.intersect('tags', ['vegetarian', 'no-such-tag'])) == []
+    assert list(corpus.intersect('ingredient_keys', ['tomato'])) == [1, 2]
+
+@pytest.fixture
+def vegan(web, client):
+    # The snapshot preloaded at startup, and a quiz session: vegan, any time
+    web.db.collection.insert_many([dict(r) for r in RECIPES])
+    web.rec_sys = web.RecipeRecommendationSystem(corpus=RecipeCorpus.load(web.db.collection))
+    with client.session_transaction() as sess:
+        sess['response1'] = ['vegan']
+        sess['response3'] = '6'
+    return client
+
+def test_pantry_endpoint(vegan):
+    client = vegan
+    results = json.loads(client.get('/api/pantry?ingredients=Carrots,tomato, eggs').data)
+    assert [(r['name'], r['coverage']) for r in results] == [
+        ('Soup', 1.0), ('Omelette', 0.5), ('Pasta', 0.5), ('Salad', 0.5)]
+    assert results[1]['missing'] == ['cheese']
+    assert json.loads(client.get('/api/pantry?ingredients=tomato&k=1').data)[0]['name'] == 'Pasta'
+    # the quiz session is vegan
+    assert [r['name'] for r in json.loads(client.get('/api/pantry?ingredients=carrot,tomato&quiz=1').data)] == ['Soup']
+    assert json.loads(client.get('/api/pantry?ingredients=, ,').data) == []
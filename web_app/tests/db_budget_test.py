@@ -0,0 +1,171 @@
+import pytest
+from unittest.mock import MagicMock
+from web_app.tests.op_counter import (
+    CountingClient, OperationLog, counting,
+    assert_operation_budget, assert_operations
+)
+from web_app.back_end.recipe_recommender import recommend_recipes
+
+ALL_DISHES = ['main_dish', 'side_dishes', 'desserts', 'appetizers', 'soups_stews', 'beverage']
+DISH_TAGS = ['main-dish', 'side-dishes', 'desserts', 'appetizers', 'soups-stews', 'beverages']
+
+LUNCH_DINNER_PREFS = {
+    'question1': ['no_restriction'],
+    'question2': 7,
+    'question3': 6,
+    'question4': ['any'],
+    'question5': 2,
+    'question6': ['lunch', 'dinner'],
+    'question7': ALL_DISHES
+}
+
+@pytest.fixture
+def test_db():
+    # Same shape as the recipe_recommender_test fixture, with distinct ids
+    mock_collection = MagicMock()
+    mock_collection.find.return_value.limit.side_effect = lambda n: [{
+        '_id': object(),
+        'name': 'Test Recipe',
+        'minutes': 20,
+        'tags': ['lunch', 'dinner'] + DISH_TAGS,
+        'nutrition': {'calories': 300},
+        'ingredients': ['eggs']
+    }]
+    return mock_collection
+
+def test_recommend_recipes_one_query_per_slot(test_db):
+    collection, log = counting(test_db, 'recipes')
+    recommend_recipes(LUNCH_DINNER_PREFS, collection)
+    # 2 meals x 6 dishes, one find per slot when the primary query matches
+    assert_operation_budget(log, 12)
+    assert_operations(log, ['recipes.find'] * 12)
+
+def test_breakfast_budget(test_db):
+    collection, log = counting(test_db, 'recipes')
+    prefs = dict(LUNCH_DINNER_PREFS, question6=['breakfast'], question7=['main_dish'])
+    recommend_recipes(prefs, collection)
+    assert_operation_budget(log, 1)
+
+def test_budget_failure_lists_operations(test_db):
+    collection, log = counting(test_db, 'recipes')
+    collection.find({'tags': 'lunch'})
+    collection.find_one({'_id': 1})
+    with pytest.raises(AssertionError) as err:
+        assert_operation_budget(log, 1)
+    message = str(err.value)
+    assert "2 operations, budget 1" in message
+    assert "    1. recipes.find {'tags': '?'}" in message
+    assert "+   2. recipes.find_one {'_id': '?'}" in message
+
+def test_operations_diff(test_db):
+    collection, log = counting(test_db, 'recipes')
+    collection.find({})
+    with pytest.raises(AssertionError) as err:
+        assert_operations(log, ['recipes.find_one'])
+    assert "-recipes.find_one" in str(err.value)
+    assert "+recipes.find" in str(err.value)
+
+# ── full /results request through the Flask app ─────────────────────
+@pytest.fixture
+def log():
+    return OperationLog()
+
+@pytest.fixture
+def mongo_client(store, log):
+    # The app's client counts every operation
+    return CountingClient(store, log)
+
+@pytest.fixture
+def web_app_client(store, log, client):
+    store['recipe_database']['recipes'].insert_many([
+        {'name': f'{dish} {i}', 'minutes': 20, 'tags': ['lunch', 'dinner', dish],
+         'nutrition': {'calories': 300}, 'ingredients': ['eggs'], 'description': ''}
+        for dish in DISH_TAGS for i in range(3)
+    ])
+    with client.session_transaction() as sess:
+        sess['username'] = 'budget-user'
+        sess['response1'] = LUNCH_DINNER_PREFS['question1']
+        sess['response2'] = '7'
+        sess['response3'] = '6'
+        sess['response4'] = ['any']
+        sess['response5'] = '2'
+        sess['response6'] = ['lunch', 'dinner']
+        sess['response7'] = ALL_DISHES
+    return client, log
+
+def test_results_lunch_dinner_six_dishes_budget(web_app_client):
+    client, log = web_app_client
+    log.reset()
+    log.set_label('GET /results')
+    assert client.get('/results').status_code == 200
+    # cache lookup + engine connect + taste profile + seen-recipe filter
+    # + 12 slot queries + seen-recipe update + cache delete/insert
+    assert_operation_budget(log, 19, label="GET /results")
+
+    log.reset()
+    assert client.get('/results').status_code == 200
+    # second visit is served from temp_recommendations
+    assert_operations(log, ['temp_recommendations.find_one'])
+
+def test_reroll_budget(web, web_app_client):
+    client, log = web_app_client
+    assert client.get('/results').status_code == 200
+    stored = lambda: web.temp_coll.find_one({'user': 'budget-user', 'type': 'quiz_result'})['data']
+    before = stored()
+    names = {r['name'] for recs in before.values() for r in recs}
+
+    # Warm: the slot's pool is cached, so the recipes aren't queried; the
+    # seen-recipe filter is read and updated and the stored result written
+    log.reset()
+    assert client.post('/reroll/lunch/0').status_code == 302
+    assert_operations(log, ['user_information.find_one', 'user_information.update_one',
+                            'temp_recommendations.update_one'])
+    after = stored()
+    assert after['lunch'][0]['name'] not in names
+    assert after['lunch'][1:] == before['lunch'][1:] and after['dinner'] == before['dinner']
+
+    # Three main dishes: two in the plan, one rerolled away
+    log.reset()
+    assert client.post('/reroll/lunch/0').status_code == 302
+    assert_operations(log, ['user_information.find_one'])
+
+    # Cold: another worker made the plan
+    web.rec_sys.slot_pools.forget('budget-user')
+    log.reset()
+    assert client.post('/reroll/lunch/0').status_code == 302
+    assert_operations(log, ['temp_recommendations.find_one', 'recipes.find', 'user_information.find_one',
+                            'user_information.update_one', 'temp_recommendations.update_one'])
+    assert stored()['lunch'][0]['name'] == before['lunch'][0]['name']
+
+def test_reroll_never_uses_a_stale_plan(web, web_app_client):
+    client, log = web_app_client
+    assert client.get('/results').status_code == 200
+    result = {'user': 'budget-user', 'type': 'quiz_result'}
+    # Another worker rerolled dinner's first dish: this worker's cached
+    # plan is out of date
+    dinner = web.temp_coll.find_one(result)['data']['dinner']
+    swapped = dict(dinner[0], name='swapped elsewhere')
+    web.temp_coll.update_one(result, {'$set': {'data.dinner.0': swapped, 'version': 'elsewhere'}})
+    with client.session_transaction() as sess:
+        sess['plan_version'] = 'elsewhere'
+
+    log.reset()
+    assert client.post('/reroll/lunch/0').status_code == 302
+    # The stored plan is read again, and its other dishes are kept
+    assert log.by_operation()['temp_recommendations.find_one'] == 1
+    doc = web.temp_coll.find_one(result)
+    assert doc['data']['dinner'][0]['name'] == 'swapped elsewhere'
+    assert doc['version'] not in (None, 'elsewhere')
+
+    # Another worker changes the plan again: this worker's cache and the
+    # browser are a version behind, so the write doesn't go through...
+    web.temp_coll.update_one(result, {'$set': {'version': 'newer'}})
+    before = web.temp_coll.find_one(result)['data']
+    assert client.post('/reroll/lunch/1').status_code == 302
+    assert web.temp_coll.find_one(result)['data'] == before
+    # ...and the next reroll starts from the stored plan
+    log.reset()
+    assert client.post('/reroll/lunch/1').status_code == 302
+    assert log.by_operation()['temp_recommendations.find_one'] == 1
+    doc = web.temp_coll.find_one(result)
+    assert doc['data']['lunch'][1] != before['lunch'][1] and doc['version'] != 'newer'
@@ -0,0 +1,69 @@
+import random
+import zlib
+import mongomock
+from web_app.back_end.dedup import NearDuplicateIndex, cluster_recipes, minhash, shingles, NUM_PERM, _A, _B, _PRIME
+from web_app.back_end.mongo_connection import RecipeDatabase
+from web_app.back_end.corpus import RecipeCorpus
+from web_app.tests.mongo_helpers import BulkAsUpdates
+
+BANANA_BREAD = {
+    'ingredients': ['3 ripe bananas', 'flour', 'sugar', 'butter', 'eggs', 'baking soda'],
+    'steps': ['preheat the oven to 350', 'mash the bananas in a bowl',
+              'stir in the melted butter sugar and eggs', 'mix in the flour and baking soda',
+              'pour into a loaf pan and bake for an hour'],
+}
+
+def test_shingles_cover_ingredients_and_step_trigrams():
+    result = shingles({'ingredients': ['Fresh Tomatoes'], 'steps': ['slice the tomatoes thinly', 'serve']})
+    assert result == {'i:tomato', 's:slice tomato thinly', 's:tomato thinly serve'}
+    assert minhash(set()) is None
+    assert len(minhash(result)) == NUM_PERM
+
+def test_minhash_is_exact_universal_hashing():
+    # Python integers don't overflow: the signature must match them exactly
+    shingle_set = shingles(BANANA_BREAD)
+    p = int(_PRIME)
+    expected = [min((int(a) * (zlib.crc32(s.encode('utf-8')) % p) + int(b)) % p for s in shingle_set)
+                for a, b in zip(_A, _B)]
+    assert minhash(shingle_set).tolist() == expected
+
+def test_near_clones_share_a_cluster():
+    clone = dict(BANANA_BREAD, steps=BANANA_BREAD['steps'] + ['let it cool'])
+    reworded = dict(BANANA_BREAD, steps=['mash bananas, add everything and bake'])
+    soup = {'ingredients': ['chicken', 'noodles', 'carrots'], 'steps': ['simmer everything for an hour']}
+    clusters = cluster_recipes([
+        dict(BANANA_BREAD, _id=1), dict(soup, _id=2), dict(clone, _id=3),
+        dict(reworded, _id=4), {'_id': 5}, dict(BANANA_BREAD, _id=6),
+    ])
+    # 4 has the same ingredients but different steps, 5 has nothing to compare
+    assert clusters == {1: 1, 2: 2, 3: 1, 4: 4, 5: 5, 6: 1}
+
+def test_unrelated_recipes_stay_apart():
+    rng = random.Random(5)
+    words = [f'w{i}' for i in range(2000)]
+    recipes = [
+        {'_id': i, 'ingredients': rng.sample(words, 8),
+         'steps': [' '.join(rng.sample(words, 10)) for _ in range(4)]}
+        for i in range(500)
+    ]
+    clusters = cluster_recipes(recipes)
+    assert all(clusters[i] == i for i in range(500))
+
+def test_build_cluster_index_writes_cluster_ids():
+    collection = mongomock.MongoClient().db.recipes
+    collection.insert_many([
+        dict(BANANA_BREAD, _id=1, name='Easy Banana Bread'),
+        dict(BANANA_BREAD, _id=2, name='Easy Banana Bread II'),
+        {'_id': 3, 'name': 'Toast', 'ingredients': ['bread'], 'steps': ['toast the bread']},
+    ])
+    db = RecipeDatabase()
+    db.collection = BulkAsUpdates(collection)
+    index = db.build_cluster_index()
+    assert [d['cluster_id'] for d in collection.find().sort('_id')] == [1, 1, 3]
+    assert 'cluster_id_1' in collection.index_information()
+    # New recipes at ingest join the existing clusters
+    assert index.add(4, BANANA_BREAD) == 1
+
+    corpus = RecipeCorpus.load(collection)
+    assert corpus.get(2)['cluster_id'] == 1
+    assert corpus.recipes[0].extra is None
@@ -0,0 +1,136 @@
+import json
+import random
+import pytest
+import mongomock
+from web_app.back_end.corpus import RecipeCorpus
+from web_app.back_end.household import household_plan, member_preferences, merge_preferences
+from web_app.tests.op_counter import counting
+
+TAGS = ['breakfast', 'lunch', 'dinner', 'main-dish', 'side-dishes', 'vegetarian', 'vegan',
+        'gluten-free', 'easy', 'italian', 'mexican', 'nuts']
+
+def recipes(seed=1, n=3000):
+    rng = random.Random(seed)
+    return [
+        {'_id': i, 'name': f'recipe {i}', 'minutes': rng.randint(5, 150),
+         'tags': rng.sample(TAGS, 6), 'ingredients': rng.sample(['tofu', 'rice', 'cilantro', 'beans'], 2),
+         'nutrition': {'calories': rng.randint(50, 1100)}, 'cluster_id': i}
+        for i in range(n)
+    ]
+
+ALICE = {'name': 'alice', 'question1': ['vegan'], 'question3': '2', 'question4': ['italian'],
+         'question6': ['breakfast', 'dinner'], 'question7': ['main_dish']}
+BOB = {'name': 'bob', 'question1': ['gluten-free', 'nuts'], 'question3': '2',
+       'question6': ['lunch'], 'question7': ['side_dishes'], 'exclude_ingredients': 'Cilantro'}
+
+def dishes(plan):
+    return [r for recipes in plan['recommendations'].values() for r in recipes]
+
+def test_merge_takes_unions_and_intersections():
+    hard, soft, meals, relaxed = merge_preferences([ALICE, BOB, {'question3': '1'}])
+    assert hard == [{'tags': {'$nin': ['nuts']}, 'allergens': {'$nin': ['nuts']}},
+                    {'ingredient_keys': {'$nin': ['cilantro']}}]
+    assert soft['diet'][0] == {'tags': {'$all': ['gluten-free', 'vegan']}}
+    assert soft['cuisine'][1] == ['alice']
+    # 30-60 and 0-30 minutes meet at 30 only
+    assert soft['time'][0] == {'minutes': {'$gte': 30, '$lte': 30}}
+    assert meals == {'question6': ['breakfast', 'dinner', 'lunch'],
+                     'question7': ['main_dish', 'side_dishes']}
+    assert relaxed == {}
+    # Disjoint windows cannot hold together
+    _, soft, _, relaxed = merge_preferences([ALICE, dict(BOB, question3='4')])
+    assert 'time' not in soft and relaxed == {'time': ['alice', 'bob']}
+
+def test_one_plan_everyone_can_eat():
+    plan = household_plan([ALICE, BOB], RecipeCorpus(recipes()))
+    assert [len(plan['recommendations'][m]) for m in ('breakfast', 'dinner', 'lunch')] == [1, 2, 2]
+    for r in dishes(plan):
+        assert 'nuts' not in r['tags'] and 'cilantro' not in r['ingredients']
+        assert {'vegan', 'gluten-free'} <= set(r['tags'])
+        assert 30 <= r['minutes'] <= 60
+    assert plan['relaxed'] == {}
+
+def test_reports_whose_preferences_were_relaxed():
+    # No Italian main dishes at all
+    few = [dict(r, tags=[t for t in r['tags'] if t != 'italian'] if 'main-dish' in r['tags'] else r['tags'])
+           for r in recipes()]
+    plan = household_plan([ALICE, BOB], RecipeCorpus(few))
+    assert plan['relaxed'] == {'alice': ['cuisine']}
+    assert all('nuts' not in r['tags'] for r in dishes(plan))
+
+def test_one_query_per_slot():
+    collection = mongomock.MongoClient().db.recipes
+    collection.insert_many(recipes(n=800))
+    counted, log = counting(collection, 'recipes')
+    plan = household_plan([BOB, {'question1': ['vegetarian'], 'question6': ['dinner']}], counted)
+    # lunch and dinner side dishes, for both members at once
+    assert [len(plan['recommendations'][m]) for m in ('lunch', 'dinner')] == [1, 1]
+    assert len(log.operations) == 2
+
+KITCHEN = [
+    {'_id': 1, 'name': 'Nutty Granola', 'minutes': 30, 'tags': ['breakfast', 'nuts', 'vegetarian'],
+     'ingredients': ['oats', 'walnuts'], 'nutrition': {'calories': 450}},
+    {'_id': 2, 'name': 'Tofu Stir Fry', 'minutes': 20, 'tags': ['dinner', 'main-dish', 'vegan', 'vegetarian'],
+     'ingredients': ['tofu', 'soy sauce'], 'nutrition': {'calories': 380}},
+    {'_id': 3, 'name': 'Lasagne', 'minutes': 90, 'tags': ['dinner', 'main-dish', 'italian'],
+     'ingredients': ['pasta', 'beef'], 'nutrition': {'calories': 700}},
+]
+
+@pytest.fixture
+def kitchen(web, client):
+    web.rec_sys = web.RecipeRecommendationSystem(corpus=RecipeCorpus(KITCHEN))
+    return client
+
+def post_members(client, members):
+    response = client.post('/api/household', json={'members': members})
+    return response.status_code, json.loads(response.data)
+
+def test_household_endpoint(kitchen):
+    # Only the granola is a breakfast: not vegan, and not Italian
+    sam = {'name': 'sam', 'question1': ['vegan'], 'question6': ['breakfast']}
+    kim = {'name': 'kim', 'question4': ['italian'], 'question6': ['breakfast']}
+    status, plan = post_members(kitchen, [sam, kim])
+    assert status == 200
+    assert plan['recommendations'] == {'breakfast': [
+        {'_id': 1, 'name': 'Nutty Granola', 'minutes': 30, 'calories': 450}]}
+    assert plan['relaxed'] == {'kim': ['cuisine'], 'sam': ['diet']}
+    # At dinner the cuisine goes first and the diet holds
+    _, plan = post_members(kitchen, [dict(sam, question6=['dinner']), dict(kim, question6=['dinner'])])
+    assert [r['name'] for r in plan['recommendations']['dinner']] == ['Tofu Stir Fry']
+    assert plan['relaxed'] == {'kim': ['cuisine']}
+    # A nut allergy is never relaxed
+    _, plan = post_members(kitchen, [sam, dict(kim, question1=['nuts'])])
+    assert plan['recommendations'] == {'breakfast': []}
+
+def test_household_endpoint_needs_a_list_of_members(kitchen):
+    for body in ({'members': 'sam'}, {'members': []}, {'members': ['sam']}, {}, None):
+        response = kitchen.post('/api/household', json=body)
+        assert response.status_code == 400
+        assert json.loads(response.data) == {'error': 'members must be a list of preferences'}
+
+def test_member_answers_are_normalized():
+    prefs = member_preferences({'name': 'kim', 'question1': 'vegan', 'question3': '2', 'question5': 1,
+                                'question6': ['lunch'], 'exclude_ingredients': 'olives, capers',
+                                'nutrients': {'protein': {'min': 20}}})
+    assert prefs == {'name': 'kim', 'question1': ['vegan'], 'question3': 2, 'question5': 1,
+                     'question6': ['lunch'], 'exclude_ingredients': ['olives', 'capers'],
+                     'nutrients': {'protein': {'min': 20}}}
+    # A beginner is a beginner whether the answer came as 1 or as the form's '1'
+    for answer in (1, '1'):
+        assert merge_preferences([{'question5': answer}])[1]['beginner'][1] == ['member 1']
+    for bad in ({'question4': 'thai'}, {'question6': [['lunch']]}, {'question3': '9'},
+                {'question2': 'lots'}, {'question5': True}, {'question2': 2.5}, {'name': 7},
+                {'nutrients': {'protein': {'min': 'lots'}}}, {'nutrients': {'vitamins': {}}},
+                {'question8': 1}):
+        with pytest.raises(ValueError):
+            member_preferences(bad)
+
+def test_household_endpoint_rejects_bad_answers(kitchen):
+    # A single tag is a list of one, not a string to split into letters
+    status, plan = post_members(kitchen, [{'question4': 'italian', 'question6': 'dinner'}])
+    assert status == 200
+    assert [r['name'] for r in plan['recommendations']['dinner']] == ['Lasagne']
+    status, error = post_members(kitchen, [{'question6': 'lunch'}, {'question3': 'quick'}])
+    assert status == 400 and 'question3' in error['error']
+    status, error = post_members(kitchen, [{'question1': ['peanuts']}])
+    assert status == 400 and 'question1' in error['error']
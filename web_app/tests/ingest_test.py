@@ -0,0 +1,95 @@
+import csv
+import json
+import pytest
+import mongomock
+from web_app.back_end import ingest
+from web_app.back_end.ingest import ingest_csv, parse_row, parse_list, parse_nutrition
+
+HEADER = ['name', 'id', 'minutes', 'contributor_id', 'submitted', 'tags', 'nutrition',
+          'n_steps', 'steps', 'description', 'ingredients', 'n_ingredients']
+
+def food_com_row(i):
+    return [
+        f'recipe {i} ', str(1000 + i), '35', '42', '2005-09-16',
+        "['60-minutes-or-less', 'main-dish', \"kid's-favourite\"]",
+        '[51.5, 0.0, 13.0, 0.0, 2.0, 0.0, 4.0]', '2',
+        "['chop the onions, finely', 'fry\nuntil golden']",
+        'a "quoted" description', "['Fresh Onions', 'olive oil']", '2',
+    ]
+
+def write_csv(path, n, bad=()):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for i in range(n):
+            row = food_com_row(i)
+            if i in bad:
+                row[1] = 'not-an-id'
+            writer.writerow(row)
+
+def test_parse_row_converts_food_com_fields():
+    doc = parse_row(dict(zip(HEADER, food_com_row(1))))
+    assert doc['id'] == 1001 and doc['minutes'] == 35 and doc['name'] == 'recipe 1'
+    assert doc['tags'] == ['60-minutes-or-less', 'main-dish', "kid's-favourite"]
+    assert doc['steps'] == ['chop the onions, finely', 'fry\nuntil golden']
+    assert doc['nutrition'] == {'calories': 51.5, 'total_fat': 0.0, 'sugar': 13.0, 'sodium': 0.0,
+                                'protein': 2.0, 'saturated_fat': 0.0, 'carbohydrates': 4.0}
+    assert doc['ingredient_keys'] == ['onion', 'olive oil']
+    assert parse_row({'name': 'no id', 'id': ''}) is None
+    # Numbers too large for an int don't take the batch down
+    assert parse_row({'name': 'huge', 'id': '7', 'minutes': 'inf', 'n_steps': '1e400'})['minutes'] is None
+    assert parse_row({'name': 'huge', 'id': 'inf'}) is None
+
+def test_parse_helpers_tolerate_junk():
+    assert parse_list("['a', 'b'") == []
+    assert parse_list("__import__('os')") == []
+    assert parse_list('') == []
+    assert parse_nutrition("[1, 'x', 3]") == {'calories': 1.0, 'sugar': 3.0}
+
+def test_ingest_in_batches(tmp_path, capsys):
+    path = str(tmp_path / 'RAW_recipes.csv')
+    write_csv(path, 25, bad={3})
+    collection = mongomock.MongoClient().db.recipes
+    summary = ingest_csv(collection, path, batch_size=4, report_every=2)
+    assert summary['rows'] == 25 and summary['inserted'] == 24 and summary['bad_rows'] == 1
+    assert collection.count_documents({}) == 24
+    assert "rows/s" in capsys.readouterr().out
+    # running it again adds nothing
+    summary = ingest_csv(collection, path, batch_size=10)
+    assert summary['inserted'] == 0 and summary['duplicates'] == 24
+    assert collection.count_documents({}) == 24
+
+def test_resume_after_crash(tmp_path, monkeypatch):
+    path = str(tmp_path / 'RAW_recipes.csv')
+    checkpoint = str(tmp_path / 'RAW_recipes.csv.checkpoint')
+    write_csv(path, 20)
+    collection = mongomock.MongoClient().db.recipes
+
+    real_write = ingest.write_batch
+    calls = []
+    def crashing_write(coll, docs):
+        calls.append(len(docs))
+        result = real_write(coll, docs)
+        if len(calls) == 3:
+            raise RuntimeError("connection lost")   # written, not yet checkpointed
+        return result
+    monkeypatch.setattr(ingest, 'write_batch', crashing_write)
+    with pytest.raises(RuntimeError):
+        ingest_csv(collection, path, batch_size=3, checkpoint=checkpoint)
+    with open(checkpoint) as f:
+        assert json.load(f)['rows'] == 6
+
+    monkeypatch.setattr(ingest, 'write_batch', real_write)
+    summary = ingest_csv(collection, path, batch_size=3, checkpoint=checkpoint)
+    assert summary['rows'] == 20
+    assert summary['duplicates'] == 3              # the batch written before the crash
+    assert sorted(d['id'] for d in collection.find()) == list(range(1000, 1020))
+
+def test_parallel_parsing_keeps_order(tmp_path):
+    path = str(tmp_path / 'RAW_recipes.csv')
+    write_csv(path, 30)
+    collection = mongomock.MongoClient().db.recipes
+    summary = ingest_csv(collection, path, batch_size=4, workers=2,
+                         checkpoint=str(tmp_path / 'cp'))
+    assert summary['inserted'] == 30
+    assert [d['id'] for d in collection.find()] == list(range(1000, 1030))
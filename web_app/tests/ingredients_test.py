@@ -0,0 +1,26 @@
+import pytest
+from web_app.back_end.ingredients import normalize_ingredient, canonical_ingredients, singular
+
+@pytest.mark.parametrize("raw, canonical", [
+    ("Tomatoes", "tomato"),
+    ("fresh chopped tomatoes", "tomato"),
+    ("Finely Minced Garlic Cloves", "garlic clove"),
+    ("eggs", "egg"),
+    ("raspberries", "raspberry"),
+    ("peaches", "peach"),
+    ("chocolate chip cookies", "chocolate chip cookie"),
+    ("molasses", "molasses"),
+    ("swiss cheese", "swiss cheese"),
+    ("  Large  Onion, diced ", "onion"),
+])
+def test_normalize_ingredient(raw, canonical):
+    assert normalize_ingredient(raw) == canonical
+
+def test_singular_leaves_short_and_latin_words_alone():
+    assert singular('gas') == 'gas'
+    assert singular('couscous') == 'couscous'
+    assert singular('hummus') == 'hummus'
+
+def test_canonical_ingredients_dedupes_in_order():
+    assert canonical_ingredients(['Eggs', 'milk', 'egg', 'chopped fresh', 'Flour']) == ['egg', 'milk', 'flour']
+    assert canonical_ingredients(None) == []
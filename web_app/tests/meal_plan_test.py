@@ -0,0 +1,95 @@
+import re
+import random
+import pytest
+import mongomock
+from collections import Counter
+from web_app.back_end.corpus import RecipeCorpus
+from web_app.back_end.meal_plan import build_plan, recipe_cuisine, MAX_PLAN_DAYS
+from web_app.tests.op_counter import counting
+from web_app.back_end.recipe_recommender import plan_key
+
+MEALS = ('breakfast', 'lunch', 'dinner')
+TAGS = ['breakfast', 'lunch', 'dinner', 'main-dish', 'side-dishes', 'vegetarian', 'easy']
+
+def recipes(seed=1, n=2000, cuisines=('italian',) * 8 + ('mexican', 'indian', 'greek', 'chinese')):
+    rng = random.Random(seed)
+    return [
+        {'_id': i, 'name': f'recipe {i}', 'minutes': rng.randint(5, 200),
+         'tags': rng.sample(TAGS, 4) + [rng.choice(cuisines)],
+         'ingredients': ['water'], 'nutrition': {'calories': rng.randint(50, 1100)},
+         'cluster_id': i // 2}
+        for i in range(n)
+    ]
+
+PREFS = {'question1': ['vegetarian'], 'question2': '3', 'question3': 6, 'question4': ['any'],
+         'question6': list(MEALS), 'question7': ['main_dish', 'side_dishes']}
+
+def chosen(plan):
+    return [r for day in plan for recs in day['meals'].values() for r in recs]
+
+def test_no_recipe_twice_in_the_plan():
+    plan = build_plan(PREFS, RecipeCorpus(recipes()), days=7)
+    assert [day['day'] for day in plan] == list(range(1, 8))
+    for day in plan:
+        assert [len(day['meals'][m]) for m in MEALS] == [1, 2, 2]
+    dishes = chosen(plan)
+    assert len({plan_key(r) for r in dishes}) == len(dishes)
+    assert all('vegetarian' in r['tags'] for r in dishes)
+
+def test_queries_do_not_grow_with_days():
+    collection = mongomock.MongoClient().db.recipes
+    collection.insert_many(recipes(n=600))
+    counts = []
+    for days in (1, 7, MAX_PLAN_DAYS):
+        counted, log = counting(collection, 'recipes')
+        plan = build_plan(PREFS, counted, days=days)
+        assert len(plan) == days
+        counts.append(len(log.operations))
+    assert counts == [5, 5, 5]
+
+def test_cuisines_take_turns():
+    # Two thirds of the recipes are Italian; the plan still rotates
+    # between the five cuisines (7 dishes each would be even)
+    plan = build_plan(PREFS, RecipeCorpus(recipes()), days=7)
+    uses = Counter(recipe_cuisine(r) for r in chosen(plan))
+    assert len(uses) == 5
+    assert max(uses.values()) <= 10 and min(uses.values()) >= 4
+
+def test_exhausted_slot_stays_empty():
+    few = [r for r in recipes(n=400) if 'breakfast' not in r['tags']][:150]
+    few += [dict(r, _id=1000 + i, tags=['breakfast', 'vegetarian'], cluster_id=1000 + i)
+            for i, r in enumerate(recipes(seed=2, n=3))]
+    plan = build_plan(PREFS, RecipeCorpus(few), days=5)
+    assert [len(day['meals']['breakfast']) for day in plan] == [1, 1, 1, 0, 0]
+
+def test_daily_calories_with_the_optimizer():
+    plan = build_plan(dict(PREFS, optimize_calories=True), RecipeCorpus(recipes(n=4000)), days=4)
+    for day in plan:
+        total = sum(r['nutrition']['calories'] for recs in day['meals'].values() for r in recs)
+        assert 1600 <= total <= 1800
+
+@pytest.fixture
+def planner(web, client):
+    web.rec_sys = web.RecipeRecommendationSystem(corpus=RecipeCorpus(recipes(n=600)))
+    with client.session_transaction() as sess:
+        for question, answer in PREFS.items():
+            sess['response' + question[-1]] = answer
+    return client
+
+def test_plan_page(planner):
+    client = planner
+    page = client.get('/plan?days=2').data.decode()
+    assert 'Your 2-Day Meal Plan' in page and 'Day 2' in page and 'Day 3' not in page
+    ids = [int(i) for i in re.findall(r'/view_recipe/(\d+)', page)]
+    # a breakfast, two lunches and two dinners a day, none of them twice
+    assert len(ids) == 10 and len(set(ids)) == 10
+    vegetarian = {r['_id'] for r in recipes(n=600) if 'vegetarian' in r['tags']}
+    assert set(ids) <= vegetarian
+
+def test_plan_page_days_are_clamped(planner):
+    client = planner
+    page = client.get('/plan?days=99').data.decode()
+    assert f'Your {MAX_PLAN_DAYS}-Day Meal Plan' in page and f'Day {MAX_PLAN_DAYS}<' in page
+    assert 'Your 1-Day Meal Plan' in client.get('/plan?days=0').data.decode()
+    page = client.get('/plan?days=soon').data.decode()
+    assert 'Your 7-Day Meal Plan' in page and 'Day 7<' in page and 'Day 8<' not in page
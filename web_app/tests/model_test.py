@@ -3,7 +3,7 @@ import mongomock
 from mongoengine import connect, disconnect
 from web_app.back_end.model import (
     UserInformation, CookMode, MealType, AllergyPreferences,
-    Cuisine, DailyPlan, Requirements, Recipe, RecipeHistory
+    Cuisine, DailyPlan, Requirements, Recipe, RecipeHistory, Nutrition
 )
 
 @pytest.fixture(autouse=True)
@@ -67,19 +67,34 @@ def test_create_requirements():
     assert Requirements.objects(user=user).first() is not None
 
 def test_create_recipe():
-    user = UserInformation(username="u2", password="p2", email="u2@test.com").save()
     recipe = Recipe(
-        type="lunch", name="Ramen", time=30,
-        tags=["japanese", "main-dish"], nutrition=["calories: 500"],
+        name="Ramen", minutes=30,
+        tags=["japanese", "main-dish", "lunch"],
+        nutrition=Nutrition(calories=500, protein=30, sodium=80),
         n_steps=2, steps=["Boil water", "Add noodles"],
-        ingredients=["water", "noodles"], user=user
+        ingredients=["water", "noodles"], n_ingredients=2
     )
     recipe.save()
-    assert Recipe.objects(name="Ramen").first() is not None
+    saved = Recipe.objects(name="Ramen").first()
+    assert saved is not None
+    assert saved.minutes == 30
+    assert saved.nutrition.calories == 500
+
+def test_recipe_reads_raw_recipe_documents():
+    Recipe._get_collection().insert_one({
+        'name': 'Pancakes', 'minutes': 20, 'tags': ['breakfast'],
+        'nutrition': {'calories': 320.5, 'total_fat': 12.0, 'sugar': 40.0, 'sodium': 9.0,
+                      'protein': 14.0, 'saturated_fat': 20.0, 'carbohydrates': 15.0},
+        'n_steps': 1, 'steps': ['mix'], 'ingredients': ['flour'],
+        'id': 137739, 'submitted': '2005-09-16'
+    })
+    recipe = Recipe.objects(name='Pancakes').first()
+    assert recipe.nutrition.carbohydrates == 15.0
+    assert recipe.ingredients == ['flour']
 
 def test_create_recipe_history():
     user = UserInformation(username="u3", password="p3", email="u3@test.com").save()
-    recipe = Recipe(type="dinner", name="Curry", time=45, user=user).save()
+    recipe = Recipe(name="Curry", minutes=45).save()
     history = RecipeHistory(user=user, recipe=recipe)
     history.save()
     assert RecipeHistory.objects(user=user).first() is not None
@@ -0,0 +1,17 @@
+"""Test helpers for mongomock collections"""
+
+
+class BulkAsUpdates:
+    """mongomock can't take pymongo 4.9+ UpdateOne objects; replay them one by one"""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def bulk_write(self, requests, ordered=True):
+        modified = sum(
+            self._collection.update_one(r._filter, r._doc).modified_count for r in requests
+        )
+        return type('BulkWriteResult', (), {'modified_count': modified})()
+
+    def __getattr__(self, attr):
+        return getattr(self._collection, attr)
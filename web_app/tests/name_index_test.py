@@ -0,0 +1,63 @@
+import json
+import pytest
+from web_app.back_end.name_index import TrigramIndex, trigrams, normalize_name
+from web_app.back_end.corpus import RecipeCorpus
+
+NAMES = [
+    'Chicken Tikka Masala',
+    'Chicken Noodle Soup',
+    'Chickpea Curry',
+    'Chocolate Chip Cookies',
+    'Easy Chicken',
+    'Spaghetti Carbonara',
+]
+
+def names_of(index, query, k=10):
+    return [NAMES[row] for row, _ in index.search(query, k)]
+
+def test_normalize_and_trigrams():
+    assert normalize_name("  Mom's  BEST-Ever Pie!") == 'mom s best ever pie'
+    assert trigrams('pie') == {' pi', 'pie', 'ie '}
+    # The word still being typed is not closed off
+    assert 'ck ' not in trigrams('chick', complete=False)
+
+def test_prefix_ranks_short_exact_names_first():
+    index = TrigramIndex(NAMES)
+    assert names_of(index, 'chicken', 3) == ['Easy Chicken', 'Chicken Noodle Soup', 'Chicken Tikka Masala']
+    assert names_of(index, 'chick')[:1] == ['Easy Chicken']
+
+def test_typos_still_match():
+    index = TrigramIndex(NAMES)
+    assert names_of(index, 'spagetti carbonra', 1) == ['Spaghetti Carbonara']
+    assert names_of(index, 'chocolat chp', 1) == ['Chocolate Chip Cookies']
+
+def test_no_match_and_empty_query():
+    index = TrigramIndex(NAMES)
+    assert index.search('zzzz') == []
+    assert index.search('') == []
+
+def test_added_names_are_searchable():
+    index = TrigramIndex(NAMES)
+    index.search('curry')
+    index.add(['Green Curry'])
+    assert [row for row, _ in index.search('green curry', 1)] == [len(NAMES)]
+
+def test_corpus_autocomplete_follows_added_recipes():
+    corpus = RecipeCorpus([{'_id': i, 'name': name} for i, name in enumerate(NAMES)])
+    assert corpus.autocomplete('carbonara', 1) == [{'_id': 5, 'name': 'Spaghetti Carbonara'}]
+    corpus.add([{'_id': 99, 'name': 'Carbonara Pizza', 'tags': ['dinner'], 'minutes': 30}])
+    assert {r['_id'] for r in corpus.autocomplete('carbonara', 2)} == {5, 99}
+    # the other indexes were extended too
+    assert [r['_id'] for r in corpus.find({'tags': 'dinner', 'minutes': {'$lte': 30}})] == [99]
+
+@pytest.fixture
+def names(web):
+    corpus = RecipeCorpus([{'_id': i, 'name': name} for i, name in enumerate(NAMES)])
+    web.rec_sys = web.RecipeRecommendationSystem(corpus=corpus)
+
+def test_autocomplete_endpoint(names, client):
+    response = client.get('/api/autocomplete?q=chiken&k=2')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    assert [r['name'] for r in json.loads(response.data)] == ['Easy Chicken', 'Chicken Noodle Soup']
+    assert json.loads(client.get('/api/autocomplete?q=').data) == []
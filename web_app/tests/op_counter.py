@@ -0,0 +1,156 @@
+import difflib
+import threading
+
+# Collection methods that talk to the server and are worth counting
+OPERATIONS = (
+    'find', 'find_one', 'aggregate', 'count_documents', 'distinct',
+    'insert_one', 'insert_many', 'update_one', 'update_many',
+    'replace_one', 'delete_one', 'delete_many', 'bulk_write',
+    'find_one_and_update', 'find_one_and_delete', 'create_index',
+)
+
+
+def query_shape(value):
+    """Strip the literal values out of a filter, keeping fields and operators"""
+    if isinstance(value, dict):
+        return {k: query_shape(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(v, dict) for v in value):
+            return [query_shape(v) for v in value]
+        return '[...]'
+    return '?'
+
+
+class OperationLog:
+    """Thread-safe record of database operations"""
+
+    def __init__(self):
+        self.operations = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def set_label(self, label):
+        """Tag the operations made by the current thread (e.g. with a route)"""
+        self._local.label = label
+
+    def record(self, collection, operation, args):
+        if operation in ('insert_one', 'insert_many', 'bulk_write'):
+            # Documents, not filters: the field values would only be noise
+            shape = '<documents>'
+        else:
+            shape = query_shape(args[0]) if args else {}
+        entry = {
+            'collection': collection,
+            'operation': operation,
+            'shape': shape,
+            'label': getattr(self._local, 'label', None),
+        }
+        with self._lock:
+            self.operations.append(entry)
+
+    def reset(self):
+        with self._lock:
+            self.operations = []
+
+    def count(self, label=None):
+        if label is None:
+            return len(self.operations)
+        return sum(1 for op in self.operations if op['label'] == label)
+
+    def by_operation(self):
+        counts = {}
+        for op in self.operations:
+            key = f"{op['collection']}.{op['operation']}"
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+
+class CountingCollection:
+    """Proxy around a pymongo collection that logs every server operation"""
+
+    def __init__(self, collection, log, name=None):
+        self._collection = collection
+        self._log = log
+        if name is None:
+            # MagicMock fixtures return a Mock for .name; only trust real strings
+            name = getattr(collection, 'name', None)
+            name = name if isinstance(name, str) else 'collection'
+        self._name = name
+
+    def __getattr__(self, attr):
+        value = getattr(self._collection, attr)
+        if attr not in OPERATIONS:
+            return value
+
+        def counted(*args, **kwargs):
+            self._log.record(self._name, attr, args or ([kwargs['filter']] if 'filter' in kwargs else ()))
+            return value(*args, **kwargs)
+        return counted
+
+    def __getitem__(self, key):
+        return self._collection[key]
+
+
+class CountingDatabase:
+    """Proxy around a pymongo database handing out counting collections"""
+
+    def __init__(self, database, log):
+        self._database = database
+        self._log = log
+
+    def __getitem__(self, name):
+        return CountingCollection(self._database[name], self._log, name)
+
+    def __getattr__(self, attr):
+        return getattr(self._database, attr)
+
+
+class CountingClient:
+    """Proxy around a MongoClient (real or mongomock) that counts operations"""
+
+    def __init__(self, client, log):
+        self._client = client
+        self.log = log
+
+    def __getitem__(self, name):
+        return CountingDatabase(self._client[name], self.log)
+
+    def __getattr__(self, attr):
+        return getattr(self._client, attr)
+
+
+def format_operations(operations, limit=None):
+    """One numbered line per operation; those past the limit are marked with '+'"""
+    lines = []
+    for i, op in enumerate(operations, 1):
+        marker = '+' if limit is not None and i > limit else ' '
+        label = f"  [{op['label']}]" if op['label'] else ''
+        lines.append(f"{marker} {i:3d}. {op['collection']}.{op['operation']} {op['shape']}{label}")
+    return '\n'.join(lines)
+
+
+def assert_operation_budget(log, max_ops, label=None):
+    """Fail with a listing of every operation if more than max_ops were made"""
+    operations = [op for op in log.operations if label is None or op['label'] == label]
+    if len(operations) > max_ops:
+        raise AssertionError(
+            f"DB operation budget exceeded: {len(operations)} operations, budget {max_ops}"
+            f"{f' for {label}' if label else ''}\n" + format_operations(operations, max_ops)
+        )
+
+
+def assert_operations(log, expected):
+    """Compare the operations made with an expected list of 'collection.operation' strings"""
+    actual = [f"{op['collection']}.{op['operation']}" for op in log.operations]
+    if actual != list(expected):
+        diff = difflib.unified_diff(list(expected), actual, 'expected', 'actual', lineterm='')
+        raise AssertionError("DB operations differ:\n" + '\n'.join(diff))
+
+
+def counting(collection, name=None):
+    """Wrap a collection (pymongo, mongomock or a MagicMock fixture) for counting.
+
+    Returns the wrapped collection and its OperationLog.
+    """
+    log = OperationLog()
+    return CountingCollection(collection, log, name), log
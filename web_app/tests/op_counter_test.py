@@ -0,0 +1,32 @@
+import mongomock
+from web_app.tests.op_counter import (
+    CountingClient, CountingCollection, OperationLog, query_shape
+)
+
+def test_query_shape_strips_values():
+    query = {"$and": [{"tags": {"$all": ["vegan"]}}, {"minutes": {"$gte": 0, "$lte": 30}}]}
+    assert query_shape(query) == {
+        "$and": [{"tags": {"$all": "[...]"}}, {"minutes": {"$gte": "?", "$lte": "?"}}]
+    }
+
+def test_counting_client_records_operations():
+    log = OperationLog()
+    client = CountingClient(mongomock.MongoClient(), log)
+    coll = client['recipe_database']['recipes']
+    coll.insert_one({'name': 'A', 'tags': ['lunch']})
+    assert coll.find_one({'tags': 'lunch'})['name'] == 'A'
+    assert list(coll.find({}).limit(5))
+    assert log.count() == 3
+    assert log.by_operation() == {'recipes.insert_one': 1, 'recipes.find_one': 1, 'recipes.find': 1}
+
+def test_labels_are_per_thread():
+    log = OperationLog()
+    coll = CountingCollection(mongomock.MongoClient()['db']['recipes'], log)
+    log.set_label('GET /results')
+    coll.count_documents({})
+    log.set_label('GET /saved_recipes')
+    coll.find({'user': 'u'})
+    assert log.count('GET /results') == 1
+    assert log.count('GET /saved_recipes') == 1
+    log.reset()
+    assert log.count() == 0
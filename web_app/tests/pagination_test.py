@@ -0,0 +1,113 @@
+import json
+import pytest
+import mongomock
+from web_app.back_end.mongo_connection import RecipeDatabase
+from web_app.back_end.pagination import (
+    InvalidPageToken, encode_token, decode_token, keyset_query
+)
+
+RECIPES = [
+    {'_id': i, 'name': f'Soup {i}' if i % 2 else f'Salad {i}', 'minutes': (i * 7) % 5,
+     'tags': ['lunch'] + (['vegan'] if i % 3 == 0 else []),
+     'ingredient_keys': ['tomato'] + (['basil'] if i % 4 == 0 else [])}
+    for i in range(1, 24)
+]
+
+@pytest.fixture
+def db():
+    database = RecipeDatabase()
+    database.collection = mongomock.MongoClient().db.recipes
+    database.collection.insert_many([dict(r) for r in RECIPES])
+    return database
+
+def all_pages(db, query, limit, sort_field='_id'):
+    pages, token = [], None
+    while True:
+        recipes, token = db.find_recipes_page(query, limit, token, sort_field)
+        pages.append([r['_id'] for r in recipes])
+        if token is None:
+            return pages
+
+def test_token_round_trip_and_binding():
+    token = encode_token({'tags': 'x'}, 'minutes', {'_id': 7, 'minutes': 3})
+    assert '=' not in token and '{' not in token
+    assert decode_token(token, {'tags': 'x'}, 'minutes') == (3, 7)
+    with pytest.raises(InvalidPageToken):
+        decode_token(token, {'tags': 'y'}, 'minutes')
+    with pytest.raises(InvalidPageToken):
+        decode_token('not-a-token', {'tags': 'x'}, 'minutes')
+    assert keyset_query({'a': 1}, '_id', None) == {'a': 1}
+
+def test_pages_cover_every_match_once(db):
+    pages = all_pages(db, {}, 5)
+    assert [len(p) for p in pages] == [5, 5, 5, 5, 3]
+    assert sum(pages, []) == list(range(1, 24))
+    vegan = all_pages(db, db.tags_query(['vegan']), 3)
+    assert sum(vegan, []) == [3, 6, 9, 12, 15, 18, 21]
+    # an exact multiple of the page size has no empty last page
+    assert all_pages(db, db.tags_query(['vegan']), 7) == [[3, 6, 9, 12, 15, 18, 21]]
+
+def test_pages_by_rank_key_break_ties_on_id(db):
+    ids = sum(all_pages(db, {}, 4, sort_field='minutes'), [])
+    expected = [r['_id'] for r in sorted(RECIPES, key=lambda r: (r['minutes'], r['_id']))]
+    assert ids == expected
+
+def test_token_from_another_query_is_rejected(db):
+    _, token = db.find_recipes_page({}, 2)
+    with pytest.raises(InvalidPageToken):
+        db.find_recipes_page(db.tags_query(['vegan']), 2, token)
+
+def test_iter_recipes_streams_in_batches(db):
+    stream = db.iter_recipes(db.ingredients_query(['basil']), {'name': 1}, batch_size=2)
+    assert next(stream) == {'_id': 4, 'name': 'Salad 4'}
+    assert [r['_id'] for r in stream] == [8, 12, 16, 20]
+
+def test_iter_recipes_error(db, capsys):
+    db.collection = None
+    assert list(db.iter_recipes({})) == []
+    assert "Error streaming recipes" in capsys.readouterr().out
+
+@pytest.fixture
+def recipes(store):
+    store['recipe_database']['recipes'].insert_many([dict(r) for r in RECIPES])
+
+def test_browse_endpoint(recipes, client):
+    first = json.loads(client.get('/api/recipes?tags=lunch&ingredients=Basil&name=salad&limit=2').data)
+    assert [r['_id'] for r in first['results']] == [4, 8]
+    second = json.loads(client.get(
+        f"/api/recipes?tags=lunch&ingredients=Basil&name=salad&limit=2&cursor={first['next']}").data)
+    assert [r['_id'] for r in second['results']] == [12, 16]
+    # the cursor only works for the query it came from
+    response = client.get(f"/api/recipes?tags=vegan&cursor={first['next']}")
+    assert response.status_code == 400
+
+def test_browse_name_is_plain_text(recipes, client):
+    # Regex syntax is matched literally, not compiled
+    for name in ('(', 'salad.*', '(a+)+$'):
+        response = client.get(f'/api/recipes?name={name}')
+        assert response.status_code == 200
+        assert json.loads(response.data)['results'] == []
+    assert len(json.loads(client.get('/api/recipes?name=SALAD+1').data)['results']) == 5
+
+def test_browse_rejected_query_is_a_bad_request(web, recipes, client, monkeypatch):
+    from pymongo.errors import OperationFailure
+    def reject(*args, **kwargs):
+        raise OperationFailure("bad query")
+    monkeypatch.setattr(web.get_rec_system(), 'browse', reject)
+    response = client.get('/api/recipes?name=x')
+    assert response.status_code == 400 and 'invalid query' in json.loads(response.data)['error']
+
+def test_rarest_ingredient_first_from_stored_counts(db):
+    # Not counted yet: alphabetical, and no scan on the request
+    assert db.ingredients_query(['tomato', 'basil']) == {'ingredient_keys': {'$all': ['basil', 'tomato']}}
+    db.collection.database['recipes'].insert_one({'_id': 99, 'ingredient_keys': ['zest']})
+    assert db.build_ingredient_counts()
+    assert db.ingredient_counts(['tomato', 'zest', 'nope']) == {'tomato': 23, 'zest': 1}
+    assert db.ingredients_query(['tomato', 'zest']) == {'ingredient_keys': {'$all': ['zest', 'tomato']}}
+
+def test_token_ignores_the_order_of_set_operands(db):
+    query = {'ingredient_keys': {'$all': ['basil', 'tomato']}}
+    _, token = db.find_recipes_page(query, 2)
+    reordered = {'ingredient_keys': {'$all': ['tomato', 'basil']}}
+    recipes, _ = db.find_recipes_page(reordered, 2, token)
+    assert [r['_id'] for r in recipes] == [12, 16]
@@ -0,0 +1,85 @@
+import itertools
+import random
+import numpy as np
+from web_app.back_end.corpus import RecipeCorpus
+from web_app.back_end.plan_optimizer import (
+    choose_jointly, optimize_plan, slot_targets, split_shared, CALORIE_BUCKET
+)
+from web_app.back_end.recipe_recommender import plan_key
+
+def test_joint_choice_matches_brute_force():
+    # Calories on bucket boundaries, where the DP is exact
+    rng = random.Random(4)
+    for _ in range(30):
+        calories = [np.array([rng.randint(5, 90) * CALORIE_BUCKET for _ in range(rng.randint(1, 6))], float)
+                    for _ in range(4)]
+        values = [np.array([rng.random() for _ in c]) for c in calories]
+        fits = [
+            sum(v[j] for v, j in zip(values, combo))
+            for combo in itertools.product(*(range(len(c)) for c in calories))
+            if 1400 <= sum(c[j] for c, j in zip(calories, combo)) <= 1600
+        ]
+        picks = choose_jointly(calories, values, 1400, 1600)
+        if not fits:
+            assert picks is None
+            continue
+        assert 1400 <= sum(c[j] for c, j in zip(calories, picks)) <= 1600
+        assert np.isclose(sum(v[j] for v, j in zip(values, picks)), max(fits))
+
+def test_slot_targets_split_the_day_by_weight():
+    targets = slot_targets([('breakfast', None), ('lunch', 'main-dish'), ('lunch', 'desserts')], 1500)
+    assert np.isclose(sum(targets), 1500)
+    assert targets[1] > targets[2]
+
+def test_shared_recipes_go_to_the_slot_with_fewer_candidates():
+    a, b, c, d, e = ({'_id': i} for i in range(5))
+    # b goes to the slot with nothing else; c and d take turns, the first slot winning the tie
+    for _ in range(5):
+        split = split_shared([[a, b, c, d], [b], [c, d, e]])
+        assert [[r['_id'] for r in pool] for pool in split] == [[0, 2], [1], [3, 4]]
+    # Near-duplicates count as one recipe
+    twin = {'_id': 9, 'cluster_id': 1}
+    assert split_shared([[twin], [b]]) == [[twin], []]
+
+def corpus(seed=1, n=3000, calories=(50, 1100)):
+    rng = random.Random(seed)
+    tags = ['breakfast', 'lunch', 'dinner', 'main-dish', 'side-dishes', 'desserts', 'vegetarian', 'easy']
+    return RecipeCorpus([
+        {'_id': i, 'name': f'recipe {i}', 'minutes': rng.randint(5, 200), 'tags': rng.sample(tags, 4),
+         'ingredients': ['water'], 'nutrition': {'calories': rng.randint(*calories)},
+         'cluster_id': i // 2}
+        for i in range(n)
+    ])
+
+PREFS = {'question1': ['vegetarian'], 'question2': '3', 'question3': 6, 'question4': ['any'],
+         'question6': ['breakfast', 'lunch', 'dinner'], 'question7': ['main_dish', 'side_dishes']}
+
+def test_plan_total_lands_in_the_daily_range():
+    recipes = corpus()
+    for _ in range(10):
+        plan = optimize_plan(PREFS, recipes)
+        chosen = [r for meal in ('breakfast', 'lunch', 'dinner') for r in plan[meal]]
+        assert [len(plan[m]) for m in ('breakfast', 'lunch', 'dinner')] == [1, 2, 2]
+        assert 1600 <= sum(r['nutrition']['calories'] for r in chosen) <= 1800
+        assert all('vegetarian' in r['tags'] for r in chosen)
+        assert len({plan_key(r) for r in chosen}) == len(chosen)
+
+def test_falls_back_to_slot_by_slot():
+    # Nothing under 1,100 kcal a dish fits a 1,200-1,400 day of five dishes
+    heavy = corpus(calories=(900, 1100))
+    plan = optimize_plan(dict(PREFS, question2='1'), heavy)
+    assert [len(plan[m]) for m in ('breakfast', 'lunch', 'dinner')] == [1, 2, 2]
+    # Out of time, and no calorie range at all
+    assert optimize_plan(PREFS, corpus(), budget_ms=0)['breakfast']
+    assert optimize_plan(dict(PREFS, question2='7'), corpus())['breakfast']
+
+def test_seen_recipes_only_when_nothing_else_is_left():
+    recipes = corpus()
+    seen = {cluster for cluster in range(1500) if cluster % 2}
+    plan = optimize_plan(PREFS, recipes, seen=seen)
+    chosen = [r for recs in plan.values() for r in recs]
+    assert len(chosen) == 5 and not any(plan_key(r) in seen for r in chosen)
+    everything = set(range(1500))
+    plan = optimize_plan(PREFS, recipes, seen=everything)
+    chosen = [r for recs in plan.values() for r in recs]
+    assert len(chosen) == 5 and 1600 <= sum(r['nutrition']['calories'] for r in chosen) <= 1800
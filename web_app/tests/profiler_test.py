@@ -0,0 +1,59 @@
+import json
+import os
+import time
+from flask import Flask, session
+from web_app.back_end.profiler import (
+    init_profiler, preference_signature, profile_token, StackSampler
+)
+
+def make_app():
+    app = Flask(__name__)
+    app.secret_key = 'test'
+
+    @app.route('/results')
+    def results():
+        session['response2'] = '4'
+        deadline = time.perf_counter() + 0.03
+        while time.perf_counter() < deadline:
+            pass
+        return 'ok'
+    return app
+
+def test_disabled_registers_nothing(tmpdir):
+    app = make_app()
+    assert init_profiler(app, environ={'PROFILE_DIR': str(tmpdir)}) is False
+    assert not app.before_request_funcs
+    assert not app.teardown_request_funcs
+
+def test_profile_every_request(tmpdir):
+    app = make_app()
+    env = {'PROFILE_REQUESTS': '1', 'PROFILE_DIR': str(tmpdir)}
+    assert init_profiler(app, preferences=lambda: {'question2': '4'}, environ=env)
+    assert app.test_client().get('/results').status_code == 200
+
+    files = sorted(os.listdir(tmpdir))
+    assert len(files) == 2
+    signature = preference_signature({'question2': '4'})
+    assert all('_results_' + signature in f for f in files)
+
+    summary = json.loads(open(os.path.join(tmpdir, files[1])).read())
+    assert summary['route'] == 'results'
+    assert summary['samples'] > 0
+    assert summary['mongo'] == {}
+    collapsed = open(os.path.join(tmpdir, files[0])).read()
+    assert 'results (profiler_test.py' in collapsed
+
+def test_signed_header(tmpdir):
+    app = make_app()
+    env = {'PROFILE_SECRET': 's3cret', 'PROFILE_DIR': str(tmpdir)}
+    init_profiler(app, environ=env)
+    client = app.test_client()
+    client.get('/results', headers={'X-Profile': 'forged'})
+    assert os.listdir(tmpdir) == []
+    client.get('/results', headers={'X-Profile': profile_token('s3cret', '/results')})
+    assert len(os.listdir(tmpdir)) == 2
+
+def test_stack_sampler_collapsed_format():
+    sampler = StackSampler(0)
+    sampler.counts = {'a;b': 2, 'a;c': 1}
+    assert sampler.collapsed() == 'a;b 2\na;c 1\n'
@@ -0,0 +1,95 @@
+import pytest
+import mongomock
+import numpy as np
+from bson import ObjectId
+from web_app.back_end.profiles import TasteProfile, ProfileStore, feature_keys, profile_update
+from web_app.back_end.recipe_recommender import recommend_recipes
+from web_app.back_end.corpus import RecipeCorpus
+
+CURRY = {'_id': 1, 'name': 'Chickpea Curry', 'tags': ['dinner', 'indian', 'vegan'],
+         'ingredients': ['chickpeas', 'coconut milk', 'curry powder']}
+DAL = {'_id': 2, 'name': 'Red Lentil Dal', 'tags': ['dinner', 'indian'],
+       'ingredients': ['red lentils', 'coconut milk', 'curry powder']}
+STEAK = {'_id': 3, 'name': 'Steak Frites', 'tags': ['dinner', 'french'],
+         'ingredients': ['steak', 'potatoes', 'butter']}
+
+def test_feature_keys_are_safe_field_names():
+    assert feature_keys(CURRY) == ['t:dinner', 't:indian', 't:vegan',
+                                   'i:chickpea', 'i:coconut milk', 'i:curry powder']
+    assert feature_keys({'tags': ['st. louis'], 'ingredient_keys': ['$5 wine']}) == ['t:st  louis', 'i: 5 wine']
+    assert profile_update({'tags': ['a', 'a']}, -1) == {'$inc': {'weights.t:a': -1, 'saves': -1}}
+
+def test_corpus_candidates_are_not_canonicalized_again(monkeypatch):
+    from web_app.back_end import profiles
+    candidates = list(RecipeCorpus([CURRY, DAL]).find({}))
+    def canonicalize(ingredients):
+        raise AssertionError("ingredient_keys should come with the candidate")
+    monkeypatch.setattr(profiles, 'canonical_ingredients', canonicalize)
+    assert feature_keys(candidates[0])[-3:] == ['i:chickpea', 'i:coconut milk', 'i:curry powder']
+    assert TasteProfile({'i:red lentil': 1}, saves=1).rank(candidates)[0]['_id'] == 2
+
+def test_scores_are_length_normalized_dot_products():
+    profile = TasteProfile({'t:indian': 2, 'i:coconut milk': 2, 't:dinner': 3, 'i:steak': 0}, saves=3)
+    scores = profile.scores([CURRY, DAL, STEAK, {'tags': []}])
+    assert np.allclose(scores, [7 / np.sqrt(6), 7 / np.sqrt(5), 3 / np.sqrt(5), 0])
+    assert [r['_id'] for r in profile.rank([STEAK, CURRY, DAL])] == [2, 1, 3]
+    # an empty profile leaves the order alone
+    assert [r['_id'] for r in TasteProfile().rank([STEAK, CURRY])] == [3, 1]
+
+def test_store_updates_incrementally_and_matches_a_rebuild():
+    collection = mongomock.MongoClient().db.user_profiles
+    store = ProfileStore(collection)
+    assert not store.get('ana')
+    store.record('ana', CURRY)
+    store.record('ana', DAL)
+    store.record('ana', STEAK)
+    store.record('ana', STEAK, -1)
+    store.record('ana', None)
+    profile = store.get('ana')
+    assert profile.saves == 2
+    assert 'i:steak' not in profile.index
+    assert store.get('ana') is profile          # cached
+
+    incremental = collection.find_one({'user': 'ana'})
+    store.rebuild('ana', [CURRY, DAL])
+    rebuilt = collection.find_one({'user': 'ana'})
+    assert {k: v for k, v in incremental['weights'].items() if v} == rebuilt['weights']
+
+def test_cache_expires_and_is_bounded(monkeypatch):
+    collection = mongomock.MongoClient().db.user_profiles
+    store = ProfileStore(collection)
+    monkeypatch.setattr(ProfileStore, 'MAX_CACHED', 2)
+    first = store.get('a')
+    # another worker saved a recipe for 'a'
+    collection.update_one({'user': 'a'}, profile_update(CURRY), upsert=True)
+    assert store.get('a') is first
+    monkeypatch.setattr(ProfileStore, 'TTL', 0)
+    assert store.get('a').saves == 1
+    store.get('b')
+    store.get('c')
+    assert list(store._cache) == ['b', 'c']
+
+def test_recommendations_follow_the_profile(monkeypatch):
+    from web_app.back_end import recipe_recommender
+    corpus = RecipeCorpus([dict(r, nutrition={'calories': 500}, tags=r['tags'] + ['main-dish'])
+                           for r in (CURRY, DAL, STEAK)])
+    prefs = {'question6': ['dinner'], 'question7': ['main_dish'], 'question2': 7, 'question3': 6,
+             'question4': ['any'], 'question1': []}
+    profile = TasteProfile({'t:french': 1, 'i:steak': 1, 'i:butter': 1}, saves=1)
+    monkeypatch.setattr(recipe_recommender, 'PROFILE_TOP_PICKS', 1)
+    for _ in range(5):
+        assert [r['_id'] for r in recommend_recipes(prefs, corpus, profile)['dinner']] == [3]
+
+@pytest.fixture
+def curry_id(web):
+    curry = dict(CURRY, _id=ObjectId())
+    web.db.collection.insert_one(curry)
+    web.rec_sys = web.RecipeRecommendationSystem(corpus=RecipeCorpus([curry]))
+    return curry['_id']
+
+def test_save_and_unsave_update_the_profile(web, curry_id, client):
+    client.post(f'/save_recipe/{curry_id}')
+    profile = web.rec_sys.get_profile('tester')
+    assert profile.saves == 1 and 't:indian' in profile.index
+    client.post(f'/unsave_recipe/{curry_id}')
+    assert not web.rec_sys.get_profile('tester')
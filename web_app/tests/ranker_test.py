@@ -0,0 +1,103 @@
+import random
+import numpy as np
+import pytest
+from web_app.back_end.ranker import QualityRanker, top_k, NUMERIC_FEATURES
+from web_app.back_end.corpus import RecipeCorpus
+from web_app.back_end.recipe_recommender import find_candidates, recommend_recipes, RANKER_PROJECTION
+
+def make_recipes(n, seed=2):
+    rng = random.Random(seed)
+    recipes = []
+    for i in range(n):
+        loved = rng.random() < 0.3
+        recipes.append({
+            '_id': i, 'name': f'recipe {i}',
+            'minutes': rng.randint(5, 30) if loved else rng.randint(60, 300),
+            'n_steps': rng.randint(3, 15),
+            'tags': ['dinner', 'main-dish'] + (['crowd-pleaser'] if loved else ['fussy']),
+            'ingredients': ['x'] * rng.randint(3, 12),
+            'nutrition': {'calories': rng.randint(200, 800), 'protein': rng.randint(5, 50)},
+        })
+    return recipes
+
+def test_training_separates_saved_recipes():
+    recipes = make_recipes(400)
+    labels = ['crowd-pleaser' in r['tags'] for r in recipes]
+    model = QualityRanker.train(recipes, labels)
+    scores = model.scores(recipes)
+    assert scores[np.array(labels)].min() > scores[~np.array(labels)].max()
+    assert model.weights[len(NUMERIC_FEATURES) + model.tags.index('crowd-pleaser')] > 0
+    assert model.weights[NUMERIC_FEATURES.index('minutes')] < 0
+
+def test_missing_values_sit_at_the_mean():
+    model = QualityRanker(['dinner'], np.ones(len(NUMERIC_FEATURES) + 1), 0.5)
+    X = model.features([{'tags': ['dinner', 'unknown'], 'nutrition': None}])
+    assert X.shape == (1, len(NUMERIC_FEATURES) + 1)
+    # n_ingredients is 0, not unknown: log1p(0) = 0 minus a zero mean
+    assert X[0, :-1].tolist() == [0] * len(NUMERIC_FEATURES) and X[0, -1] == 1
+    assert model.scores([{'tags': ['dinner']}])[0] == pytest.approx(1.5)
+
+def test_save_load_round_trip(tmp_path):
+    recipes = make_recipes(100)
+    model = QualityRanker.train(recipes, ['fussy' in r['tags'] for r in recipes], epochs=20)
+    model.save(str(tmp_path / 'ranker.json'))
+    loaded = QualityRanker.load(str(tmp_path / 'ranker.json'))
+    assert loaded.tags == model.tags
+    assert np.allclose(loaded.scores(recipes), model.scores(recipes), atol=1e-4)
+
+def test_corpus_scores_match_per_recipe_scores():
+    recipes = make_recipes(300)
+    model = QualityRanker.train(recipes, ['crowd-pleaser' in r['tags'] for r in recipes], epochs=50)
+    corpus = RecipeCorpus(recipes[:200])
+    assert np.allclose(model.corpus_scores(corpus), model.scores(recipes[:200]), atol=1e-4)
+    corpus.add(recipes[200:])
+    assert np.allclose(model.corpus_scores(corpus), model.scores(recipes), atol=1e-4)
+
+def test_top_k():
+    scores = np.array([0.1, 0.9, 0.5, 0.9, -1.0], dtype=np.float32)
+    assert top_k(scores, 3).tolist() == [1, 3, 2]
+    assert top_k(scores, 10).tolist() == [1, 3, 2, 0, 4]
+    assert top_k(scores, 0).tolist() == []
+
+def test_candidates_are_the_best_matches():
+    recipes = make_recipes(300)
+    model = QualityRanker.train(recipes, ['crowd-pleaser' in r['tags'] for r in recipes], epochs=50)
+    corpus = RecipeCorpus(recipes)
+    best = find_candidates(corpus, {'tags': 'main-dish'}, 5, model)
+    assert all('crowd-pleaser' in r['tags'] for r in best)
+    scores = model.scores(best)
+    assert list(scores) == sorted(scores, reverse=True)
+    # Without the corpus, the first matches from the database are ranked
+    assert [r['_id'] for r in find_candidates(recipes_as_collection(recipes), {}, 5, model)] == \
+        [r['_id'] for r in best]
+
+    prefs = {'question6': ['dinner'], 'question7': ['main_dish'], 'question1': [],
+             'question2': 7, 'question3': 6, 'question4': ['any']}
+    for _ in range(5):
+        dinner = recommend_recipes(prefs, corpus, ranker=model)['dinner']
+        assert 'crowd-pleaser' in dinner[0]['tags']
+
+def test_database_matches_are_scored_on_their_features_only():
+    recipes = make_recipes(300)
+    model = QualityRanker.train(recipes, ['crowd-pleaser' in r['tags'] for r in recipes], epochs=50)
+    collection = recipes_as_collection(recipes)
+    finds = []
+
+    class Spy:
+        def find(self, *args):
+            finds.append(args)
+            return collection.find(*args)
+
+    best = find_candidates(Spy(), {}, 5, model)
+    # The 500 matches come with the feature fields, the 5 winners in full
+    assert finds[0] == ({}, RANKER_PROJECTION)
+    assert finds[1] == ({'_id': {'$in': [r['_id'] for r in best]}},)
+    assert [r['name'] for r in best] == [f"recipe {r['_id']}" for r in best]
+    scores = model.scores(best)
+    assert list(scores) == sorted(scores, reverse=True)
+
+def recipes_as_collection(recipes):
+    import mongomock
+    collection = mongomock.MongoClient().db.recipes
+    collection.insert_many([dict(r) for r in recipes])
+    return collection
@@ -1,6 +1,9 @@
 import pytest
 from unittest.mock import MagicMock
-from web_app.back_end.recipe_recommender import recommend_recipes, find_with_improved_relaxation
+from web_app.back_end.recipe_recommender import (
+    recommend_recipes, find_with_improved_relaxation, nutrient_filters, excluded_ingredients
+)
+from web_app.back_end.corpus import RecipeCorpus
 
 @pytest.fixture
 def test_db():
@@ -178,4 +181,123 @@ def test_recommend_recipes_time_type_error():
     mock_db.find.return_value = mock_cursor
 
     result = recommend_recipes(user_preferences, mock_db)
-    assert isinstance(result, dict)
\ No newline at end of file
+    assert isinstance(result, dict)
+
+
+NUTRIENT_RECIPES = [
+    {'_id': 1, 'name': 'Pancakes', 'minutes': 20, 'tags': ['breakfast', 'american'],
+     'nutrition': {'calories': 450, 'protein': 8, 'sodium': 30}, 'ingredients': ['flour']},
+    {'_id': 2, 'name': 'Egg White Omelette', 'minutes': 10, 'tags': ['breakfast', 'french'],
+     'nutrition': {'calories': 200, 'protein': 35, 'sodium': 12}, 'ingredients': ['eggs']},
+    {'_id': 3, 'name': 'Bacon Scramble', 'minutes': 15, 'tags': ['breakfast', 'american'],
+     'nutrition': {'calories': 500, 'protein': 40, 'sodium': 60}, 'ingredients': ['eggs', 'bacon']},
+]
+
+def nutrient_preferences(**extra):
+    prefs = {
+        'question1': [],
+        'question2': 7,
+        'question3': 6,
+        'question4': ['any'],
+        'question5': 2,
+        'question6': ['breakfast'],
+        'question7': ['main_dish'],
+    }
+    prefs.update(extra)
+    return prefs
+
+def test_nutrient_filters_builds_range_queries():
+    parts = nutrient_filters({
+        'protein': {'min': '30'},
+        'sodium': {'max': 20},
+        'fibre': {'min': 5},           # not a nutrient we store
+        'sugar': {'min': 'lots'},      # not a number
+    })
+    assert parts == [
+        {'nutrition.protein': {'$gte': 30.0}},
+        {'nutrition.sodium': {'$lte': 20.0}},
+    ]
+    assert nutrient_filters(None) == []
+
+def test_recommend_recipes_applies_nutrient_limits():
+    corpus = RecipeCorpus(NUTRIENT_RECIPES)
+    prefs = nutrient_preferences(nutrients={'protein': {'min': 30}, 'sodium': {'max': 20}})
+    for _ in range(5):
+        results = recommend_recipes(prefs, corpus)
+        assert [r['_id'] for r in results['breakfast']] == [2]
+
+def test_nutrient_priority_controls_relaxation():
+    corpus = RecipeCorpus(NUTRIENT_RECIPES)
+    # Only recipe 3 has this much protein, and it isn't French
+    nutrients = {'protein': {'min': 38}}
+    params = {
+        "query": {"$and": [{"tags": {"$in": ["breakfast"]}}, {"tags": {"$in": ["french"]}},
+                           {"nutrition.protein": {"$gte": 38}}]},
+        "cuisine_tags": ["french"],
+        "has_calorie": False,
+        "has_time": False,
+        "has_diet": False,
+        "diet_tags": [],
+        "allergy_tags": [],
+        "meal_tags": ["breakfast"],
+        "dish_tags": ["breakfast"],
+        "nutrient_parts": nutrient_filters(nutrients),
+    }
+    # Kept past the cuisine level: cuisine is given up to honour the protein goal
+    assert find_with_improved_relaxation(corpus, dict(params, nutrient_priority=2))['_id'] == 3
+    # Dropped together with cuisine: the first breakfast will do
+    assert find_with_improved_relaxation(corpus, dict(params, nutrient_priority=1))['_id'] == 1
+
+def test_plan_skips_near_duplicates():
+    # 10 and 11 are clones ("... ii"); only one of them may be in a plan
+    corpus = RecipeCorpus([
+        {'_id': 10, 'name': 'Easy Banana Bread', 'tags': ['main-dish', 'side-dishes'],
+         'nutrition': {'calories': 300}, 'cluster_id': 10},
+        {'_id': 11, 'name': 'Easy Banana Bread II', 'tags': ['main-dish', 'side-dishes'],
+         'nutrition': {'calories': 300}, 'cluster_id': 10},
+        {'_id': 12, 'name': 'Green Salad', 'tags': ['side-dishes'],
+         'nutrition': {'calories': 100}},
+    ])
+    prefs = nutrient_preferences(question6=['lunch'], question7=['main_dish', 'side_dishes'])
+    for _ in range(5):
+        lunch = recommend_recipes(prefs, corpus)['lunch']
+        assert [r['_id'] for r in lunch][1] == 12
+
+def test_excluded_ingredients_are_canonical():
+    assert excluded_ingredients({'exclude_ingredients': 'Fresh Cilantro, olives,'}) == ['cilantro', 'olive']
+    assert excluded_ingredients({'exclude_ingredients': ['Eggs']}) == ['egg']
+    assert excluded_ingredients({}) == []
+
+def test_exclusions_survive_every_relaxation():
+    corpus = RecipeCorpus(NUTRIENT_RECIPES)
+    # Nothing French is egg-free: cuisine is relaxed, the exclusion is not
+    prefs = nutrient_preferences(question4=['french'], exclude_ingredients=['eggs'])
+    for _ in range(5):
+        assert [r['_id'] for r in recommend_recipes(prefs, corpus)['breakfast']] == [1]
+    # With every breakfast excluded, the plan stays empty rather than serving one
+    prefs = nutrient_preferences(exclude_ingredients=['eggs', 'flour'])
+    assert recommend_recipes(prefs, corpus)['breakfast'] == []
+
+def test_new_quiz_starts_without_the_last_answers(client):
+    with client.session_transaction() as sess:
+        sess.update(response1=['vegan'], response7=['main_dish'],
+                    exclude_ingredients=['cilantro'], optimize_calories=True)
+    assert client.get('/start_quiz').status_code == 302
+    with client.session_transaction() as sess:
+        assert set(sess) == {'username'}
+
+def test_lost_connection_keeps_the_recommender(web, monkeypatch):
+    rec_sys = web.get_rec_system()
+    rec_sys.corpus = RecipeCorpus([])
+    rec_sys.slot_pools.put('tester', 'v1', {'lunch': []}, {'lunch': []})
+    # MongoDB went away, and is still away on the next request
+    rec_sys.connected, rec_sys.profiles, rec_sys.seen = False, None, None
+    connect = rec_sys.db.connect
+    up = False
+    monkeypatch.setattr(rec_sys.db, 'connect', lambda: up and connect())
+    assert web.get_rec_system() is rec_sys and not rec_sys.connected
+    # ...and back: same snapshot and reroll pools, stores reattached
+    up = True
+    assert web.get_rec_system() is rec_sys and rec_sys.connected
+    assert rec_sys.corpus is not None and rec_sys.slot_pools.get('tester', 'v1') == ({'lunch': []}, {'lunch': []})
+    assert rec_sys.profiles is not None and rec_sys.seen is not None
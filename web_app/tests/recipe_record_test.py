@@ -0,0 +1,57 @@
+import sys
+from web_app.back_end.recipe_record import RecipeRecord, Nutrition
+
+DOC = {
+    '_id': 7,
+    'name': 'Pasta',
+    'minutes': 45,
+    'n_steps': 3,
+    'tags': ['dinner', 'main-dish'],
+    'ingredients': ['pasta', 'tomato'],
+    'nutrition': {'calories': 650.2, 'protein': 25},
+    'description': 'long text',
+    'steps': ['boil', 'mix', 'serve'],
+    'cluster_id': 3,
+}
+
+def test_from_document_round_trip():
+    record = RecipeRecord.from_document(DOC)
+    doc = record.to_dict()
+    assert doc['name'] == 'Pasta'
+    assert doc['tags'] == ['dinner', 'main-dish']
+    assert doc['nutrition'] == {'calories': 650.2, 'protein': 25}
+    assert doc['cluster_id'] == 3
+    assert doc['ingredient_keys'] == ['pasta', 'tomato']
+    # description and steps are loaded lazily, never kept in the record
+    assert 'description' not in doc and 'steps' not in doc
+
+def test_record_reads_like_a_document():
+    record = RecipeRecord.from_document(DOC)
+    assert record['_id'] == 7
+    assert record.get('minutes') == 45
+    assert record.get('missing', 'x') == 'x'
+    assert 'cluster_id' in record
+    assert record['nutrition']['calories'] == 650.2
+    assert record.nutrition.get('sugar') is None
+    assert dict(record.nutrition.items()) == {'calories': 650.2, 'protein': 25}
+
+def test_tags_are_interned_and_shared():
+    a = RecipeRecord.from_document(dict(DOC, tags=[''.join(['din', 'ner'])]))
+    b = RecipeRecord.from_document(dict(DOC, tags=[''.join(['di', 'nner'])]))
+    assert a.tags[0] is b.tags[0]
+
+def test_record_has_no_instance_dict():
+    record = RecipeRecord.from_document(DOC)
+    assert not hasattr(record, '__dict__')
+    assert not hasattr(record.nutrition, '__dict__')
+    assert sys.getsizeof(record) < sys.getsizeof({k: v for k, v in DOC.items()})
+
+def test_to_dict_returns_independent_copies():
+    record = RecipeRecord.from_document(DOC)
+    doc = record.to_dict()
+    doc['tags'].append('lunch')
+    assert record.tags == ('dinner', 'main-dish')
+
+def test_nutrition_ignores_non_numbers():
+    nutrition = Nutrition({'calories': '100', 'protein': True, 'sugar': 3})
+    assert nutrition.to_dict() == {'sugar': 3}
@@ -0,0 +1,81 @@
+import mongomock
+import web_app.back_end.mongo_connection as mongo_connection
+from web_app.back_end.recipe_system import RecipeRecommendationSystem
+from web_app.back_end.reroll import SlotPools, calorie_window, reroll, slot_pool
+from web_app.back_end.seen_filter import SeenFilter
+from web_app.back_end.corpus import RecipeCorpus
+
+def recipe(i, *tags, cluster=None):
+    return {'_id': i, 'name': f'recipe {i}', 'minutes': 20, 'tags': list(tags),
+            'ingredients': ['eggs'], 'nutrition': {'calories': 300}, 'cluster_id': cluster}
+
+def test_reroll_skips_the_plan_and_its_near_duplicates():
+    plan = {'lunch': [recipe(1, 'main-dish', cluster=7), recipe(2, 'side-dishes')]}
+    pool = [recipe(3, 'main-dish', cluster=7), recipe(2, 'main-dish'), recipe(4, 'main-dish')]
+    for _ in range(10):
+        assert reroll(plan, pool)['_id'] == 4
+    assert reroll(plan, pool[:2]) is None
+
+def test_reroll_passes_over_seen_recipes():
+    plan = {'lunch': [recipe(1, 'main-dish')]}
+    pool = [recipe(2, 'main-dish'), recipe(3, 'main-dish')]
+    seen = SeenFilter()
+    seen.add('2')
+    for _ in range(10):
+        assert reroll(plan, pool, seen=seen)['_id'] == 3
+    # ...unless nothing else is left
+    assert reroll(plan, pool[:1], seen=seen)['_id'] == 2
+
+def test_cold_pool_from_the_quiz_answers():
+    corpus = RecipeCorpus([recipe(1, 'lunch', 'side-dishes', 'vegan'), recipe(2, 'lunch', 'side-dishes'),
+                           recipe(3, 'main-dish', 'vegan'), recipe(4, 'breakfast', 'vegan')])
+    prefs = {'question1': ['vegan'], 'question4': ['any'], 'question7': ['main_dish', 'side_dishes']}
+    assert [r['_id'] for r in slot_pool(prefs, corpus, 'lunch', recipe(9, 'side-dishes'))] == [1]
+    assert [r['_id'] for r in slot_pool(prefs, corpus, 'dinner', recipe(9))] == [3]
+    assert [r['_id'] for r in slot_pool(prefs, corpus, 'breakfast', recipe(9))] == [4]
+
+def test_cold_pool_keeps_the_calorie_window():
+    def dish(i, calories):
+        return dict(recipe(i, 'lunch', 'main-dish'), nutrition={'calories': calories})
+    corpus = RecipeCorpus([dish(1, 150), dish(2, 700), dish(3, 2000)])
+    prefs = {'question2': 1, 'question4': ['any'], 'question6': ['lunch', 'dinner'], 'question7': ['main_dish']}
+    low, high = calorie_window(prefs, 'lunch', 'main-dish')
+    # Every window recommend_recipes can draw for lunch is inside it
+    assert int(1200 * 2.1 / (2.1 + 2.3)) >= low and high >= int(1400 * 2.5 / (2.5 + 1.9))
+    assert [r['_id'] for r in slot_pool(prefs, corpus, 'lunch', recipe(9, 'main-dish'))] == [2]
+    assert calorie_window(dict(prefs, optimize_calories=True), 'lunch', 'main-dish') == (0, 1400)
+    assert calorie_window(dict(prefs, question2=7), 'lunch') is None
+
+def test_slot_pools_expire_and_evict():
+    pools = SlotPools()
+    pools.MAX_USERS = 2
+    for user in ('a', 'b', 'c'):
+        pools.put(user, 'v1', {'lunch': []}, {})
+    assert pools.get('a', 'v1') is None and pools.get('c', 'v1') == ({'lunch': []}, {})
+    pools.TTL = 0
+    assert pools.get('c', 'v1') is None
+
+def test_slot_pools_only_serve_the_version_asked_for():
+    pools = SlotPools()
+    pools.put('a', 'v1', {'lunch': []}, {})
+    assert pools.get('a', 'v2') is None and pools.get('a', None) is None
+    assert pools.get('a', 'v1') == ({'lunch': []}, {})
+
+def test_rerolled_dish_is_hydrated_and_marked_seen(monkeypatch):
+    store = mongomock.MongoClient()
+    monkeypatch.setattr(mongo_connection, 'MongoClient', lambda *args, **kwargs: store)
+    collection = store['recipe_database']['recipes']
+    collection.insert_many([dict(recipe(i, 'lunch', 'main-dish'), description=f'about {i}', steps=['cook'])
+                            for i in range(1, 4)])
+    store['recipe_database']['user_information'].insert_one({'username': 'cook'})
+    system = RecipeRecommendationSystem(corpus=RecipeCorpus.load(collection))
+    prefs = {'question4': ['any'], 'question6': ['lunch'], 'question7': ['main_dish']}
+    plan = system.get_recommendations(prefs, 'cook', 'v1')
+    new, version, new_version = system.reroll_dish('cook', prefs, 'lunch', 0, 'v1', lambda: None)
+    assert version == 'v1' and new_version != 'v1'
+    assert new['_id'] != plan['lunch'][0]['_id']
+    assert new['description'] == f"about {new['_id']}" and new['steps'] == ['cook']
+    assert str(new['_id']) in system.seen.get('cook')
+    # The cache moved on to the new version
+    assert system.slot_pools.get('cook', 'v1') is None
+    assert system.slot_pools.get('cook', new_version)[0]['lunch'] == [new]
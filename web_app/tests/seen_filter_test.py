@@ -0,0 +1,59 @@
+import mongomock
+from web_app.back_end.corpus import RecipeCorpus
+from web_app.back_end.recipe_recommender import recommend_recipes, plan_key
+from web_app.back_end.seen_filter import (
+    SeenFilter, SeenStore, GENERATION_CAPACITY, SEEN_FILTER_BITS, SEEN_FILTER_FIELD
+)
+
+def test_no_false_negatives_and_few_false_positives():
+    seen = SeenFilter()
+    for i in range(GENERATION_CAPACITY):
+        seen.add(i)
+    assert all(i in seen for i in range(GENERATION_CAPACITY))
+    false_positives = sum(f'other {i}' in seen for i in range(20000))
+    assert false_positives / 20000 < 0.002
+
+def test_generations_rotate():
+    seen = SeenFilter()
+    for i in range(GENERATION_CAPACITY + 1):
+        seen.add(i)
+    assert 0 in seen                   # in the previous generation
+    for i in range(GENERATION_CAPACITY):
+        seen.add(f'later {i}')
+    assert 0 not in seen and f'later {GENERATION_CAPACITY - 1}' in seen
+
+def test_stored_with_the_user():
+    users = mongomock.MongoClient().db.user_information
+    users.insert_one({'username': 'ana', 'password': 'x'})
+    store = SeenStore(users)
+    seen = store.get('ana')
+    assert not seen
+    store.record('ana', seen, ['a', 'b'])
+    doc = users.find_one({'username': 'ana'})
+    assert len(doc[SEEN_FILTER_FIELD]['current']) == SEEN_FILTER_BITS // 8
+    again = store.get('ana')
+    assert 'a' in again and 'c' not in again and again.count == 2
+    # Unknown users get an empty filter and no document
+    store.record('ghost', store.get('ghost'), ['a'])
+    assert users.count_documents({}) == 1
+
+def recipes(n):
+    return RecipeCorpus([
+        {'_id': i, 'name': f'recipe {i}', 'minutes': 20, 'tags': ['breakfast'],
+         'ingredients': ['oats'], 'nutrition': {'calories': 300}}
+        for i in range(n)
+    ])
+
+PREFS = {'question4': ['any'], 'question6': ['breakfast'], 'question7': ['main_dish']}
+
+def test_plans_pass_over_seen_recipes():
+    corpus = recipes(8)
+    seen = SeenFilter()
+    picked = []
+    for _ in range(8):
+        recipe = recommend_recipes(PREFS, corpus, seen=seen)['breakfast'][0]
+        picked.append(plan_key(recipe))
+        seen.add(plan_key(recipe))
+    assert sorted(picked) == list(range(8))
+    # Everything has been seen: repeats rather than nothing
+    assert recommend_recipes(PREFS, corpus, seen=seen)['breakfast']
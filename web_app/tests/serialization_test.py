@@ -0,0 +1,73 @@
+import io
+import json
+from datetime import datetime
+from bson import ObjectId
+from web_app.back_end import serialization
+from web_app.back_end.serialization import (
+    to_jsonable, dumps, loads, iter_json_array, dump_to_file
+)
+
+def sample_recommendations():
+    return {
+        'breakfast': [{
+            '_id': ObjectId(),
+            'name': 'Test Breakfast',
+            'minutes': 15,
+            'nutrition': {'calories': 250.5, 'protein': 10},
+            'tags': ['breakfast', 'easy'],
+        }],
+        'lunch': [],
+    }
+
+def test_to_jsonable_converts_object_ids():
+    recs = sample_recommendations()
+    oid = recs['breakfast'][0]['_id']
+    converted = to_jsonable(recs)
+    assert converted['breakfast'][0]['_id'] == str(oid)
+    assert converted['breakfast'][0]['nutrition'] == {'calories': 250.5, 'protein': 10}
+    # The original documents are left untouched
+    assert recs['breakfast'][0]['_id'] == oid
+
+def test_to_jsonable_python_fallback(monkeypatch):
+    monkeypatch.setattr(serialization, 'orjson', None)
+    oid = ObjectId()
+    when = datetime(2025, 4, 1, 12, 30)
+    converted = to_jsonable({'id': oid, 'when': when, 'ids': (oid,)})
+    assert converted == {'id': str(oid), 'when': when.isoformat(), 'ids': [str(oid)]}
+
+def test_dumps_round_trip():
+    recs = sample_recommendations()
+    decoded = loads(dumps(recs))
+    assert decoded['breakfast'][0]['name'] == 'Test Breakfast'
+    assert decoded['breakfast'][0]['_id'] == str(recs['breakfast'][0]['_id'])
+    assert decoded['lunch'] == []
+
+def test_dumps_json_fallback(monkeypatch):
+    monkeypatch.setattr(serialization, 'orjson', None)
+    recs = sample_recommendations()
+    decoded = json.loads(dumps(recs, indent=True))
+    assert decoded['breakfast'][0]['_id'] == str(recs['breakfast'][0]['_id'])
+
+def test_dumps_unserializable_raises():
+    class UnserializableObject:
+        pass
+
+    try:
+        dumps({'custom': UnserializableObject()})
+        assert False, "expected TypeError"
+    except TypeError:
+        pass
+
+def test_iter_json_array_streams_each_item():
+    chunks = list(iter_json_array([{'a': 1}, {'b': 2}]))
+    assert chunks[0] == b'['
+    assert chunks[-1] == b']'
+    assert json.loads(b''.join(chunks)) == [{'a': 1}, {'b': 2}]
+    assert json.loads(b''.join(iter_json_array([]))) == []
+
+def test_dump_to_file_matches_dumps():
+    recs = sample_recommendations()
+    for indent in (False, True):
+        buf = io.BytesIO()
+        dump_to_file(recs, buf, indent=indent)
+        assert json.loads(buf.getvalue()) == json.loads(dumps(recs))
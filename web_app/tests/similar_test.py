@@ -0,0 +1,138 @@
+import random
+import numpy as np
+import pytest
+from bson import ObjectId
+from web_app.back_end import similar
+from web_app.back_end.corpus import RecipeCorpus
+from web_app.back_end.similar import FeatureMatrix, NeighbourTable, build_table, top_k
+
+RECIPES = [
+    {'_id': 1, 'tags': ['dinner', 'asian'], 'ingredient_keys': ['tofu', 'soy sauce', 'rice']},
+    {'_id': 2, 'tags': ['dinner', 'asian'], 'ingredient_keys': ['tofu', 'soy sauce', 'ginger']},
+    {'_id': 3, 'tags': ['desserts'], 'ingredient_keys': ['flour', 'sugar', 'lemon']},
+    {'_id': 4, 'tags': ['desserts'], 'ingredient_keys': ['flour', 'sugar', 'butter']},
+    {'_id': 5, 'tags': ['dinner'], 'ingredient_keys': ['rice', 'ginger']},
+    {'_id': 6, 'tags': [], 'ingredient_keys': []},
+]
+IDS = [r['_id'] for r in RECIPES]
+
+
+def brute_force(records):
+    """Exact cosine top-k from dense vectors"""
+    matrix = FeatureMatrix(records)
+    dense = np.zeros((matrix.size, matrix.indices.max() + 1 if len(matrix.indices) else 1))
+    for row in range(matrix.size):
+        span = slice(matrix.indptr[row], matrix.indptr[row + 1])
+        dense[row, matrix.indices[span]] = matrix.data[span]
+    sims = dense @ dense.T
+    np.fill_diagonal(sims, 0)
+    return sims
+
+
+def test_rows_are_unit_length_and_self_is_excluded():
+    matrix = FeatureMatrix(RECIPES, max_df=1.0)
+    for row in range(5):
+        span = slice(matrix.indptr[row], matrix.indptr[row + 1])
+        assert np.isclose((matrix.data[span] ** 2).sum(), 1.0)
+    slab = matrix.scores([0, 2])
+    assert slab[0, 0] == 0 and slab[1, 2] == 0
+    assert slab[0].argmax() == 1 and slab[1].argmax() == 3
+
+
+def test_table_lookup():
+    table = build_table(RECIPES, IDS, k=3)
+    assert table.similar(1)[0] == 2
+    assert table.similar(3) == [4]
+    assert table.similar(6) == []           # nothing in common with anything
+    assert table.similar(99) == []
+    assert table.similar(1, 1) == [2]
+
+
+def test_matches_brute_force_and_chunking_changes_nothing():
+    rng = random.Random(3)
+    tags = [f't{i}' for i in range(30)]
+    ingredients = [f'i{i}' for i in range(200)]
+    records = [
+        {'tags': rng.sample(tags, 4), 'ingredient_keys': rng.sample(ingredients, 6)}
+        for _ in range(400)
+    ]
+    ids = list(range(400))
+    sims = brute_force(records).astype(np.float32)
+    expected, _ = top_k(sims, 5)
+    one_chunk = build_table(records, ids, k=5)
+    tiny_chunks = build_table(records, ids, k=5, memory_mb=0.01)
+    two_workers = build_table(records, ids, k=5, workers=2, memory_mb=0.05)
+    assert np.array_equal(one_chunk.neighbours, tiny_chunks.neighbours)
+    assert np.array_equal(one_chunk.neighbours, two_workers.neighbours)
+    # Ties may order differently; compare scores
+    rows = np.arange(400)[:, None]
+    assert np.allclose(sims[rows, one_chunk.neighbours], sims[rows, expected], atol=1e-3)
+
+
+def test_incremental_update_matches_full_rebuild():
+    old = build_table(RECIPES[:4], IDS[:4], k=2)
+    updated = build_table(RECIPES, IDS, k=2, previous=old)
+    full = build_table(RECIPES, IDS, k=2)
+    # Recipe 5 (rice, ginger) is new and now appears in the lists of 1 and 2
+    assert updated.similar(5) == full.similar(5)
+    assert 5 in updated.similar(1) and 5 in updated.similar(2)
+    assert updated.similar(3) == [4]
+
+
+def test_incremental_update_needs_new_recipes_last():
+    old = build_table(RECIPES[2:4], IDS[2:4], k=2)
+    with pytest.raises(ValueError):
+        build_table(RECIPES, IDS, k=2, previous=old)
+
+
+def test_incremental_update_keeps_k():
+    old = build_table(RECIPES[:4], IDS[:4], k=2)
+    assert old.k == 2
+    for k in (1, 3):
+        with pytest.raises(ValueError, match='k=2'):
+            build_table(RECIPES, IDS, k=k, previous=old)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    # One id ending in a NUL byte, which a bytes-string array would drop
+    ids = [ObjectId(b'\x01' * 11 + b'\x00')] + [ObjectId() for _ in RECIPES[1:]]
+    table = build_table(RECIPES, ids, k=3)
+    path = tmp_path / 'similar.npz'
+    table.save(str(path))
+    loaded = NeighbourTable.load(str(path))
+    assert loaded.ids == ids
+    assert loaded.neighbours.dtype == np.int32
+    assert loaded.similar(ids[0]) == table.similar(ids[0])
+
+    int_table = build_table(RECIPES, IDS, k=3)
+    int_table.save(str(path))
+    assert NeighbourTable.load(str(path)).similar(3) == [4]
+
+
+def test_shared_table_missing_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(similar, '_shared_table', None)
+    assert similar.get_neighbour_table(str(tmp_path / 'missing.npz')) is None
+
+
+@pytest.fixture
+def table(web, monkeypatch):
+    ids = [ObjectId() for _ in RECIPES]
+    recipes = [
+        dict(r, _id=rid, name=f'Recipe {r["_id"]}', minutes=10 * r['_id'],
+             ingredients=r['ingredient_keys'], steps=['cook'])
+        for r, rid in zip(RECIPES, ids)
+    ]
+    web.db.collection.insert_many([dict(r) for r in recipes])
+    web.rec_sys = web.RecipeRecommendationSystem(corpus=RecipeCorpus(recipes))
+    import back_end.similar as app_similar
+    monkeypatch.setattr(app_similar, '_shared_table', build_table(RECIPES, ids, k=3))
+    return ids
+
+
+def test_view_page_shows_similar_recipes(table, client):
+    ids = table
+    page = client.get(f'/view_recipe/{ids[2]}').get_data(as_text=True)
+    assert 'More like this' in page
+    assert f'/view_recipe/{ids[3]}' in page and 'Recipe 4' in page
+    page = client.get(f'/view_recipe/{ids[5]}').get_data(as_text=True)
+    assert 'More like this' not in page
@@ -0,0 +1,119 @@
+import json
+import random
+import numpy as np
+import pytest
+from web_app.back_end.text_search import BM25Index, tokenize
+from web_app.back_end.corpus import RecipeCorpus
+
+RECIPES = [
+    {'_id': 1, 'name': 'Crispy Sheet Pan Chicken', 'minutes': 40, 'tags': ['dinner'],
+     'description': 'weeknight favourite', 'steps': ['heat the oven', 'roast on a sheet pan'],
+     'ingredients': ['chicken thighs', 'potatoes']},
+    {'_id': 2, 'name': 'Lemon Cake', 'minutes': 90, 'tags': ['desserts', 'vegetarian'],
+     'description': 'a crispy crust and a soft crumb', 'steps': ['mix', 'bake'],
+     'ingredients': ['flour', 'lemons']},
+    {'_id': 3, 'name': 'Tofu Stir Fry', 'minutes': 20, 'tags': ['dinner', 'vegan', 'vegetarian'],
+     'description': 'quick and easy', 'steps': ['fry the tofu until crispy', 'add a sheet of nori'],
+     'ingredients': ['tofu', 'soy sauce']},
+    {'_id': 4, 'name': 'Nutty Granola', 'minutes': 30, 'tags': ['breakfast', 'nuts', 'vegetarian'],
+     'description': 'crispy clusters baked on a sheet pan', 'steps': ['bake'],
+     'ingredients': ['oats', 'walnuts']},
+]
+
+def test_tokenize():
+    assert tokenize('The CRISPY sheet-pans!') == ['crispy', 'sheet', 'pan']
+    assert tokenize(['Chop the onions', 'Serve']) == ['chop', 'onion', 'serve']
+    assert tokenize(None) == []
+
+def test_field_boosts_rank_name_over_description_over_steps():
+    index = BM25Index(enumerate(RECIPES))
+    rows = [row for row, _ in index.search('crispy')]
+    # name, then the two descriptions (shorter one first), then steps
+    assert rows == [0, 1, 3, 2]
+    assert index.search('no such words') == []
+
+def test_mask_filters_results():
+    index = BM25Index(enumerate(RECIPES))
+    mask = np.array([False, True, True, False])
+    assert [row for row, _ in index.search('crispy sheet pan', mask=mask)] == [2, 1]
+
+def test_early_termination_matches_exhaustive_scoring():
+    rng = random.Random(7)
+    words = [f'w{i}' for i in range(300)]
+    docs = [
+        (row, {'name': ' '.join(rng.choices(words[:40], k=3)),
+               'description': ' '.join(rng.choices(words, k=30)),
+               'steps': [' '.join(rng.choices(words, k=12)) for _ in range(4)]})
+        for row in range(3000)
+    ]
+    index = BM25Index(docs)
+    index.EXHAUSTIVE_BELOW = 0
+    mask = np.array([rng.random() < 0.5 for _ in range(3000)])
+    for query in ('w1 w2', 'w3 w250 w299', 'w0 w5 w7 w100 w200', 'w39'):
+        for m in (None, mask):
+            index.BLOCK = 10 ** 9
+            exhaustive = index.search(query, 10, m)
+            index.BLOCK = 16
+            early = index.search(query, 10, m)
+            assert [s for _, s in early] == [s for _, s in exhaustive]
+            # Rows tied with the last score may differ; all others may not
+            last = exhaustive[-1][1]
+            assert [r for r, s in early if s > last] == [r for r, s in exhaustive if s > last]
+
+@pytest.fixture
+def collection(store):
+    coll = store['recipe_database']['recipes']
+    coll.insert_many([dict(r) for r in RECIPES])
+    return coll
+
+def test_corpus_search_with_quiz_filters(collection):
+    corpus = RecipeCorpus.load(collection)
+    assert corpus.search_text('crispy') is None        # no index yet
+    corpus.build_text_index(collection)
+    results = corpus.search_text('crispy sheet pan')
+    assert [r['_id'] for r in results] == [1, 4, 3, 2]
+    assert 'steps' not in results[0] and results[0]['score'] > results[1]['score']
+
+    from web_app.back_end.recipe_recommender import quiz_filters
+    # vegetarian, nut allergy, under 30 minutes
+    query = quiz_filters({'question1': ['vegetarian', 'nuts'], 'question3': '1'})
+    assert [r['_id'] for r in corpus.search_text('crispy sheet pan', query=query)] == [3]
+
+@pytest.fixture
+def vegan(collection, client):
+    # A quiz session: vegan, any time
+    with client.session_transaction() as sess:
+        sess['response1'] = ['vegan']
+        sess['response3'] = '6'
+    return client
+
+@pytest.fixture
+def preloaded(web, vegan, collection):
+    # The snapshot and its text index, built at startup as wsgi.py does
+    rec_sys = web.get_rec_system()
+    rec_sys.corpus = RecipeCorpus.load(collection)
+    rec_sys.corpus.build_text_index(collection)
+    return vegan
+
+def test_search_needs_the_preloaded_corpus(web, vegan):
+    client = vegan
+    for url in ('/api/search?q=crispy', '/api/pantry?ingredients=tofu'):
+        response = client.get(url)
+        assert response.status_code == 503
+        assert json.loads(response.data) == {'error': 'search index not loaded'}
+    # No snapshot was loaded behind the recommender's back
+    assert web.get_rec_system().corpus is None
+
+def test_search_waits_for_the_text_index(web, preloaded):
+    corpus = web.get_rec_system().corpus
+    # New recipes invalidate the BM25 statistics; the request doesn't rebuild them
+    corpus.add([{'_id': 5, 'name': 'Crispy Tofu', 'tags': [], 'ingredients': ['tofu']}])
+    assert preloaded.get('/api/search?q=crispy').status_code == 503
+    assert corpus.text_index is None
+
+def test_search_endpoint(preloaded):
+    client = preloaded
+    results = json.loads(client.get('/api/search?q=crispy+sheet+pan').data)
+    assert [r['name'] for r in results][:2] == ['Crispy Sheet Pan Chicken', 'Nutty Granola']
+    filtered = json.loads(client.get('/api/search?q=crispy&quiz=1').data)
+    assert [r['name'] for r in filtered] == ['Tofu Stir Fry']